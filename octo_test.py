@@ -1,5 +1,7 @@
 import pyvisa
 
+from scanner.Plugins.gcodeStream import GcodeStreamer
+
 # This class structure mimics the plugin architecture seen in Simplified_VNA_Plugin.py
 # For a standalone script, you might not need to inherit from a base class like ProbePlugin,
 # but this demonstrates how you would integrate PyVISA into such a system.
@@ -146,6 +148,21 @@ class GCode_Plugin:
             print(f"An unexpected error occurred while sending command: {e}")
         return None
 
+    def run_program(self, program, on_sample=None):
+        """
+        Streams a compiled scan program (scanner.Plugins.gcodeProgram) to the device
+        with ok-counting flow control instead of one query per command.
+
+        Args:
+            program (GcodeProgram): The compiled program.
+            on_sample (callable): Called with the pattern column at every sample point,
+                                  once the stage has stopped there.
+        """
+        if not self.driver:
+            print("Not connected to a device. Please call connect() first.")
+            return
+        program.stream(GcodeStreamer(self.driver), on_sample)
+
 # Main execution block
 if __name__ == "__main__":
     # Instantiate the GCode_Plugin
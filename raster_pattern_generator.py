@@ -1,46 +1,21 @@
 import numpy as np
 import matplotlib.pyplot as plt
 import csv
+from scanner.scan_patterns import serpentine, rotate, shear
 fig = None
 ax = None
 def create_pattern_matrix(n):
     #generates (n+1)^2 (x,y) column
-    row1 = np.repeat(np.arange(n+1), n+1)
-    row2 = []
-    for i in range(n+1):
-        if i % 2 == 0:
-            row2.extend(range(n+1))        
-        else:
-            row2.extend(range(n, -1, -1))   
-    return np.array([row1, row2])
+    return serpentine(n + 1, n + 1, dtype=np.int64)[:2]
 
 
 
 def rotate_points(matrix, theta_rad):
-    
-    R = np.array([
-        [np.cos(theta_rad), -np.sin(theta_rad)],
-        [np.sin(theta_rad),  np.cos(theta_rad)]
-    ])
-    
-    R = R @ matrix
-    R[np.abs(R) < 1e-10] = 0
-    
-    
-    return R 
+    return rotate(matrix, np.rad2deg(theta_rad))
 
     
 def apply_shear(matrix, shear_x=0.0, shear_y=0.0):
-    shear_matrix = np.array([
-        [1, shear_x],
-        [shear_y, 1]
-    ])
-    
-    shear_matrix = shear_matrix @ matrix
-    
-    shear_matrix[np.abs(shear_matrix) < 1e-10] = 0
-
-    return shear_matrix
+    return shear(matrix, shear_x, shear_y)
 
 
 
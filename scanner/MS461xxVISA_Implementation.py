@@ -1,9 +1,18 @@
 import pyvisa
 import socket
+import asyncio
+import threading
+from collections import deque
+from scanner.scan_logging import get_logger
+
+log = get_logger("probe")
+
+
 class InstrumentConnection:
-    def __init__(self, resource_name, timeout=10000):
+    def __init__(self, resource_name, timeout=10000, pipelined=False):
         self.connection = None
         self.timeout = timeout
+        self.pipelined = pipelined
         self.resource_name = resource_name
         self.resource_type = resource_name[resource_name.rfind("::") + 2:]
         self.ip = resource_name[
@@ -17,6 +26,8 @@ class InstrumentConnection:
             return InstrumentVisaConnection(self.resource_name, self.timeout)
         
         elif self.resource_type == "SOCKET": 
+            if self.pipelined:
+                return InstrumentPipelinedSocketConnection(self.resource_name, self.timeout)
           
             return InstrumentSocketConnection(self.resource_name, self.timeout)
         
@@ -49,6 +60,9 @@ class InstrumentVisaConnection:
         self.q_response = self.shockline_visa.query(q_command)
         return self.q_response.rstrip()
 
+    def query_many(self, q_commands):
+        return [self.query(q_command) for q_command in q_commands]
+
     def close(self):
         try:
             self.shockline_visa.close()
@@ -91,6 +105,9 @@ class InstrumentSocketConnection:
             query_response2 = self.return_block_data()
             return (query_response1 + query_response2).rstrip()
 
+    def query_many(self, q_commands):
+        return [self.query(q_command) for q_command in q_commands]
+
     def close(self):
         self.shockline_socket.close()
     def return_block_data(self):
@@ -146,6 +163,172 @@ class InstrumentSocketConnection:
         return data_block_size + data_block_size_characters_data + data_block_point_data
 
 
+class InstrumentAsyncSocketConnection:
+    """asyncio SCPI client for TCPIP SOCKET resources.
+
+    Writes go straight onto the transport without waiting for anything, and
+    queries return an awaitable as soon as the command is sent, so any number
+    of commands can be in flight at once. One reader task parses replies
+    (plain lines or IEEE 488.2 "#<n><len>" blocks) and hands them to the
+    pending queries in the order they were sent.
+    Must be used from the event loop that called open(). Once the reader or
+    a write has failed, every later write or query raises ConnectionError.
+    """
+
+    def __init__(self, address="TCPIP0::127.0.0.1::5001::SOCKET", timeout=5000):
+        self.host_ip = address[address.find("::") + 2: address.find("::", address.find("::") + 1)]
+        self.port = int(address[address.find(self.host_ip) + len(self.host_ip) + 2: address.find("::", address.find(self.host_ip) + len(self.host_ip)+1)])
+        self.timeout = timeout / 1000
+        self._reader = None
+        self._writer = None
+        self._reader_task = None
+        self._pending = deque()
+        self._error = None
+
+    async def open(self):
+        self._reader, self._writer = await asyncio.wait_for(
+            asyncio.open_connection(self.host_ip, self.port), self.timeout)
+        self._reader_task = asyncio.get_running_loop().create_task(self._read_replies())
+
+    def raise_if_failed(self):
+        if self._error is not None:
+            raise self._error
+
+    def _send(self, data):
+        self.raise_if_failed()
+        try:
+            if self._writer.transport.is_closing():
+                raise ConnectionError("transport is closed")
+            self._writer.write(data)
+        except Exception as e:
+            self._error = ConnectionError(f"Instrument write failed: {e}")
+            raise self._error from e
+
+    def write(self, w_command):
+        self._send((w_command + "\n").encode())
+
+    def write_many(self, w_commands):
+        # one send for the whole batch instead of one per command
+        self._send("".join(w_command + "\n" for w_command in w_commands).encode())
+
+    async def drain(self):
+        await self._writer.drain()
+
+    def query(self, q_command, timeout=None):
+        """Send q_command now and return an awaitable for its reply.
+
+        timeout is in ms and defaults to the connection timeout. A reply that
+        arrives after its query timed out is read and discarded so later
+        replies stay matched to their queries.
+        """
+        self.raise_if_failed()
+        reply = asyncio.get_running_loop().create_future()
+        self.write(q_command)
+        self._pending.append(reply)
+        return asyncio.wait_for(reply, self.timeout if timeout is None else timeout / 1000)
+
+    async def query_many(self, q_commands, timeout=None):
+        replies = [self.query(q_command, timeout) for q_command in q_commands]
+        return list(await asyncio.gather(*replies))
+
+    async def _read_reply(self):
+        first = await self._reader.readexactly(1)
+        if first != b"#":
+            return (first + await self._reader.readline()).decode().rstrip()
+        num_digits = await self._reader.readexactly(1)
+        block_len = await self._reader.readexactly(int(num_digits))
+        block = await self._reader.readexactly(int(block_len))
+        await self._reader.readline()
+        return (first + num_digits + block_len + block).decode().rstrip()
+
+    async def _read_replies(self):
+        try:
+            while True:
+                response = await self._read_reply()
+                if not self._pending:
+                    log.warning("Discarding unsolicited reply: %s", response[:40])
+                    continue
+                reply = self._pending.popleft()
+                if not reply.done():
+                    reply.set_result(response)
+        except asyncio.CancelledError:
+            raise
+        except Exception as e:
+            # later queries fail at once instead of waiting out their timeout for a reader that is gone
+            self._error = ConnectionError(f"Instrument connection lost: {e!r}")
+            log.error("%s", self._error)
+            while self._pending:
+                reply = self._pending.popleft()
+                if not reply.done():
+                    reply.set_exception(self._error)
+
+    async def close(self):
+        if self._reader_task:
+            self._reader_task.cancel()
+            try:
+                await self._reader_task
+            except asyncio.CancelledError:
+                pass
+        if self._writer:
+            self._writer.close()
+            await self._writer.wait_closed()
+
+
+class InstrumentPipelinedSocketConnection:
+    """Blocking write/query front end over InstrumentAsyncSocketConnection.
+
+    Same interface as InstrumentSocketConnection, but the event loop runs on
+    its own thread: write() returns immediately and query() only waits for
+    its own reply, so setup commands are pipelined instead of lock-stepped.
+    A write that fails on the loop thread is raised by the next write or query.
+    """
+
+    def __init__(self, address="TCPIP0::127.0.0.1::5001::SOCKET", timeout=5000):
+        self._loop = asyncio.new_event_loop()
+        self._loop_thread = threading.Thread(target=self._loop.run_forever, daemon=True)
+        self._loop_thread.start()
+        self.client = InstrumentAsyncSocketConnection(address, timeout)
+        self.connect()
+
+    def _run(self, coro):
+        return asyncio.run_coroutine_threadsafe(coro, self._loop).result()
+
+    def connect(self):
+        self._run(self.client.open())
+
+    def _send_later(self, send, *args):
+        def send_now():
+            try:
+                send(*args)
+            except ConnectionError:
+                pass # kept by the client, raised on the next write or query
+        self.client.raise_if_failed()
+        self._loop.call_soon_threadsafe(send_now)
+
+    def write(self, w_command):
+        self._send_later(self.client.write, w_command)
+
+    def write_many(self, w_commands):
+        self._send_later(self.client.write_many, list(w_commands))
+
+    async def _query(self, q_command, timeout):
+        return await self.client.query(q_command, timeout)
+
+    def query(self, q_command, timeout=None):
+        return self._run(self._query(q_command, timeout))
+
+    def query_many(self, q_commands, timeout=None):
+        return self._run(self.client.query_many(list(q_commands), timeout))
+
+    def close(self):
+        try:
+            self._run(self.client.close())
+        finally:
+            self._loop.call_soon_threadsafe(self._loop.stop)
+            self._loop_thread.join()
+            self._loop.close()
+
+
 def main(address, timeout):
 
     # 0. Instrument connection
@@ -11,6 +11,10 @@ import h5py
 import numpy as np
 from datetime import datetime
 import os
+from scanner.scan_logging import get_logger
+
+log = get_logger("probe")
+
 ### This plugin is for the MS46524B 4 port VNA, 
 
 
@@ -62,19 +66,18 @@ class VNA_Plugin(ProbePlugin):
     def connect(self):
         vna_pick = PluginSettingString.get_value_as_string(self.vna_type)
    
-        self.vna=InstrumentConnection(self.address.value, self.timeout.value).connect()
+        self.vna=InstrumentConnection(self.address.value, self.timeout.value, pipelined=True).connect()
         
         
             
         if self.freq_mode.value == "Query":
 
-            start_Frequency = self.vna.query(":SENS1:FREQ:STAR?")
-            stop_Frequency = self.vna.query(":SENS1:FREQ:STOP?")
-            intermediate_Frequency = self.vna.query(":SENS1:BAND?")
+            start_Frequency, stop_Frequency, intermediate_Frequency = self.vna.query_many(
+                [":SENS1:FREQ:STAR?", ":SENS1:FREQ:STOP?", ":SENS1:BAND?"])
 
-            print(f"VNA start frequency is: {start_Frequency} Hz")
-            print(f"VNA stop frequency is: {stop_Frequency} Hz")
-            print(f"VNA IF bandwidth frequency is: {intermediate_Frequency} Hz")
+            log.info("VNA start frequency is: %s Hz", start_Frequency)
+            log.info("VNA stop frequency is: %s Hz", stop_Frequency)
+            log.info("VNA IF bandwidth frequency is: %s Hz", intermediate_Frequency)
 
             
             
@@ -92,7 +95,7 @@ class VNA_Plugin(ProbePlugin):
             self.vna.write(f":SENS1:BAND {self.if_bandwidth.value}")
 
         else:
-            print("__Incorrect Input on frequency mode setting__")
+            log.error("__Incorrect Input on frequency mode setting__")
 
         if vna_pick == "MS46524B":
            self.selected_params = VNA_List_Sparams.s_parameter_selection_VNA_n_channels(4)
@@ -118,7 +121,7 @@ class VNA_Plugin(ProbePlugin):
         opc_done = self.vna.query("*OPC?")
 
         if not (opc_done == "1"):
-            print(f"Error, Opc returned unexpected value while waiting for a single sweep to finish (expected '1', received {opc_done}); ending code execution.")
+            log.error("Error, Opc returned unexpected value while waiting for a single sweep to finish (expected '1', received %s); ending code execution.", opc_done)
             self.vna.close()
 
         self.frequency_data_query = self.vna.query(":SENS1:FREQ:DATA?")
@@ -177,8 +180,9 @@ class VNA_Plugin(ProbePlugin):
 
     def scan_read_measurement(self, scan_index=None, scan_location=None):
         results = {}
-        for idx, name in enumerate(self.get_channel_names(), start=1):
-            raw = self.vna.query(f":CALC1:PAR{idx}:DATA:SDAT?")
+        names = self.get_channel_names()
+        raws = self.vna.query_many([f":CALC1:PAR{idx}:DATA:SDAT?" for idx in range(1, len(names)+1)])
+        for name, raw in zip(names, raws):
             tokens = self._strip_block(raw)
             vals = list(map(float, tokens))
             results[name] = np.array([complex(vals[i], vals[i+1])
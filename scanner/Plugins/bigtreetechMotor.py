@@ -6,8 +6,15 @@ import serial
 from serial.tools import list_ports
 import pyvisa
 import threading
+from scanner.Plugins.gcodeStream import GcodeStreamer
+from scanner.scan_logging import get_logger
+
+log = get_logger("motion")
 
 class motion_controller_plugin(MotionControllerPlugin):
+    # move_absolute() takes per axis offsets
+    relative_moves = True
+
     def __init__(self):
         super().__init__()
 
@@ -21,6 +28,18 @@ class motion_controller_plugin(MotionControllerPlugin):
 
         self.add_setting_pre_connect(self.scanner_type)
 
+        # Blocking waits for every move with M400, Streaming keeps the planner queue full
+        self.motion_mode = PluginSettingString(
+            "Motion Mode",
+            "Blocking",
+            select_options=["Blocking", "Streaming"],
+            restrict_selections=True
+        )
+        self.stream_depth = PluginSettingInteger("Stream Queue Depth", 4, value_min=1)
+
+        self.add_setting_pre_connect(self.motion_mode)
+        self.add_setting_pre_connect(self.stream_depth)
+
         # Position tracking variables
         self.current_position = [0.0, 0.0, 0.0]  # [X, Y, Z]
         self.is_homed = False
@@ -35,10 +54,12 @@ class motion_controller_plugin(MotionControllerPlugin):
 
         self.rm = None
         self.driver = None
+        self.streamer = None
+        self._synced_at = 0
         self.resource_name = None
         self.timeout = 5000
         self.rm = pyvisa.ResourceManager()
-        print("PyVISA ResourceManager initialized.")
+        log.debug("PyVISA ResourceManager initialized.")
         self.devices = self.rm.list_resources()
         
     def connect(self):
@@ -57,7 +78,7 @@ class motion_controller_plugin(MotionControllerPlugin):
             self.y_max = 600.0
             self.z_min = 0.0
             self.z_max = 0.0  # No Z axis for Big Scanner
-            print("Scanner boundaries set: Big Scanner (600x600 mm, X-Y only)")
+            log.info("Scanner boundaries set: Big Scanner (600x600 mm, X-Y only)")
         else:  # "N-d Scanner"
             # N-d Scanner: 300x300x300 mm cube
             self.x_min = 0.0
@@ -66,17 +87,17 @@ class motion_controller_plugin(MotionControllerPlugin):
             self.y_max = 300.0
             self.z_min = 0.0
             self.z_max = 300.0
-            print("Scanner boundaries set: N-d Scanner (300x300x300 mm cube)")
+            log.info("Scanner boundaries set: N-d Scanner (300x300x300 mm cube)")
 
         self.timeout = 1000
         # Auto-detect GCODE device by trying all VISA resources
         if not self.devices:
             raise ConnectionError("No VISA devices found on system")
 
-        print(f"\nAttempting to auto-detect GCODE device on {len(self.devices)} available VISA resource(s)...")
-        print("Found the following VISA devices:")
+        log.info("Attempting to auto-detect GCODE device on %d available VISA resource(s)...", len(self.devices))
+        log.info("Found the following VISA devices:")
         for device in self.devices:
-            print(f"  - {device}")
+            log.info("  - %s", device)
 
         connected = False
         last_error = None
@@ -84,7 +105,7 @@ class motion_controller_plugin(MotionControllerPlugin):
         # Loop through all VISA devices until GCODE device found
         for device in self.devices:
             try:
-                print(f"\n  Trying {device}...")
+                log.info("  Trying %s...", device)
 
                 # Attempt to open VISA resource
                 test_driver = self.rm.open_resource(device)
@@ -97,7 +118,10 @@ class motion_controller_plugin(MotionControllerPlugin):
 
                 # Check if we got a valid GCODE response (contains "ok" or firmware info)
                 if "ok" in response.lower() or "firmware" in response.lower():
-                    print(f"  ✓ GCODE device detected on {device}")
+                    log.info("  ✓ GCODE device detected on %s", device)
+                    # M115 answers with several lines, read up to its ok so later replies line up
+                    while not response.strip().startswith("ok"):
+                        response = test_driver.read()
                     self.driver = test_driver
                     self.resource_name = device
                     connected = True
@@ -105,11 +129,11 @@ class motion_controller_plugin(MotionControllerPlugin):
                 else:
                     # Not a GCODE device
                     test_driver.close()
-                    print(f"  ✗ Not a GCODE device (unexpected response: {response[:50]})")
+                    log.info("  ✗ Not a GCODE device (unexpected response: %s)", response[:50])
 
             except (pyvisa.errors.VisaIOError, Exception) as e:
                 last_error = e
-                print(f"  ✗ Failed to connect: {e}")
+                log.info("  ✗ Failed to connect: %s", e)
                 try:
                     test_driver.close()
                 except:
@@ -118,25 +142,32 @@ class motion_controller_plugin(MotionControllerPlugin):
 
         if not connected:
             error_msg = f"Failed to detect GCODE device on any available VISA resource. Last error: {last_error}"
-            print(f"\n✗ {error_msg}")
+            log.error("✗ %s", error_msg)
             raise ConnectionError(error_msg)
 
-        print(f"\n✓ Successfully connected to GCODE device: {self.resource_name}")
-        print(f"Communication timeout set to {self.timeout} ms.")
+        log.info("✓ Successfully connected to GCODE device: %s", self.resource_name)
+        log.info("Communication timeout set to %s ms.", self.timeout)
         test_driver.timeout = 5000
         # Set to relative positioning mode
         response = self.send_gcode_command("G91")
+
+        if self.motion_mode.value == "Streaming":
+            self.streamer = GcodeStreamer(self.driver, self.stream_depth.value)
+            log.info("Streaming mode, up to %d commands in flight.", self.streamer.max_outstanding)
         
         
         
     def disconnect(self):
+        if self.streamer:
+            self.streamer.sync()
+            self.streamer = None
         self.driver.close()
-        print(f"Connection to {self.resource_name} closed.")
+        log.info("Connection to %s closed.", self.resource_name)
         self.driver = None
     
     
     def get_axis_display_names(self) -> tuple[str, ...]:
-        pass
+        return ("X", "Y", "Z")
     
     def get_axis_units(self) -> tuple[str, ...]:
         pass
@@ -154,20 +185,14 @@ class motion_controller_plugin(MotionControllerPlugin):
         if not self.is_homed:
             raise RuntimeError("Motors must be homed before movement to establish a coordinate system.")
 
-        
-        for axis_idx, delta in move_dist.items():
-            new_potential_pos = self.current_position[axis_idx] + delta
-            
-            if axis_idx == 0:  # X axis
-                if new_potential_pos < self.x_min or new_potential_pos > self.x_max:
-                    raise ValueError(f"LIMIT VIOLATION: X move of {delta} would reach {new_potential_pos}, exceeding [{self.x_min}, {self.x_max}]")
-            elif axis_idx == 1:  # Y axis
-                if new_potential_pos < self.y_min or new_potential_pos > self.y_max:
-                    raise ValueError(f"LIMIT VIOLATION: Y move of {delta} would reach {new_potential_pos}, exceeding [{self.y_min}, {self.y_max}]")
-            elif axis_idx == 2:  # Z axis
-                if new_potential_pos < self.z_min or new_potential_pos > self.z_max:
-                    raise ValueError(f"LIMIT VIOLATION: Z move of {delta} would reach {new_potential_pos}, exceeding [{self.z_min}, {self.z_max}]")
+        # limits are checked by MotionController against its envelope (get_endstop_minimums/maximums)
 
+        if self.streamer:
+            # queued only, is_moving() or run_moves() decide where the stage has to stop
+            self.streamer.send(self.format_move(move_dist))
+            for axis_idx, delta in move_dist.items():
+                self.current_position[axis_idx] += delta
+            return {i: self.current_position[i] for i in range(3)}
         
         for axis_idx, delta in move_dist.items():
             axis_map = {0: 'X', 1: 'Y', 2: 'Z'}
@@ -177,14 +202,14 @@ class motion_controller_plugin(MotionControllerPlugin):
                 move_command = f"G0 {axis_map[axis_idx]}{delta} F1000" 
                 self.send_gcode_command(move_command)
                 movement = self.is_moving()
-                print(movement)
+                log.debug("is_moving: %s", movement)
                 while movement[0] == True:
                     movement= self.is_moving()
-                    print(movement)
+                    log.debug("is_moving: %s", movement)
                
                 self.current_position[axis_idx] += delta
 
-        print(f"Position updated (Relative): X={self.current_position[0]:.2f}, Y={self.current_position[1]:.2f}, Z={self.current_position[2]:.2f}")
+        log.debug("Position updated (Relative): X=%.2f, Y=%.2f, Z=%.2f", *self.current_position[:3])
         return {i: self.current_position[i] for i in range(3)}
      
     def move_relative(self, move_pos: dict[int, float]) -> dict[int, float] | None:
@@ -278,9 +303,16 @@ class motion_controller_plugin(MotionControllerPlugin):
  
     def is_moving(self,axis=None) -> bool:
         
+        if self.streamer:
+            # only costs an M400 if something was queued since the last sync
+            if self.streamer.lines_sent != self._synced_at:
+                self.streamer.sync()
+                self._synced_at = self.streamer.lines_sent
+            return [False, False, False]
+        
         movement=[True,True,True]
         res = self.send_gcode_command("M400") 
-        print("/////")
+        log.debug("M400 -> %s", res)
         
         
         if res == 'ok':
@@ -305,39 +337,84 @@ class motion_controller_plugin(MotionControllerPlugin):
         pass
     
     
+    def format_move(self, move_dist: dict[int, float], feedrate: float = 1000) -> str:
+        axis_map = {0: 'X', 1: 'Y', 2: 'Z'}
+        return "G0 " + " ".join(f"{axis_map[axis]}{delta}" for axis, delta in move_dist.items() if axis in axis_map) + f" F{feedrate:g}"
+
+    def get_queue_depth(self) -> int:
+        """Commands sent to the board and not yet acknowledged (0 in blocking mode)"""
+        return self.streamer.queue_depth if self.streamer else 0
+
+    def run_moves(self, moves, on_point=None):
+        """Stream a list of (axis, distance) relative moves. With on_point the
+        stage stops after every move (one M400 each) and on_point(move_index) is
+        called, without it the whole list is queued and only the end is synced."""
+        moves = list(moves)
+        if not moves:
+            return
+        if not self.is_homed:
+            raise RuntimeError("Motors must be homed before movement to establish a coordinate system.")
+
+        streamer = self.streamer or GcodeStreamer(self.driver, self.stream_depth.value)
+        for move_idx, (axis_idx, delta) in enumerate(moves):
+            streamer.send(self.format_move({axis_idx: delta}))
+            self.current_position[axis_idx] += delta
+            if on_point is not None:
+                streamer.sync()
+                on_point(move_idx)
+        if on_point is None:
+            streamer.sync()
+        self._synced_at = streamer.lines_sent
+
+    def run_program(self, program, on_sample=None):
+        """Stream a compiled gcodeProgram.GcodeProgram once. on_sample(pattern_column)
+        is called at every sample point after the stage has stopped there."""
+        if not self.is_homed:
+            raise RuntimeError("Motors must be homed before movement to establish a coordinate system.")
+
+        streamer = self.streamer or GcodeStreamer(self.driver, self.stream_depth.value)
+        program.stream(streamer, on_sample)
+        self._synced_at = streamer.lines_sent
+        for axis_idx in range(3):
+            self.current_position[axis_idx] += float(program.end_offset[axis_idx])
+
     def send_gcode_command(self, command):
     
         if not self.driver:
-            print("Not connected to a device. Please call connect() first.")
+            log.error("Not connected to a device. Please call connect() first.")
             return None
 
+        if self.streamer:
+            # a query would otherwise read the ok of a streamed command
+            self.streamer.drain()
+
         
         # if not command.endswith('\n'):
         #     command += '\n'
 
         q_response = None
         try:
-            print(f"Sending G-code command: '{command.strip()}'")
+            log.debug("Sending G-code command: '%s'", command.strip())
           
             q_response = self.driver.query(command)
-            print(f"Received response: '{q_response.strip()}'")
+            log.debug("Received response: '%s'", q_response.strip())
             while q_response.strip() != 'ok':
                 q_response = self.driver.read()
-                print(f"{q_response.strip()}")
+                log.debug("%s", q_response.strip())
 
             return q_response.strip()
             
 
         except pyvisa.errors.VisaIOError as e:
-            print(f"VISA I/O Error during command '{command.strip()}': {e}")
+            log.error("VISA I/O Error during command '%s': %s", command.strip(), e)
         except Exception as e:
-            print(f"An unexpected error occurred while sending command: {e}")
+            log.error("An unexpected error occurred while sending command: %s", e)
         return None
     
     def emergency_stop(self):
-        print("EMERGENCY STOP ACTIVATED! Sending M112 to halt all motion immediately.")
+        log.critical("EMERGENCY STOP ACTIVATED! Sending M112 to halt all motion immediately.")
         self.send_gcode_command("M112")
-        print("All motion should now be stopped. Please check the device and reset if necessary.")
+        log.warning("All motion should now be stopped. Please check the device and reset if necessary.")
 
 
     def home(self, axes=None):
@@ -357,7 +434,7 @@ class motion_controller_plugin(MotionControllerPlugin):
         if axes is None:
             axes = [0, 1, 2]  # Home all axes by default
 
-        print(f"Homing axes {axes}")
+        log.info("Homing axes %s", axes)
         response = self.send_gcode_command("G28")
 
         # Wait for homing to complete
@@ -370,11 +447,11 @@ class motion_controller_plugin(MotionControllerPlugin):
         if scanner_type_str == "N-d Scanner":
             # N-d Scanner: Z starts at 300 mm (top of cube)
             self.current_position = [0.0, 0.0, 300.0]
-            print("Homing complete. Position initialized to (0, 0, 300) mm")
+            log.info("Homing complete. Position initialized to (0, 0, 300) mm")
         else:
             # Big Scanner: All axes at 0
             self.current_position = [0.0, 0.0, 0.0]
-            print("Homing complete. Position initialized to (0, 0, 0) mm")
+            log.info("Homing complete. Position initialized to (0, 0, 0) mm")
 
         self.is_homed = True
 
@@ -2,11 +2,29 @@ import socket
 import threading
 import os
 import time 
-from datetime import datetime
 from scanner.probe_controller import ProbePlugin
 from scanner.plugin_setting import PluginSettingString, PluginSettingInteger
 from scanner.motion_controller import MotionControllerPlugin
 import statistics   
+from scanner.Plugins.telemetry_logger import TelemetryLogger
+from scanner.scan_logging import get_logger
+
+log = get_logger("cybot")
+
+RECV_SIZE = 65536
+
+
+def add_telemetry_settings(plugin):
+    plugin.log_format = PluginSettingString("Log Format", "Text", select_options=["Text", "Binary"], restrict_selections=True)
+    plugin.console_echo = PluginSettingString("Console Echo", "Off", select_options=["Off", "Rate Limited"], restrict_selections=True)
+    plugin.add_setting_pre_connect(plugin.log_format)
+    plugin.add_setting_pre_connect(plugin.console_echo)
+
+def make_telemetry_logger(log_filename, log_format, console_echo):
+    binary = log_format == "Binary"
+    if binary and log_filename.endswith(".txt"):
+        log_filename = log_filename[:-4] + ".bin"
+    return TelemetryLogger(log_filename, binary=binary, echo=console_echo == "Rate Limited")
 
 class cyBot_Plugin(ProbePlugin):
     def __init__(self):
@@ -23,6 +41,7 @@ class cyBot_Plugin(ProbePlugin):
         self.add_setting_pre_connect(self.address)
         self.add_setting_pre_connect(self.port)
         self.add_setting_pre_connect(self.timeout)
+        add_telemetry_settings(self)
 
         # File Logging Setup
         self.log_filename = "cybot_data_log.txt"
@@ -33,7 +52,7 @@ class cyBot_Plugin(ProbePlugin):
             self.cybot.settimeout(self.timeout.value / 1000)
             self.cybot.connect((self.address.value, self.port.value))
             
-            print(f"Connected to cyBot at {self.address.value}:{self.port.value}")
+            log.info("Connected to cyBot at %s:%s", self.address.value, self.port.value)
             
             # Start the "Interrupt" Thread
             self.read_thread_cond = True
@@ -41,47 +60,37 @@ class cyBot_Plugin(ProbePlugin):
             self.read_thread.start()
             
         except Exception as e:
-            print(f"Failed to connect to cyBot: {e}")
+            log.error("Failed to connect to cyBot: %s", e)
             self.cybot = None
 
     def read_thread_interrupt(self):
         """
-        Acts as the interrupt handler. Continuously polls the socket
-        and logs data to both console and text file.
+        Acts as the interrupt handler. Continuously polls the socket and
+        hands raw data to the telemetry logger, which does the file and
+        console output on its own thread.
         """
-        print(f"Logging started. Saving to {self.log_filename}")
-        
-        # Open file in append mode ('a')
-        with open(self.log_filename, "a") as f:
-            f.write(f"\n--- Session Started: {datetime.now()} ---\n")
-            
+        log.info("Logging started. Saving to %s", self.log_filename)
+        self.telemetry = make_telemetry_logger(self.log_filename, self.log_format.value, self.console_echo.value)
+        self.telemetry.start()
+        try:
             while self.read_thread_cond:
                 try:
-                    
-                    data = self.cybot.recv(1024)
-                    
+                    data = self.cybot.recv(RECV_SIZE)
                     if data:
-                        
-                        decoded_data = data.decode('utf-8', errors='ignore').strip()
-                        timestamp = datetime.now().strftime("%H:%M:%S.%f")[:-3]
-                        log_entry = f"[{timestamp}] RX: {decoded_data}"
-
-                        print(log_entry)
-                        
-                        f.write(log_entry + "\n")
-                        f.flush()
+                        self.telemetry.feed(data)
                     else:
-                       
                         break
 
                 except socket.timeout:
                     continue 
                 except Exception as e:
                     if self.read_thread_cond:
-                        print(f"Read Error: {e}")
+                        log.error("Read Error: %s", e)
                     break
+        finally:
+            self.telemetry.stop()
                     
-        print("Logging thread stopped.")
+        log.info("Logging thread stopped.")
 
     def disconnect(self):
         self.read_thread_cond = False
@@ -94,7 +103,7 @@ class cyBot_Plugin(ProbePlugin):
                 self.cybot.close()
             except:
                 pass
-            print("Disconnected from cyBot.")
+            log.info("Disconnected from cyBot.")
 
     def send_command(self, cmd):
         if self.cybot:
@@ -120,6 +129,9 @@ class cyBot_Plugin(ProbePlugin):
     def scan_trigger_and_wait(self, scan_index, scan_location):
         return super().scan_trigger_and_wait(scan_index, scan_location)
 class motion_controller_plugin(MotionControllerPlugin):
+    # move_absolute() takes per axis offsets (rotate / drive by)
+    relative_moves = True
+
     def __init__(self):
         super().__init__()
 
@@ -131,6 +143,7 @@ class motion_controller_plugin(MotionControllerPlugin):
         self.add_setting_pre_connect(self.address)
         self.add_setting_pre_connect(self.port)
         self.add_setting_pre_connect(self.timeout)
+        add_telemetry_settings(self)
         self.log_filename = "cybot_data_log.txt"
         
     def connect(self):
@@ -139,54 +152,44 @@ class motion_controller_plugin(MotionControllerPlugin):
             self.cybot.settimeout(self.timeout.value / 1000)
             self.cybot.connect((self.address.value, self.port.value))
             
-            print(f"Connected to cyBot at {self.address.value}:{self.port.value}")
+            log.info("Connected to cyBot at %s:%s", self.address.value, self.port.value)
             
             self.read_thread_cond = True
             self.read_thread = threading.Thread(target=self.read_thread_interrupt, daemon=True)
             self.read_thread.start()
             
         except Exception as e:
-            print(f"Failed to connect to cyBot: {e}")
+            log.error("Failed to connect to cyBot: %s", e)
             self.cybot = None
         
     def read_thread_interrupt(self):
         """
-        Acts as the interrupt handler. Continuously polls the socket
-        and logs data to both console and text file.
+        Acts as the interrupt handler. Continuously polls the socket and
+        hands raw data to the telemetry logger, which does the file and
+        console output on its own thread.
         """
-        print(f"Logging started. Saving to {self.log_filename}")
-        
-        # Open file in append mode ('a')
-        with open(self.log_filename, "a") as f:
-            f.write(f"\n--- Session Started: {datetime.now()} ---\n")
-            
+        log.info("Logging started. Saving to %s", self.log_filename)
+        self.telemetry = make_telemetry_logger(self.log_filename, self.log_format.value, self.console_echo.value)
+        self.telemetry.start()
+        try:
             while self.read_thread_cond:
                 try:
-                    
-                    data = self.cybot.recv(1024)
-                    
+                    data = self.cybot.recv(RECV_SIZE)
                     if data:
-                        
-                        decoded_data = data.decode('utf-8', errors='ignore').strip()
-                        timestamp = datetime.now().strftime("%H:%M:%S.%f")[:-3]
-                        log_entry = f"[{timestamp}] RX: {decoded_data}"
-
-                        print(log_entry)
-                        
-                        f.write(log_entry + "\n")
-                        f.flush()
+                        self.telemetry.feed(data)
                     else:
-                       
                         break
 
                 except socket.timeout:
                     continue 
                 except Exception as e:
                     if self.read_thread_cond:
-                        print(f"Read Error: {e}")
+                        log.error("Read Error: %s", e)
                     break
+        finally:
+            self.telemetry.stop()
                     
-        print("Logging thread stopped.")
+        log.info("Logging thread stopped.")
 
     def disconnect(self):
         self.read_thread_cond = False
@@ -199,7 +202,7 @@ class motion_controller_plugin(MotionControllerPlugin):
                 self.cybot.close()
             except:
                 pass
-            print("Disconnected from cyBot.")
+            log.info("Disconnected from cyBot.")
     
     def get_axis_display_names(self) -> tuple[str, ...]:
         pass
@@ -226,9 +229,9 @@ class motion_controller_plugin(MotionControllerPlugin):
                                 value = float(parts[1].strip().split()[0])
                                 raw_values.append(value)
                             except Exception as e:
-                                print(f"Error occurred while reading file: {e}")
+                                log.warning("Error occurred while reading file: %s", e)
             if len(raw_values) < window_size:
-                print("Not enough data points for averaging.")
+                log.warning("Not enough data points for averaging.")
                 return None
             smoothed_data =[]
             for i in range(len(raw_values)):
@@ -238,7 +241,7 @@ class motion_controller_plugin(MotionControllerPlugin):
                 smoothed_data.append(round(average, 4))
             return smoothed_data
         except Exception as e:
-            print(f"Error occurred while reading file: {e}")
+            log.error("Error occurred while reading file: %s", e)
             return None
 
     def move_absolute(self, move_dist: dict[int, float]) -> dict[int, float] | None:
@@ -254,7 +257,7 @@ class motion_controller_plugin(MotionControllerPlugin):
             elif key == 1:  # Y Axis (movement)
                 prefix = "mb" if is_negative else "mf"
             else:
-                print(f"Warning: Unexpected dictionary key '{key}'.")
+                log.warning("Unexpected dictionary key '%s'.", key)
                 continue
 
            
@@ -266,7 +269,7 @@ class motion_controller_plugin(MotionControllerPlugin):
             if prefix == 'r':
                 command_buffer_2 = "10"+raw_value_str
                 
-            print(f"sending this command: {command_buffer_2}")
+            log.debug("sending this command: %s", command_buffer_2)
             self.send_gcode_command(command_buffer_2)
             
             
@@ -2,16 +2,18 @@
 import scanner.Plugins.fmcw_connection.radarControl as rc
 import scanner.Plugins.fmcw_connection.daqControl as dc
 import numpy as np
-import nidaqmx.system
-from nidaqmx.constants import (AcquisitionType, Edge, TriggerType)
-from nidaqmx.stream_readers import AnalogMultiChannelReader
+from scanner.scan_logging import get_logger
+
+log = get_logger("probe")
 
 class TRA_240_097:
     """Class for TRA_240-097 based FMCW radar. 
     To be used with NI USB-6363 to trigger sweep and collect IFI and IFQ differential outputs. 
     Refer to README.md for setup instructions."""
-    def __init__(self):
+    def __init__(self, daqBackend: dc.DaqBackend = None):
         self.dev = None
+        self.daq = None
+        self.daqBackend = daqBackend if daqBackend is not None else dc.NidaqmxBackend()
         #default radar parameters
         self.ftDevName = "TRA-240-097"
         self.MAX_FREQ_GHZ = 220
@@ -23,6 +25,9 @@ class TRA_240_097:
         self.daqSN = 31719907
         self.channels  = ["/ai2", "/ai3"]
         self.trigSrc = "/PFI8"
+        # trigger input for the pulses the motion controller sends at each scan point
+        self.extTrigSrc = "/PFI0"
+        self.externalTrigger = False
         self.sampleRate = 1e6
         self.daqMaxSampleRate = 2e6
         return
@@ -31,7 +36,7 @@ class TRA_240_097:
         self.dev = rc.getFTDevByDesc("TRA-240-097")
         rc.initFtdiSPI(self.dev)
         rc.setGPIOH(self.dev, 0x3D)
-        print(kwargs)
+        log.debug("Radar parameters: %s", kwargs)
         if kwargs:
             self.sampleRate = int(round(1/(int(kwargs['sweepTime_ms'])*1e-3/int(kwargs['nFreqPoints']))))
             if(self.sampleRate > self.daqMaxSampleRate):
@@ -39,18 +44,44 @@ class TRA_240_097:
             self.fVec = rc.writePll(self.dev, **kwargs)
         else:
             rc.initPll(self.dev, radarFreqGHz=self.MAX_FREQ_GHZ)
-        self.daqName = dc.getDAQDeviceName(self.daqSN)
+        self.daqName = self.daqBackend.getDeviceName(self.daqSN)
+        self.nFreqPoints = int(kwargs['nFreqPoints']) if kwargs else self.nFreq
+        self.openDaq(external=False)
         return
 
+    def openDaq(self, external: bool):
+        """(Re)open the DAQ session, sweeps triggered by the DAQ itself or by an external line"""
+        if self.daq:
+            self.daq.close()
+        trigSrc = self.extTrigSrc if external else self.trigSrc
+        # tasks are configured once here and retriggered for every measurement
+        self.daq = dc.DaqAcquisition(self.daqName, self.sampleRate, self.nFreqPoints, trigSrc, *self.channels,
+                                     backend=self.daqBackend, externalTrigger=external)
+        self.daq.open()
+        self.externalTrigger = external
+
+    def armTriggered(self, nTriggers):
+        """Start waiting for nTriggers external trigger edges, before the motion that makes them starts"""
+        if not self.externalTrigger:
+            self.openDaq(external=True)
+        self.daq.startTriggered(nTriggers)
+
+    def collectTriggered(self, timeout=None):
+        """The (nTriggers x nFreq) I - jQ array for the sweeps armed with armTriggered"""
+        return self.daq.finishTriggered(timeout)
+
+    def measureTriggered(self, kwargs, nTriggers):
+        """Wait for nTriggers external trigger edges and return an (nTriggers x nFreq) I - jQ array"""
+        self.armTriggered(nTriggers)
+        return self.collectTriggered()
+
     def measure(self, kwargs):
-        data = []
-        nAvgs = 1
-        for i in range(nAvgs):
-            data.append(dc.readNIDaq(self.daqName, self.sampleRate, int(kwargs['nFreqPoints']), self.trigSrc, *self.channels))
-        data = np.mean(data, 0)
-        return data
+        """Trigger one sweep and return I - jQ. The array is reused by the next call, copy it to keep it"""
+        return self.daq.readComplex()
 
     def close(self, kwargs):
+        if self.daq:
+            self.daq.close()
         self.dev.close()
         return
 
@@ -1,8 +1,14 @@
-import nidaqmx
-import nidaqmx.system
-from nidaqmx.constants import (AcquisitionType, Edge, TriggerType, TerminalConfiguration)
-from nidaqmx.stream_readers import AnalogMultiChannelReader
+from abc import ABC, abstractmethod
+import threading
 import numpy as np
+try:
+    import nidaqmx
+    import nidaqmx.system
+    from nidaqmx.constants import (AcquisitionType, Edge, TriggerType, TerminalConfiguration)
+    from nidaqmx.stream_readers import AnalogMultiChannelReader
+except ImportError:
+    # NI-DAQmx is only needed for real hardware, FakeDaqBackend works without it
+    nidaqmx = None
 
 def getDAQDeviceName(DAQ_SN:int):
     system = nidaqmx.system.System.local()
@@ -48,3 +54,304 @@ def readNIDaq(devName:str, sampleRate: int, samplesPerCh: int, trigSrc:str, *cha
         read_task.stop()
         s11 = data_array[0, :] - 1j * data_array[1, :]
     return s11
+
+
+
+class DaqBackend(ABC):
+    """Hardware layer used by DaqAcquisition"""
+
+    @abstractmethod
+    def getDeviceName(self, DAQ_SN: int) -> str:
+        pass
+
+    @abstractmethod
+    def configure(self, devName: str, sampleRate: int, samplesPerCh: int, trigSrc: str, channels, continuous: bool, external: bool = False):
+        """Create and configure the read/trigger tasks, called once per session.
+        With external the trigger line is driven by other hardware and no output task is made"""
+        pass
+
+    @abstractmethod
+    def start(self):
+        pass
+
+    @abstractmethod
+    def trigger(self):
+        """Put one rising edge on the trigger line"""
+        pass
+
+    @abstractmethod
+    def readInto(self, buffer: np.ndarray):
+        """Read buffer.shape[1] samples per channel into buffer (nCh x samplesPerCh)"""
+        pass
+
+    @abstractmethod
+    def stop(self):
+        pass
+
+    @abstractmethod
+    def close(self):
+        pass
+
+    def setBufferSize(self, samplesPerCh: int):
+        """Make the read buffer hold at least samplesPerCh samples per channel,
+        enough for a burst of externally triggered sweeps"""
+        pass
+
+
+class NidaqmxBackend(DaqBackend):
+    """NI-DAQmx backend, tasks are created once and the read task is retriggerable"""
+
+    def __init__(self):
+        if nidaqmx is None:
+            raise(Exception("nidaqmx is not installed, use FakeDaqBackend to run without NI hardware"))
+        self.read_task = None
+        self.trigger_task = None
+        self.reader = None
+
+    def getDeviceName(self, DAQ_SN: int) -> str:
+        return getDAQDeviceName(DAQ_SN)
+
+    def configure(self, devName, sampleRate, samplesPerCh, trigSrc, channels, continuous, external=False):
+        multiChannelStr = ", ".join([devName + channel for channel in channels])
+        trigChan = devName + trigSrc
+
+        if not external:
+            self.trigger_task = nidaqmx.Task()
+            self.trigger_task.do_channels.add_do_chan(trigChan)
+
+        self.read_task = nidaqmx.Task()
+        self.read_task.ai_channels.add_ai_voltage_chan(multiChannelStr, terminal_config=TerminalConfiguration.DIFF)
+        if continuous:
+            # host buffer holds several sweeps so reads can lag the hardware a little
+            self.read_task.timing.cfg_samp_clk_timing(rate = sampleRate,
+                active_edge=Edge.RISING, sample_mode=AcquisitionType.CONTINUOUS, samps_per_chan= 8*int(samplesPerCh))
+        else:
+            self.read_task.timing.cfg_samp_clk_timing(rate = sampleRate,
+                active_edge=Edge.RISING, sample_mode=AcquisitionType.FINITE, samps_per_chan= int(samplesPerCh))
+
+        self.read_task.triggers.start_trigger.trig_type = TriggerType.DIGITAL_EDGE
+        self.read_task.triggers.start_trigger.dig_edge_edge = Edge.RISING
+        self.read_task.triggers.start_trigger.retriggerable = not continuous
+        self.read_task.triggers.start_trigger.dig_edge_src = "/" + trigChan
+
+        self.reader = AnalogMultiChannelReader(self.read_task.in_stream)
+        if self.trigger_task is not None:
+            self.trigger_task.write(False)
+
+    def start(self):
+        self.read_task.start()
+
+    def trigger(self):
+        if self.trigger_task is None:
+            raise(Exception("Trigger line is externally driven, no software trigger available"))
+        self.trigger_task.write(False)
+        self.trigger_task.write(True)
+
+    def readInto(self, buffer):
+        self.reader.read_many_sample(buffer, number_of_samples_per_channel=buffer.shape[1])
+
+    def setBufferSize(self, samplesPerCh):
+        # a row of sweeps arrives faster than it is read out, the buffer must hold all of them
+        if self.read_task.in_stream.input_buf_size < samplesPerCh:
+            self.read_task.stop()
+            self.read_task.in_stream.input_buf_size = int(samplesPerCh)
+            self.read_task.start()
+
+    def stop(self):
+        self.read_task.stop()
+
+    def close(self):
+        for task in (self.read_task, self.trigger_task):
+            if task is not None:
+                task.close()
+        self.read_task = None
+        self.trigger_task = None
+
+
+class FakeDaqBackend(DaqBackend):
+    """Software stand-in for the NI DAQ, returns an I/Q beat tone plus noise.
+    Finite reads fail like a hardware timeout if no trigger was sent. In
+    external mode trigger() stands in for an edge from other hardware and
+    reads wait up to externalTimeout seconds for it."""
+
+    def __init__(self, beatFreqHz: float = 50e3, noise: float = 0.0, seed=None, externalTimeout: float = 2.0):
+        self.beatFreqHz = beatFreqHz
+        self.noise = noise
+        self.rng = np.random.default_rng(seed)
+        self.configureCount = 0
+        self.triggerCount = 0
+        self.readCount = 0
+        self.running = False
+        self.closed = False
+        self.external = False
+        self.externalTimeout = externalTimeout
+        self.bufferSize = 0
+        self._pendingTriggers = 0
+        self._triggered = threading.Condition()
+
+    def getDeviceName(self, DAQ_SN: int) -> str:
+        return "FakeDev1"
+
+    def configure(self, devName, sampleRate, samplesPerCh, trigSrc, channels, continuous, external=False):
+        self.configureCount += 1
+        self.continuous = continuous
+        self.external = external
+        self.bufferSize = int(samplesPerCh)
+        t = np.arange(int(samplesPerCh)) / sampleRate
+        phase = 2*np.pi*self.beatFreqHz*t
+        # channel 0 is I, channel 1 is Q, any extra channels are left at zero
+        self._template = np.zeros((len(channels), int(samplesPerCh)))
+        self._template[0] = np.cos(phase)
+        if len(channels) > 1:
+            self._template[1] = -np.sin(phase)
+
+    def start(self):
+        self.running = True
+
+    def trigger(self):
+        with self._triggered:
+            self.triggerCount += 1
+            self._pendingTriggers += 1
+            self._triggered.notify_all()
+
+    def setBufferSize(self, samplesPerCh):
+        self.bufferSize = max(self.bufferSize, int(samplesPerCh))
+
+    def readInto(self, buffer):
+        if not self.running:
+            raise(Exception("Fake DAQ task is not running"))
+        if not self.continuous:
+            with self._triggered:
+                if self.external:
+                    self._triggered.wait_for(lambda: self._pendingTriggers > 0 or not self.running, self.externalTimeout)
+                if not self.running:
+                    raise(Exception("Fake DAQ task was stopped during a read"))
+                if self._pendingTriggers == 0:
+                    raise TimeoutError("Fake DAQ read timed out waiting for a trigger")
+                self._pendingTriggers -= 1
+        np.copyto(buffer, self._template)
+        if self.noise:
+            buffer += self.noise * self.rng.standard_normal(buffer.shape)
+        self.readCount += 1
+
+    def stop(self):
+        # like DAQmx, stopping the task aborts a read waiting on a trigger
+        with self._triggered:
+            self.running = False
+            self._triggered.notify_all()
+
+    def close(self):
+        self.stop()
+        self.closed = True
+
+
+class DaqAcquisition:
+    """Persistent triggered acquisition session.
+
+    The DAQ tasks are configured once in open(). In finite mode every read()
+    retriggers the armed task and reads into the same preallocated buffer;
+    in continuous mode the task free-runs and reads cycle through a ring of
+    nBuffers buffers. read() and readComplex() return views into those
+    buffers, which stay valid until the ring comes back around to them.
+    """
+
+    def __init__(self, devName: str, sampleRate: int, samplesPerCh: int, trigSrc: str, *channels, backend: DaqBackend = None, continuous: bool = False, nBuffers: int = 1, externalTrigger: bool = False):
+        self.devName = devName
+        self.sampleRate = sampleRate
+        self.samplesPerCh = int(samplesPerCh)
+        self.trigSrc = trigSrc
+        self.channels = list(channels)
+        self.backend = backend if backend is not None else NidaqmxBackend()
+        self.continuous = continuous
+        self.externalTrigger = externalTrigger
+        self.nBuffers = max(1, int(nBuffers))
+        self.isOpen = False
+        self._next = 0
+        self._triggeredReader = None
+
+    def open(self):
+        self._buffers = np.zeros((self.nBuffers, len(self.channels), self.samplesPerCh), dtype=np.float64)
+        self._iq = np.zeros((self.nBuffers, self.samplesPerCh), dtype=np.complex128)
+        self._next = 0
+        self.backend.configure(self.devName, self.sampleRate, self.samplesPerCh, self.trigSrc, self.channels, self.continuous, self.externalTrigger)
+        self.backend.start()
+        if self.continuous and not self.externalTrigger:
+            self.backend.trigger()
+        self.isOpen = True
+
+    def read(self) -> np.ndarray:
+        """Acquire one sweep, returns a (nCh x samplesPerCh) view of the ring"""
+        if not self.isOpen:
+            raise(Exception("DAQ acquisition session is not open"))
+        ind = self._next
+        if not self.continuous and not self.externalTrigger:
+            self.backend.trigger()
+        self.backend.readInto(self._buffers[ind])
+        self._next = (ind + 1) % self.nBuffers
+        self._lastInd = ind
+        return self._buffers[ind]
+
+    def readComplex(self) -> np.ndarray:
+        """Acquire one sweep as I - jQ from the first two channels, same as readNIDaq"""
+        data = self.read()
+        iq = self._iq[self._lastInd]
+        iq.real = data[0]
+        iq.imag = -data[1]
+        return iq
+
+    def startTriggered(self, nTriggers: int):
+        """Start collecting nTriggers externally triggered sweeps in a reader
+        thread. Call before the triggers can arrive (before the motion starts),
+        the buffer is sized for all of them so none are overwritten while the
+        reader catches up. finishTriggered() returns the sweeps."""
+        if not self.externalTrigger:
+            raise(Exception("DAQ session was not opened for external triggers"))
+        if self._triggeredReader is not None:
+            raise(Exception("Triggered read already in progress"))
+        nTriggers = int(nTriggers)
+        self.backend.setBufferSize(nTriggers * self.samplesPerCh)
+        out = np.empty((nTriggers, self.samplesPerCh), dtype=np.complex128)
+        result = {"out": out, "error": None}
+
+        def collect():
+            try:
+                for ind in range(nTriggers):
+                    out[ind] = self.readComplex()
+            except BaseException as e:
+                result["error"] = e
+
+        thread = threading.Thread(target=collect, name="daq-triggered-read", daemon=True)
+        self._triggeredReader = (thread, result)
+        thread.start()
+
+    def finishTriggered(self, timeout: float = None) -> np.ndarray:
+        """Wait for the reader from startTriggered(), returns a new (nTriggers x samplesPerCh) I - jQ array"""
+        if self._triggeredReader is None:
+            raise(Exception("No triggered read in progress"))
+        thread, result = self._triggeredReader
+        thread.join(timeout)
+        if thread.is_alive():
+            # stopping the task aborts the reader's blocked read, then re-arm for the next row
+            self.backend.stop()
+            thread.join()
+            self._triggeredReader = None
+            self.backend.start()
+            raise TimeoutError("Triggered DAQ read did not finish, triggers were missed")
+        self._triggeredReader = None
+        if result["error"] is not None:
+            raise result["error"]
+        return result["out"]
+
+    def readTriggeredComplex(self, nTriggers: int) -> np.ndarray:
+        """Collect nTriggers externally triggered sweeps as a new (nTriggers x samplesPerCh) I - jQ array.
+        Blocks until they are all in, startTriggered() lets the motion run meanwhile"""
+        self.startTriggered(nTriggers)
+        return self.finishTriggered()
+
+    def close(self):
+        if self.isOpen:
+            try:
+                self.backend.stop()
+            finally:
+                self.isOpen = False
+                self.backend.close()
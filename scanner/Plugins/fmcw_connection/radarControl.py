@@ -1,7 +1,12 @@
 import time
-import ftd2xx as ftd
+import functools
 import numpy as np
 import inspect
+try:
+    import ftd2xx as ftd
+except ImportError:
+    # only needed to open real devices, FakeFtdiDevice works without it
+    ftd = None
 
 #ADF4159 PLL Constants
 SINGLE_SAW_TOOTH = 2
@@ -60,6 +65,13 @@ set_clk_divisor = 0x86
 FT_BITMODE_MPSSE = 0x02
 FT_BITMODE_RESET = 0x00
 
+# MPSSE bytes for one 32 bit PLL register write: CS low, clock out 4 bytes, CS high
+# data bytes go in at REG_WRITE_DATA
+REG_WRITE_TEMPLATE = np.array([set_data_bytes_low_b, value_byte_low & ~CS & 0xff, dir_byte_low,
+                               clk_data_out_neg_ve, 3, 0, 0, 0, 0, 0,
+                               set_data_bytes_low_b, value_byte_low, dir_byte_low], dtype=np.uint8)
+REG_WRITE_DATA = slice(6, 10)
+
 def set_spi_clock(d, hz):
     """Set SPI clock rate"""
     div = int((60e6 / (hz * 2)) - 1) 
@@ -82,6 +94,26 @@ def ft_write_cmd_bytes(d, cmd, data):
     n = len(data) - 1
     ft_write(d, [cmd, n % 256, n // 256] + list(data))
 
+class FakeFtdiDevice:
+    """Stand-in for an ftd2xx device, records every transfer in writes"""
+    def __init__(self):
+        self.writes = []
+
+    def write(self, data):
+        self.writes.append(bytes(data))
+        return len(data)
+
+    def read(self, nbytes):
+        return bytes(nbytes)
+
+    def resetDevice(self): pass
+    def setUSBParameters(self, inSize, outSize): pass
+    def setChars(self, evch, evch_en, erch, erch_en): pass
+    def setTimeouts(self, read, write): pass
+    def setLatencyTimer(self, latency): pass
+    def setBitMode(self, mask, mode): pass
+    def close(self): pass
+
 def bytesToString(data):
     return "b'" + ''.join('\\x{:02x}'.format(byte) for byte in data) + "'"
 
@@ -107,7 +139,7 @@ def openFTDevByDesc_sn(descriptor:str, sn:int):
         raise(Exception(f"FTDI Device {descriptor} SN:{sn} not found"))
     return radar
         
-def initFtdiSPI(device:ftd.FTD2XX, spi_clk_Hz = 1e6):
+def initFtdiSPI(device:"ftd.FTD2XX", spi_clk_Hz = 1e6):
     """initialize fdti cable for SPI"""
     device.resetDevice()
     device.setUSBParameters(65536, 65536)
@@ -123,13 +155,21 @@ def setGPIOH(device, value_byte):
     """sets gpio high byte"""
     ft_write(device, (set_data_bytes_high_b, value_byte, dir_byte_high))
 
+def packRegTable(regs) -> np.ndarray:
+    """packs a (nSteps x nRegs) table of 32 bit pll registers into one MPSSE write buffer per row"""
+    regs = np.atleast_2d(np.asarray(regs, dtype=np.int64)).astype(np.uint32)
+    table = np.empty(regs.shape + (REG_WRITE_TEMPLATE.size,), dtype=np.uint8)
+    table[...] = REG_WRITE_TEMPLATE
+    table[..., REG_WRITE_DATA] = regs.astype(">u4").view(np.uint8).reshape(regs.shape + (4,))
+    return table.reshape(regs.shape[0], -1)
+
+def packRadarWrite(*cmds) -> bytes:
+    """MPSSE byte stream that writes all cmds to the pll"""
+    return packRegTable([cmds])[0].tobytes()
+
 def writeRadar(device, *cmds):
-    """writes 32 bit command to the radar board pll"""
-    for cmd in cmds:
-        cmd = list(cmd.to_bytes(4, 'big'))
-        ft_write(device, (set_data_bytes_low_b, value_byte_low & ~CS , dir_byte_low))
-        ft_write_cmd_bytes(device, clk_data_out_neg_ve, cmd)
-        ft_write(device, (set_data_bytes_low_b, value_byte_low, dir_byte_low))
+    """writes 32 bit commands to the radar board pll in a single transfer"""
+    ft_write(device, packRadarWrite(*cmds))
 
 def getFpfd(**kwargs):
    """Get Frequency of PFD"""
@@ -216,10 +256,31 @@ def initPll(radar, radarFreqGHz: float, **kwargs):
 
 def setFreq(radar, radarFreqGHz: float, **kwargs):
     """ update the int + frac values in registers 0 and 1, To be used to after initializing PLL with initPll()"""
-    [N, Fmsb, Flsb, kwargs] = getIntFrac(radarFreqGHz)
-    r0 = getR0(N, Fmsb, rampOn = False)
-    r1 = getR1(Flsb, **kwargs)
-    writeRadar(radar, *[r1, r0])
+    ft_write(radar, getFreqStepTable((radarFreqGHz,), **kwargs)[0])
+
+def writeFreqStep(radar, stepTable: np.ndarray, step: int):
+    """writes one precomputed row of getFreqStepTable()"""
+    ft_write(radar, stepTable[step])
+
+def getFreqStepTable(freqsGHz, **kwargs) -> np.ndarray:
+    """R1 + R0 writes for every frequency, packed one row per step. Cached by frequencies and kwargs"""
+    return _cachedFreqStepTable(tuple(float(f) for f in np.ravel(freqsGHz)), tuple(sorted(kwargs.items())))
+
+@functools.lru_cache(maxsize=32)
+def _cachedFreqStepTable(freqsGHz: tuple, params: tuple) -> np.ndarray:
+    kwargs = dict(params)
+    kwargs["rampOn"] = False
+    # same arithmetic as getIntFrac, on the whole frequency vector
+    fpfd = getFpfd(**kwargs)
+    ratio = np.asarray(freqsGHz)/kwargs.get("extPrescale", 72)*1e9/fpfd
+    INT = ratio.astype(np.int64)
+    Fmsb = ((ratio - INT) * 2**12).astype(np.int64)
+    Flsb = ((((ratio - INT) * 2**12) - Fmsb) * 2**13).astype(np.int64)
+    kwargs.update({"INT": INT, "Fmsb": Fmsb, "Flsb": Flsb})
+    regs = np.stack([np.broadcast_to(getR1(**kwargs), INT.shape), np.broadcast_to(getR0(**kwargs), INT.shape)], axis=1)
+    table = packRegTable(regs)
+    table.flags.writeable = False
+    return table
 
 def getPllSweepKwargs(**kwargs):
     kwargs["STEP_WORD"] = int(kwargs["nFreqPoints"])
@@ -246,8 +307,13 @@ def getPllSweepKwargs(**kwargs):
     kwargs["rampOn"] = True
     return kwargs
 
-def writePll(radar:ftd.FTD2XX, startFreqGHz:float = 220, stopFreqGHz:float = 269.5, nFreqPoints:int = 201, sweepTime_ms:float = 1, rampDelay_us:float = 10, refIn:float = 50e6, extPrescale:int = 72, **kwargs):
-    """ generates and writes spi commands to program pll for sweep operation"""
+def writePll(radar:"ftd.FTD2XX", startFreqGHz:float = 220, stopFreqGHz:float = 269.5, nFreqPoints:int = 201, sweepTime_ms:float = 1, rampDelay_us:float = 10, refIn:float = 50e6, extPrescale:int = 72, **kwargs):
+    """ writes the spi commands that program the pll for sweep operation in one transfer"""
+    ft_write(radar, getSweepProgram(startFreqGHz, stopFreqGHz, nFreqPoints, sweepTime_ms, rampDelay_us, refIn, extPrescale, **kwargs))
+    return
+
+def getSweepProgram(startFreqGHz:float = 220, stopFreqGHz:float = 269.5, nFreqPoints:int = 201, sweepTime_ms:float = 1, rampDelay_us:float = 10, refIn:float = 50e6, extPrescale:int = 72, **kwargs) -> bytes:
+    """packed MPSSE bytes for a full sweep program, cached by sweep parameters"""
     kwargs.update({"startFreqGHz":startFreqGHz,
                    "stopFreqGHz": stopFreqGHz,
                    "nFreqPoints": nFreqPoints,
@@ -255,10 +321,18 @@ def writePll(radar:ftd.FTD2XX, startFreqGHz:float = 220, stopFreqGHz:float = 269
                    "rampDelay_us": rampDelay_us,
                    "extPrescale":extPrescale,
                    "refIn": refIn})
+    return _cachedSweepProgram(tuple(sorted(kwargs.items())))
+
+@functools.lru_cache(maxsize=32)
+def _cachedSweepProgram(params: tuple) -> bytes:
+    kwargs = dict(params)
     kwargs.update(getPllSweepKwargs(**kwargs))
-    kwargs.update(getIntFrac(float(startFreqGHz)))
-    writeRadar(radar,*getAllRegs(**kwargs))
-    return
+    kwargs.update(getIntFrac(float(kwargs["startFreqGHz"])))
+    return packRadarWrite(*getAllRegs(**kwargs))
+
+def clearPllPlanCache():
+    _cachedSweepProgram.cache_clear()
+    _cachedFreqStepTable.cache_clear()
 
 def getAllRegs(**kwargs):
     r0 = getR0(**kwargs)
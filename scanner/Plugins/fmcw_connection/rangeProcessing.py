@@ -0,0 +1,89 @@
+## range processing for the FMCW radar beat signal
+import numpy as np
+
+SPEED_OF_LIGHT = 299792458.0
+
+WINDOWS = {
+    "None": np.ones,
+    "Hann": np.hanning,
+    "Hamming": np.hamming,
+    "Blackman": np.blackman,
+}
+
+
+class RangeProcessor:
+    """Windowing, zero padded range FFT, background subtraction and range gating.
+
+    process() works on any array whose last axis is the nSamples beat signal,
+    so channels and buffered scan points are processed in one call.
+    """
+
+    def __init__(self, nSamples: int, startFreqGHz: float, stopFreqGHz: float, window: str = "Hann", zeroPadFactor: int = 4, rangeMin_m: float = 0.0, rangeMax_m: float | None = None):
+        self.nSamples = int(nSamples)
+        self.bandwidthHz = (float(stopFreqGHz) - float(startFreqGHz)) * 1e9
+        if window not in WINDOWS:
+            raise ValueError(f"Window must be one of {list(WINDOWS)}.")
+        self.window = WINDOWS[window](self.nSamples)
+        # scale so a full scale tone has the same peak for every window
+        self.window /= self.window.sum()
+        self.nfft = int(2**np.ceil(np.log2(self.nSamples * max(1, int(zeroPadFactor)))))
+        self.background = None
+
+        # one sweep is nSamples long, so the bin spacing only depends on the bandwidth
+        allRanges = SPEED_OF_LIGHT * np.arange(self.nfft // 2) * self.nSamples / (2 * self.bandwidthHz * self.nfft)
+        rangeMax_m = allRanges[-1] if rangeMax_m is None else rangeMax_m
+        gate = np.flatnonzero((allRanges >= rangeMin_m) & (allRanges <= rangeMax_m))
+        if gate.size == 0:
+            raise ValueError(f"Range gate {rangeMin_m} - {rangeMax_m} m contains no range bins.")
+        self.gate = slice(gate[0], gate[-1] + 1)
+        self.ranges_m = allRanges[self.gate]
+
+    def set_background(self, background):
+        """Beat signal subtracted before the FFT, broadcast against the input (None to disable)"""
+        self.background = None if background is None else np.asarray(background, dtype=complex)
+
+    def process(self, iq) -> np.ndarray:
+        """(..., nSamples) complex beat signal -> (..., nRanges) complex range profiles"""
+        iq = np.asarray(iq)
+        if iq.shape[-1] != self.nSamples:
+            raise ValueError(f"Expected {self.nSamples} samples per sweep, got {iq.shape[-1]}.")
+        if self.background is not None:
+            iq = iq - self.background
+        spectrum = np.fft.fft(iq * self.window, n=self.nfft, axis=-1)
+        return spectrum[..., self.gate]
+
+
+def writeRangeProfiles(hdf5File, channelNames, processor: RangeProcessor, subtractMean: bool = False, chunkPoints: int = 4096):
+    """Range processes the raw /Data/<ch>_real/_imag datasets of a scan file in
+    chunks of points and writes /RangeProfiles/<ch>_real/_imag plus the range axis"""
+    group = hdf5File.require_group("/RangeProfiles")
+    if "Range_m" in group:
+        del group["Range_m"]
+    group.create_dataset("Range_m", data=processor.ranges_m)
+    group.attrs["nfft"] = processor.nfft
+    group.attrs["backgroundSubtracted"] = bool(subtractMean)
+
+    for name in channelNames:
+        real = hdf5File[f"/Data/{name}_real"]
+        imag = hdf5File[f"/Data/{name}_imag"]
+        numPoints = real.shape[0]
+
+        processor.set_background(None)
+        if subtractMean and numPoints:
+            total = np.zeros(processor.nSamples, dtype=complex)
+            for start in range(0, numPoints, chunkPoints):
+                stop = min(start + chunkPoints, numPoints)
+                total += real[start:stop].sum(axis=0) + 1j * imag[start:stop].sum(axis=0)
+            processor.set_background(total / numPoints)
+
+        for part in ("real", "imag"):
+            if f"{name}_{part}" in group:
+                del group[f"{name}_{part}"]
+        outReal = group.create_dataset(f"{name}_real", (numPoints, processor.ranges_m.size), dtype="float64")
+        outImag = group.create_dataset(f"{name}_imag", (numPoints, processor.ranges_m.size), dtype="float64")
+        for start in range(0, numPoints, chunkPoints):
+            stop = min(start + chunkPoints, numPoints)
+            profiles = processor.process(real[start:stop] + 1j * imag[start:stop])
+            outReal[start:stop] = profiles.real
+            outImag[start:stop] = profiles.imag
+    processor.set_background(None)
@@ -7,6 +7,10 @@ import scanner.Plugins.VNA_List_Sparams as VNA_List_Sparams
 import re
 import numpy as np
 import scanner.Plugins.fmcw_connection.TRA_240_097 as fmcw_connection   
+import scanner.Plugins.fmcw_connection.rangeProcessing as rangeProcessing
+from scanner.scan_logging import get_logger
+
+log = get_logger("probe")
 
 class fmcw_Plugin(ProbePlugin):
     def __init__(self):
@@ -19,6 +23,17 @@ class fmcw_Plugin(ProbePlugin):
         self.startFreqGHz = PluginSettingFloat("Start Frequency (GHz)", 220.0)
         self.stopFreqGHz = PluginSettingFloat("Stop Frequency (GHz)", 269.5)
         self.sweepTime_ms = PluginSettingInteger("Sweep Time (ms)", 1)
+        self.rangeWindow = PluginSettingString(
+            "Range Window", "Hann",
+            select_options=list(rangeProcessing.WINDOWS), restrict_selections=True
+        )
+        self.zeroPadFactor = PluginSettingInteger("Range FFT Zero Pad Factor", 4, value_min=1)
+        self.rangeMin_m = PluginSettingFloat("Range Gate Min (m)", 0.0, value_min=0.0)
+        self.rangeMax_m = PluginSettingFloat("Range Gate Max (m)", 2.0, value_min=0.0)
+        self.backgroundMode = PluginSettingString(
+            "Background Subtraction", "None",
+            select_options=["None", "Scan Mean"], restrict_selections=True
+        )
         ## Need to write 
         ## self.adress =- 
         ## self.timeout = PluginSettingInteger("Timeout (ms)", )
@@ -26,6 +41,11 @@ class fmcw_Plugin(ProbePlugin):
         self.add_setting_pre_connect(self.startFreqGHz)
         self.add_setting_pre_connect(self.stopFreqGHz)
         self.add_setting_pre_connect(self.sweepTime_ms)
+        self.add_setting_post_connect(self.rangeWindow)
+        self.add_setting_post_connect(self.zeroPadFactor)
+        self.add_setting_post_connect(self.rangeMin_m)
+        self.add_setting_post_connect(self.rangeMax_m)
+        self.add_setting_post_connect(self.backgroundMode)
         #self.add_setting_pre_connect(self.address)
         #self.add_setting_pre_connect(self.timeout)
         
@@ -38,7 +58,7 @@ class fmcw_Plugin(ProbePlugin):
         self.fmcw.initialize(self.kwargs)
         
         self.selected_params = self.fmcw.get_channel_names(self.kwargs)
-        print("Initiallized FMCW radar")
+        log.info("Initiallized FMCW radar")
 
     
     def disconnect(self):
@@ -49,16 +69,8 @@ class fmcw_Plugin(ProbePlugin):
     
     def get_xaxis_coords(self):
         
-        #raw = #raw freq data coords 
-        raw = self.fmcw.get_frequency_vector_GHz(self.kwargs)
-        print(raw)
-        if raw.startswith("#"):
-            hdr_digits = int(raw[1])           
-            raw = raw[2 + hdr_digits:]         
-
-        
-        parts = re.split(r"[,\s]+", raw.strip())
-        return tuple(map(float, parts))
+        freqsGHz = self.fmcw.get_frequency_vector_GHz(self.kwargs)
+        return tuple(f * 1e9 for f in freqsGHz)
     
     def get_xaxis_units(self):
         return "Hz"
@@ -78,7 +90,17 @@ class fmcw_Plugin(ProbePlugin):
         pass
 
     def scan_end(self):
-        pass
+        if self.fmcw.externalTrigger:
+            self.fmcw.openDaq(external=False)
+
+    def scan_arm_triggers(self, num_triggers, scan_locations=None):
+        """Switch the DAQ to the external trigger input and start reading, the
+        sweeps are started by the motion controller's trigger output"""
+        self.fmcw.armTriggered(int(num_triggers))
+
+    def scan_read_triggered(self):
+        iq = self.fmcw.collectTriggered()
+        return {name: iq for name in self.get_channel_names()}
 
     def _strip_block(self, raw):
         if raw.startswith("#"):
@@ -86,12 +108,17 @@ class fmcw_Plugin(ProbePlugin):
         return re.split(r"[,\s]+", raw.strip())
 
     def scan_read_measurement(self, scan_index=None, scan_location=None):
-        results = {}
-        for idx, name in enumerate(self.get_channel_names(), start=1):
-           
-            raw = self.fmcw.measure(self.kwargs)
-            tokens = self._strip_block(raw)
-            vals = list(map(float, tokens))
-            results[name] = np.array([complex(vals[i], vals[i+1])
-                            for i in range(0, len(vals), 2)])
-        return results
\ No newline at end of file
+        # measure() hands out the DAQ session's buffer, copy it before the next sweep reuses it
+        iq = np.array(self.fmcw.measure(self.kwargs))
+        return {name: iq for name in self.get_channel_names()}
+
+    def get_range_processor(self):
+        return rangeProcessing.RangeProcessor(
+            int(self.kwargs["nFreqPoints"]), float(self.kwargs["startFreqGHz"]), float(self.kwargs["stopFreqGHz"]),
+            window=self.rangeWindow.value, zeroPadFactor=self.zeroPadFactor.value,
+            rangeMin_m=self.rangeMin_m.value, rangeMax_m=self.rangeMax_m.value)
+
+    def scan_postprocess(self, hdf5_file):
+        """Store range profiles next to the raw beat signal so imaging doesn't redo the FFTs"""
+        rangeProcessing.writeRangeProfiles(hdf5_file, self.get_channel_names(), self.get_range_processor(),
+                                           subtractMean=self.backgroundMode.value == "Scan Mean")
\ No newline at end of file
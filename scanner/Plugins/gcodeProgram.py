@@ -0,0 +1,194 @@
+###############
+#  Scan pattern -> G-code compiler.
+#
+#  Turns a (3, N) pattern matrix into one relative (G91) G-code program:
+#  zero length moves are dropped, consecutive collinear moves between
+#  measurement points are merged, the feedrate is set per segment and a
+#  sync block (M400, an M42 pin pulse or a G4 dwell) is placed at every
+#  sample point. The program is streamed once and the host only syncs on
+#  the sample points.
+###############
+import numpy as np
+
+SYNC_MODES = ("M400", "M42", "G4")
+AXIS_LETTERS = "XYZ"
+
+
+def _fmt(value: float, decimals: int) -> str:
+    text = f"{value:.{decimals}f}"
+    if "." in text:
+        text = text.rstrip("0").rstrip(".")
+    return "0" if text in ("-0", "") else text
+
+
+class GcodeProgram:
+    """A compiled scan.
+
+    moves is an (M, 3) array of relative X/Y/Z moves in mm, feedrates the
+    feedrate of each move in mm/min. sample_after_move[s] is the number of
+    moves done before sample s is taken and sample_points[s] the pattern
+    column it belongs to.
+    """
+
+    def __init__(self, moves, feedrates, sample_after_move, sample_points, sync: str = "M400", pin: int | None = None,
+                 dwell_ms: float = 0, decimals: int = 4) -> None:
+        if sync not in SYNC_MODES:
+            raise ValueError(f"Sync mode must be one of {SYNC_MODES}.")
+        if sync == "M42" and pin is None:
+            raise ValueError("M42 sync needs the trigger pin number.")
+        self.moves = np.asarray(moves, dtype=float).reshape(-1, 3)
+        self.feedrates = np.asarray(feedrates, dtype=float)
+        self.sample_after_move = np.asarray(sample_after_move, dtype=np.int64)
+        self.sample_points = np.asarray(sample_points, dtype=np.int64)
+        self.sync = sync
+        self.pin = pin
+        self.dwell_ms = dwell_ms
+        self.decimals = decimals
+        self.lines, self.sample_lines = self._build_lines()
+
+    @property
+    def num_moves(self) -> int:
+        return self.moves.shape[0]
+
+    @property
+    def num_samples(self) -> int:
+        return self.sample_points.size
+
+    @property
+    def end_offset(self) -> np.ndarray:
+        """Total X/Y/Z travel of the program, where the stage ends up relative to the start"""
+        return self.moves.sum(axis=0)
+
+    def sync_block(self) -> list[str]:
+        if self.sync == "M400":
+            return ["M400"]
+        if self.sync == "G4":
+            # G4 waits for the planner to empty before dwelling
+            return [f"G4 P{_fmt(self.dwell_ms, 0)}"]
+        block = ["M400", f"M42 P{self.pin} S255"]
+        if self.dwell_ms:
+            block.append(f"G4 P{_fmt(self.dwell_ms, 0)}")
+        block.append(f"M42 P{self.pin} S0")
+        return block
+
+    def move_line(self, move_idx: int, feedrate: float | None) -> str:
+        parts = [f"{axis}{_fmt(delta, self.decimals)}" for axis, delta in zip(AXIS_LETTERS, self.moves[move_idx]) if delta != 0]
+        if feedrate is not None:
+            parts.append(f"F{_fmt(feedrate, 0)}")
+        return "G1 " + " ".join(parts)
+
+    def _build_lines(self):
+        lines = ["G91"]
+        sample_lines = []
+        block = self.sync_block()
+        feedrate = None
+        sample = 0
+        for move_idx in range(self.num_moves + 1):
+            while sample < self.num_samples and self.sample_after_move[sample] == move_idx:
+                lines.extend(block)
+                sample_lines.append(len(lines) - 1)
+                sample += 1
+            if move_idx < self.num_moves:
+                # feedrate is modal, only written when it changes
+                new_feed = self.feedrates[move_idx]
+                lines.append(self.move_line(move_idx, None if new_feed == feedrate else new_feed))
+                feedrate = new_feed
+        return lines, np.asarray(sample_lines, dtype=np.int64)
+
+    def to_text(self) -> str:
+        return "\n".join(self.lines) + "\n"
+
+    def axis_moves(self):
+        """Moves as {axis index: distance} dicts, zero axes left out"""
+        for move in self.moves:
+            yield {axis: float(delta) for axis, delta in enumerate(move) if delta != 0}
+
+    def stream(self, streamer, on_sample=None) -> None:
+        """Send the program through a GcodeStreamer. With on_sample the host waits
+        at every sample point until the sync block is acknowledged, then calls
+        on_sample(pattern_column); without it the firmware runs free and the
+        probe is expected to follow the M42 pin."""
+        sample_at = dict(zip(self.sample_lines.tolist(), self.sample_points.tolist()))
+        for line_idx, line in enumerate(self.lines):
+            streamer.send(line)
+            if on_sample is not None and line_idx in sample_at:
+                streamer.drain()
+                on_sample(sample_at[line_idx])
+        streamer.sync()
+
+
+def compile_scan(matrix, step_size: float, z_step_size: float | None = None, measure=None, feedrate: float = 1000.0,
+                 z_feedrate: float | None = None, merge: bool = True, **sync_kwargs) -> GcodeProgram:
+    """Compile a (3, N) pattern matrix in step units into a GcodeProgram.
+
+    measure is an optional length N bool mask of the columns to sample
+    (default all). Moves with a Z component use z_feedrate if given. With
+    merge=True a run of moves in the same direction is sent as one move
+    unless a sample point lies inside it. Remaining keyword arguments
+    (sync, pin, dwell_ms, decimals) go to GcodeProgram.
+    """
+    matrix = np.asarray(matrix, dtype=float)
+    if matrix.ndim != 2 or matrix.shape[0] < 2:
+        raise ValueError("Pattern matrix must have shape (2 or 3, N).")
+    num_points = matrix.shape[1]
+    positions = np.zeros((num_points, 3))
+    positions[:, :2] = matrix[:2].T * step_size
+    if matrix.shape[0] > 2:
+        positions[:, 2] = matrix[2] * (step_size if z_step_size is None else z_step_size)
+    measure = np.ones(num_points, dtype=bool) if measure is None else np.asarray(measure, dtype=bool)
+    if measure.shape != (num_points,):
+        raise ValueError("measure mask must have one entry per pattern column.")
+
+    # round absolute positions once so relative moves never accumulate rounding drift
+    decimals = sync_kwargs.get("decimals", 4)
+    positions = np.round(positions, decimals)
+    deltas = np.diff(positions, axis=0)
+    sampled = measure[1:]
+    keep = np.any(deltas != 0, axis=1)
+    deltas, end_point = deltas[keep], np.flatnonzero(keep) + 1
+    sample_end = sampled[keep]
+
+    if merge and deltas.shape[0] > 1:
+        lengths = np.linalg.norm(deltas, axis=1)
+        units = deltas / lengths[:, np.newaxis]
+        new_group = np.ones(deltas.shape[0], dtype=bool)
+        new_group[1:] = sample_end[:-1] | np.any(np.abs(units[1:] - units[:-1]) > 1e-9, axis=1)
+        group = np.cumsum(new_group) - 1
+        merged = np.zeros((group[-1] + 1, 3))
+        np.add.at(merged, group, deltas)
+        last = np.append(np.flatnonzero(new_group)[1:], deltas.shape[0]) - 1
+        deltas, end_point = merged, end_point[last]
+
+    feedrates = np.full(deltas.shape[0], float(feedrate))
+    if z_feedrate is not None:
+        feedrates[deltas[:, 2] != 0] = z_feedrate
+
+    # every sampled column is taken after the last move that ends at or before it
+    sample_points = np.flatnonzero(measure)
+    sample_after_move = np.searchsorted(end_point, sample_points, side="right")
+    return GcodeProgram(deltas, feedrates, sample_after_move, sample_points, **sync_kwargs)
+
+
+if __name__ == "__main__":
+    # check against the FakeMarlin endpoint: final position, executed moves and syncs
+    from scanner.Plugins.gcodeStream import GcodeStreamer, FakeMarlin
+    rows, cols = 21, 31
+    x = np.tile(np.arange(cols), rows)
+    x = np.where(np.repeat(np.arange(rows), cols) % 2, cols - 1 - x, x)
+    y = np.repeat(np.arange(rows), cols)
+    z = 0.1 * x  # planar slope
+    matrix = np.array([y, x, z])
+    measure = np.zeros(matrix.shape[1], dtype=bool)
+    measure[::cols] = True  # only sample at the start of each row
+
+    for mask in (None, measure):
+        program = compile_scan(matrix, 2.0, z_step_size=1.0, measure=mask, z_feedrate=300)
+        marlin = FakeMarlin()
+        marlin.write("G91"); marlin.read()
+        seen = []
+        program.stream(GcodeStreamer(marlin), on_sample=seen.append)
+        expected = np.array([matrix[0, -1] * 2.0, matrix[1, -1] * 2.0, matrix[2, -1]])
+        ok = (np.allclose(marlin.position, expected) and marlin.moves_executed == program.num_moves
+              and seen == program.sample_points.tolist())
+        print(f"{matrix.shape[1]} points -> {program.num_moves} moves, {program.num_samples} samples, {len(program.lines)} lines:",
+              "ok" if ok else f"MISMATCH {marlin.position} vs {expected}")
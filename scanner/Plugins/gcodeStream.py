@@ -0,0 +1,177 @@
+###############
+#  Streaming G-code sender for Marlin boards.
+#
+#  Keeps up to max_outstanding commands in flight and counts the "ok"s that
+#  come back (ok-counting flow control), so the firmware planner always has
+#  the next moves queued. M400 is only sent when the caller needs the stage
+#  stopped, e.g. at a measurement point.
+###############
+import re
+from collections import deque
+from scanner.scan_logging import get_logger
+
+log = get_logger("motion")
+
+# Marlin ADVANCED_OK reply: "ok N<line> P<planner free> B<serial buffer free>"
+_ADVANCED_OK = re.compile(r"\bP(\d+)\s+B(\d+)")
+
+
+class GcodeStreamer:
+    """ok-counting sender on top of a pyvisa style resource (write/read of single lines).
+
+    Marlin answers every received line with exactly one "ok", once the line
+    is parsed and, for moves, queued in the planner. Keeping
+    max_outstanding at or below the firmware BUFSIZE (4 by default) means
+    the serial receive buffer can never overflow.
+    """
+
+    def __init__(self, driver, max_outstanding: int = 4) -> None:
+        self.driver = driver
+        self.max_outstanding = max(1, int(max_outstanding))
+        self._outstanding = deque()
+        self.planner_free = None
+        self.buffer_free = None
+        self.errors = []
+        self.lines_sent = 0
+        self.syncs = 0
+
+    @property
+    def queue_depth(self) -> int:
+        """Commands sent but not yet acknowledged"""
+        return len(self._outstanding)
+
+    def send(self, line: str) -> None:
+        """Queue one command, blocking only while max_outstanding are in flight"""
+        while len(self._outstanding) >= self.max_outstanding:
+            self._read_reply()
+        self.driver.write(line)
+        self._outstanding.append(line)
+        self.lines_sent += 1
+
+    def send_many(self, lines) -> None:
+        for line in lines:
+            self.send(line)
+
+    def drain(self) -> None:
+        """Wait for every outstanding command to be acknowledged (not for motion to finish)"""
+        while self._outstanding:
+            self._read_reply()
+
+    def sync(self) -> None:
+        """M400, then wait for its ok, so all queued motion has finished"""
+        self.send("M400")
+        self.drain()
+        self.syncs += 1
+
+    def _read_reply(self) -> None:
+        reply = self.driver.read().strip()
+        if reply.startswith("ok"):
+            self._outstanding.popleft()
+            match = _ADVANCED_OK.search(reply)
+            if match:
+                self.planner_free, self.buffer_free = int(match.group(1)), int(match.group(2))
+        elif reply.startswith("Error"):
+            # Marlin still sends an ok for the failed line, so only record it here
+            command = self._outstanding[0] if self._outstanding else None
+            self.errors.append((command, reply))
+            log.error("G-code error for '%s': %s", command, reply)
+        # "echo:busy: processing", temperature reports etc. are keep-alives, nothing to count
+
+
+class FakeMarlin:
+    """Serial endpoint that answers like Marlin, for exercising GcodeStreamer
+    and the BigTreeTech plugin without hardware.
+
+    Lines are parsed from a BUFSIZE deep receive buffer as soon as they
+    arrive, moves go into a planner of planner_size blocks. A line that
+    has to wait (a move with the planner full, M400/G4 with moves still
+    queued) stays in the receive buffer and time only moves on while the
+    host is reading, answering "echo:busy: processing" until the line is
+    done. Writing more than BUFSIZE unprocessed lines raises, like the
+    bytes Marlin would drop. With advanced_ok the replies carry the P/B
+    free counts like ADVANCED_OK firmware, otherwise they are a plain "ok".
+    """
+
+    BUFSIZE = 4
+
+    def __init__(self, planner_size: int = 16, advanced_ok: bool = False) -> None:
+        self.planner_size = planner_size
+        self.advanced_ok = advanced_ok
+        self.timeout = 5000
+        self.position = [0.0, 0.0, 0.0]
+        self.relative = False
+        self.moves_executed = 0
+        self.m400_count = 0
+        self.max_planner_depth = 0
+        self.log = []
+        self._rx = deque()
+        self._planner = deque()
+        self._replies = deque()
+
+    def write(self, line: str) -> None:
+        line = line.strip()
+        if len(self._rx) >= self.BUFSIZE:
+            raise BufferError(f"Receive buffer overflow, '{line}' would be dropped.")
+        self._rx.append(line)
+        self.log.append(line)
+        self._parse_ready()
+
+    def read(self) -> str:
+        while not self._replies:
+            if not self._rx:
+                raise TimeoutError("VI_ERROR_TMO: no reply pending")
+            # the host is waiting, so the stage gets to finish a move
+            self._replies.append("echo:busy: processing")
+            self._finish_oldest_move()
+            self._parse_ready()
+        return self._replies.popleft() + "\n"
+
+    def query(self, line: str) -> str:
+        self.write(line)
+        return self.read()
+
+    def close(self) -> None:
+        pass
+
+    def _finish_oldest_move(self) -> None:
+        if self._planner:
+            self.position = self._planner.popleft()
+            self.moves_executed += 1
+
+    def _parse_ready(self) -> None:
+        while self._rx and self._parse(self._rx[0]):
+            self._rx.popleft()
+            if self.advanced_ok:
+                self._replies.append(f"ok P{self.planner_size - len(self._planner)} B{self.BUFSIZE - len(self._rx)}")
+            else:
+                self._replies.append("ok")
+
+    def _parse(self, line: str) -> bool:
+        """Execute line, False if it has to wait for the planner"""
+        tokens = line.split()
+        word = tokens[0].upper() if tokens else ""
+        if word in ("G0", "G1"):
+            if len(self._planner) >= self.planner_size:
+                return False
+            target = list(self._planner[-1]) if self._planner else list(self.position)
+            for token in tokens[1:]:
+                axis = "XYZ".find(token[0].upper())
+                if axis >= 0:
+                    value = float(token[1:])
+                    target[axis] = target[axis] + value if self.relative else value
+            self._planner.append(target)
+            self.max_planner_depth = max(self.max_planner_depth, len(self._planner))
+        elif word in ("M400", "G4", "G28"):
+            if self._planner:
+                return False
+            if word == "M400":
+                self.m400_count += 1
+            elif word == "G28":
+                self.position = [0.0, 0.0, 0.0]
+        elif word == "G91":
+            self.relative = True
+        elif word == "G90":
+            self.relative = False
+        elif word == "M115":
+            self._replies.append("FIRMWARE_NAME:Marlin (FakeMarlin)")
+        return True
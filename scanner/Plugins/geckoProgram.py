@@ -0,0 +1,257 @@
+###############
+#  Vectorized encoder for Gecko GM215 move instructions.
+#
+#  Produces the same 32-bit words as geckoInstructions.MoveInsn and the same
+#  6-byte immediate packets the plugins write (0x04 0x00, then the upper and
+#  lower 16-bit halves, each little endian), for a whole sequence of moves
+#  in one NumPy call.
+###############
+import numpy as np
+
+from scanner.Plugins import geckoInstructions
+
+OPCODE_MOVE_ABSOLUTE = 0x00
+OPCODE_MOVE_RELATIVE = 0x01
+
+# first word of an immediate instruction packet, little endian on the wire
+IMMEDIATE_HEADER = 0x0004
+PACKET_SIZE = 6
+
+MAX_RELATIVE_STEPS = 0x7FFFFF
+MAX_ABSOLUTE_STEPS = 0xFFFFFF
+
+
+def encode_move_words(axes, steps, relative=True, chain=False) -> np.ndarray:
+    """32-bit MOVE instruction words for arrays of axes and signed step counts.
+
+    Relative moves use the GM215 sign-magnitude field (sign bit set for
+    positive), absolute moves the plain 24-bit field, exactly as MoveInsn.
+    """
+    axes = np.asarray(axes, dtype=np.int64)
+    steps = np.asarray(steps, dtype=np.int64)
+    chain = np.broadcast_to(np.asarray(chain, dtype=np.int64), steps.shape)
+    if relative:
+        if np.any(np.abs(steps) > MAX_RELATIVE_STEPS):
+            raise ValueError(f"Relative move out of range, limit is {MAX_RELATIVE_STEPS} steps.")
+        data = (np.abs(steps) & 0x7FFFFF) | ((steps >= 0).astype(np.int64) << 23)
+        opcode = OPCODE_MOVE_RELATIVE
+    else:
+        if np.any((steps < 0) | (steps > MAX_ABSOLUTE_STEPS)):
+            raise ValueError(f"Absolute move out of range [0, {MAX_ABSOLUTE_STEPS}].")
+        data = steps & 0xFFFFFF
+        opcode = OPCODE_MOVE_ABSOLUTE
+    words = (axes & 0x3) << 30 | (chain & 0x1) << 29 | (opcode & 0x1F) << 24 | data
+    return words.astype(np.uint32)
+
+
+def pack_words(words) -> np.ndarray:
+    """(N,) instruction words -> (N, 6) uint8 immediate packets"""
+    words = np.asarray(words, dtype=np.uint32).reshape(-1)
+    halves = np.empty((words.size, 3), dtype="<u2")
+    halves[:, 0] = IMMEDIATE_HEADER
+    halves[:, 1] = words >> 16
+    halves[:, 2] = words & 0xFFFF
+    return halves.view(np.uint8).reshape(words.size, PACKET_SIZE)
+
+
+def pack_insn(insn) -> bytes:
+    """Immediate packet for a single geckoInstructions.Insn"""
+    return pack_words([insn.get_binary()]).tobytes()
+
+
+class GeckoProgram:
+    """A compiled sequence of relative moves.
+
+    packets holds one 6-byte immediate packet per move, sync marks the moves
+    after which the caller needs the stage to be stopped (a measurement
+    point). The drive doesn't queue immediate moves, a move sent while
+    another runs overrides it, so every segment is written on its own and
+    the stage waited on before the next. A segment is one move, or moves on
+    different axes joined with the chain bit (the comma form, "x 10, y 10")
+    which start together. Moves between sync points that continue along
+    the same axis in the same direction are merged when compiled with
+    merge=True.
+    """
+
+    def __init__(self, axes, steps, sync, chain=None) -> None:
+        self.axes = np.asarray(axes, dtype=np.int64)
+        self.steps = np.asarray(steps, dtype=np.int64)
+        self.sync = np.asarray(sync, dtype=bool)
+        self.chain = np.zeros(self.steps.shape, dtype=bool) if chain is None else np.asarray(chain, dtype=bool)
+        self.words = encode_move_words(self.axes, self.steps, relative=True, chain=self.chain)
+        self.packets = pack_words(self.words)
+
+    def __len__(self) -> int:
+        return self.steps.size
+
+    def to_bytes(self) -> bytes:
+        return self.packets.tobytes()
+
+    def segments(self):
+        """Yield (start, stop) move index ranges that end at a sync point or an unchained move"""
+        ends = np.flatnonzero(self.sync | ~self.chain)
+        start = 0
+        for end in ends:
+            yield start, end + 1
+            start = end + 1
+        if start < len(self):
+            yield start, len(self)
+
+    def stream(self, serial_port, wait_idle, on_sync=None) -> None:
+        """Write the program with one serial write per segment.
+
+        wait_idle() must block until the stage has stopped; on_sync(move_index)
+        is called after every sync point once the stage is idle.
+        """
+        for start, stop in self.segments():
+            serial_port.write(self.packets[start:stop].tobytes())
+            wait_idle()
+            if on_sync is not None and self.sync[stop - 1]:
+                on_sync(int(stop - 1))
+
+
+def steps_from_distance(axes, distances, pos_mult: float, micro_mult: float, x_divisor: int = 5) -> np.ndarray:
+    """Signed step counts the way the Gecko plugins compute them: whole units
+    times the position and microstep multipliers, X divided by x_divisor."""
+    axes = np.asarray(axes, dtype=np.int64)
+    distances = np.asarray(distances, dtype=float)
+    sign = np.where(distances < 0, -1, 1)
+    steps = (np.trunc(np.abs(distances)) * pos_mult * micro_mult).astype(np.int64)
+    steps = np.where(axes == 0, (steps / x_divisor).astype(np.int64), steps)
+    return sign * steps
+
+
+def trigger_counts(axis: int, current_count: int, offsets, pos_mult: float, micro_mult: float, x_divisor: int = 5) -> np.ndarray:
+    """24-bit drive counts for trigger positions given as offsets in units from
+    the current position, wrapped like the drive's position counter. Unlike
+    moves these are not truncated to whole units."""
+    steps = np.asarray(offsets, dtype=float) * pos_mult * micro_mult
+    if axis == 0:
+        steps = steps / x_divisor
+    return (int(current_count) + np.rint(steps).astype(np.int64)) % (1 << 24)
+
+
+def counts_to_distance(axis: int, count: int, reference_count: int, pos_mult: float, micro_mult: float,
+                       x_divisor: int = 5) -> float:
+    """Distance in units from reference_count to count, the inverse of
+    steps_from_distance. Drive positions are 24-bit counters, the difference
+    is taken modulo 2**24 as a signed value so a wrap or a signed/unsigned
+    reading of the field gives the same answer."""
+    half = 1 << 23
+    delta = (int(count) - int(reference_count) + half) % (1 << 24) - half
+    steps_per_unit = pos_mult * micro_mult
+    if axis == 0:
+        steps_per_unit = steps_per_unit / x_divisor
+    return delta / steps_per_unit
+
+
+def pulse_packets(axis: int, output: int = 1) -> bytes:
+    """OUTn ON then OFF as immediate packets, one trigger pulse"""
+    on = geckoInstructions.OutInsn(line=0, axis=axis, n=output, state=geckoInstructions.OutInsn.ON).get_binary()
+    off = geckoInstructions.OutInsn(line=0, axis=axis, n=output, state=geckoInstructions.OutInsn.OFF).get_binary()
+    return pack_words([on, off]).tobytes()
+
+
+def count_reached(count: int, target: int, direction: int) -> bool:
+    """Whether a 24-bit drive count moving in direction (+1/-1) has got to target"""
+    half = 1 << 23
+    delta = (int(count) - int(target) + half) % (1 << 24) - half
+    return delta * direction >= 0
+
+
+def compile_moves(moves, pos_mult: float, micro_mult: float, sync=True, merge: bool = False,
+                  chain: bool = False) -> GeckoProgram:
+    """Compile a sequence of (axis, distance) relative moves.
+
+    sync is a bool or a per-move sequence saying whether the stage has to
+    stop after that move. With merge=True consecutive moves on the same
+    axis and direction are combined until the next sync point. With chain
+    consecutive moves on different axes, with no sync point between them,
+    get the chain bit and start together (a diagonal), the way the comma
+    joins axes on one source line. Same-axis moves are never chained.
+    """
+    moves = list(moves)
+    axes = np.array([axis for axis, _ in moves], dtype=np.int64)
+    distances = np.array([dist for _, dist in moves], dtype=float)
+    sync = np.broadcast_to(np.asarray(sync, dtype=bool), axes.shape).copy()
+    steps = steps_from_distance(axes, distances, pos_mult, micro_mult)
+    if merge and steps.size:
+        axes, steps, sync = _merge_collinear(axes, steps, sync)
+    chained = _chain_axes(axes, sync) if chain and steps.size else None
+    return GeckoProgram(axes, steps, sync, chain=chained)
+
+
+def _chain_axes(axes, sync):
+    # a chained group holds each axis at most once and ends at a sync point
+    chained = np.zeros(axes.size, dtype=bool)
+    group = set()
+    for i in range(axes.size - 1):
+        group.add(int(axes[i]))
+        if not sync[i] and int(axes[i + 1]) not in group:
+            chained[i] = True
+        else:
+            group = set()
+    return chained
+
+
+def _merge_collinear(axes, steps, sync):
+    # a new group starts after every sync point and wherever the axis or direction changes
+    direction = np.sign(steps)
+    new_group = np.ones(steps.size, dtype=bool)
+    new_group[1:] = sync[:-1] | (axes[1:] != axes[:-1]) | (direction[1:] != direction[:-1])
+    group = np.cumsum(new_group) - 1
+    merged_steps = np.bincount(group, weights=steps).astype(np.int64)
+    starts = np.flatnonzero(new_group)
+    ends = np.append(starts[1:], steps.size) - 1
+    # split groups that would overflow the 23 bit relative move field
+    if np.any(np.abs(merged_steps) > MAX_RELATIVE_STEPS):
+        out_axes, out_steps, out_sync = [], [], []
+        for axis, total, last in zip(axes[starts], merged_steps, sync[ends]):
+            sign = -1 if total < 0 else 1
+            remaining = abs(int(total))
+            while remaining > MAX_RELATIVE_STEPS:
+                out_axes.append(axis); out_steps.append(sign * MAX_RELATIVE_STEPS); out_sync.append(False)
+                remaining -= MAX_RELATIVE_STEPS
+            out_axes.append(axis); out_steps.append(sign * remaining); out_sync.append(last)
+        return np.array(out_axes), np.array(out_steps), np.array(out_sync)
+    return axes[starts], merged_steps, sync[ends]
+
+
+if __name__ == "__main__":
+    # golden check against the per-object encoder the plugins used
+    from scanner.Plugins import geckoInstructions
+    rng = np.random.default_rng(0)
+    axes = rng.integers(0, 2, 5000)
+    steps = rng.integers(-MAX_RELATIVE_STEPS, MAX_RELATIVE_STEPS, 5000)
+    legacy = b""
+    for axis, n in zip(axes, steps):
+        insn = geckoInstructions.MoveInsn(line=0, axis=int(axis), relative=-1 if n < 0 else 1, n=int(abs(n)), chain=False)
+        b = insn.get_binary()
+        legacy += bytes([0x04, 0x00, (b >> 16) & 0xFF, (b >> 24) & 0xFF, b & 0xFF, (b >> 8) & 0xFF])
+    compiled = GeckoProgram(axes, steps, sync=True).to_bytes()
+    print("byte exact" if compiled == legacy else "MISMATCH")
+
+    # every segment is its own write followed by a wait for idle
+    class Port:
+        def __init__(self):
+            self.log = []
+
+        def write(self, data):
+            self.log.append(len(data) // PACKET_SIZE)
+
+    moves = [(0, 1.0)] * 50
+    sync = np.arange(50) % 10 == 9
+    port = Port()
+    program = compile_moves(moves, 200, 8, sync=sync)
+    program.stream(port, lambda: port.log.append("idle"))
+    stream_ok = port.log == [1, "idle"] * 50 and not ((program.words >> 29) & 1).any()
+    # merged, each run of 10 same-axis moves up to a sync point is one move
+    port = Port()
+    program = compile_moves(moves, 200, 8, sync=sync, merge=True)
+    program.stream(port, lambda: port.log.append("idle"))
+    stream_ok &= port.log == [1, "idle"] * 5 and np.array_equal(program.steps, np.full(5, 10 * int(200 * 8 / 5)))
+    # chain only joins moves on different axes, never same-axis runs
+    turn = [(0, 1.0), (0, 1.0), (1, 1.0), (0, 1.0), (1, 1.0), (1, 1.0)]
+    program = compile_moves(turn, 200, 8, sync=[False, False, False, False, False, True], chain=True)
+    stream_ok &= list(program.segments()) == [(0, 1), (1, 3), (3, 5), (5, 6)]
+    print("streamed moves ok" if stream_ok else "STREAM MISMATCH")
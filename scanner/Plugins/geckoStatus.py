@@ -0,0 +1,141 @@
+###############
+#  Background query-long poller for Gecko GM215 drives.
+#
+#  One thread per serial port sends 0x08 0x00, reads the 22-byte status
+#  frame and publishes a decoded snapshot. is_moving/position calls are
+#  served from the snapshot, so serial traffic stays at the poll rate no
+#  matter how many callers ask.
+###############
+import threading
+import time
+
+QUERY_LONG = bytes([0x08, 0x00])
+QUERY_LONG_SIZE = 22
+
+# busy byte offsets and their idle values, set by the manufacturer
+BUSY_BYTE_X, IDLE_X = 2, 224
+BUSY_BYTE_Y, IDLE_Y = 12, 225
+# 24-bit position fields, little endian
+POSITION_BYTES_X = slice(8, 11)
+POSITION_BYTES_Y = slice(18, 21)
+
+
+class GeckoStatus:
+    """Decoded query-long frame"""
+    __slots__ = ("frame", "timestamp", "raw", "busy", "positions")
+
+    def __init__(self, frame: int, timestamp: float, raw: bytes) -> None:
+        self.frame = frame
+        self.timestamp = timestamp
+        self.raw = raw
+        self.busy = (raw[BUSY_BYTE_X] != IDLE_X, raw[BUSY_BYTE_Y] != IDLE_Y)
+        self.positions = (int.from_bytes(raw[POSITION_BYTES_X], "little"),
+                          int.from_bytes(raw[POSITION_BYTES_Y], "little"))
+
+    def is_moving(self) -> bool:
+        return self.busy[0] or self.busy[1]
+
+    def __repr__(self) -> str:
+        return f"GeckoStatus(frame={self.frame}, busy={self.busy}, positions={self.positions})"
+
+
+class GeckoStatusPoller:
+    """Polls one serial port at rate_hz and keeps the latest GeckoStatus.
+
+    All other writes to the port must go through write() so they don't
+    interleave with a status query. A frame only counts as fresh if its
+    query went out after the last write(), so a move that was just sent
+    is never reported as idle from a stale frame.
+    """
+
+    _pollers: dict = {}
+    _registry_lock = threading.Lock()
+
+    def __init__(self, serial_port, rate_hz: float = 50.0) -> None:
+        self.serial_port = serial_port
+        self.period = 1.0 / rate_hz
+        self.lock = threading.Lock()
+        self._cond = threading.Condition()
+        self._status = None
+        self._frame = 0
+        self._last_command = 0.0
+        self._running = False
+        self._thread = None
+        self._users = 0
+        self.read_errors = 0
+
+    @classmethod
+    def for_port(cls, serial_port, rate_hz: float = 50.0) -> "GeckoStatusPoller":
+        """Shared poller for serial_port, started on first use"""
+        with cls._registry_lock:
+            poller = cls._pollers.get(serial_port.port)
+            if poller is None or poller.serial_port is not serial_port:
+                poller = cls(serial_port, rate_hz)
+                cls._pollers[serial_port.port] = poller
+                poller.start()
+            poller._users += 1
+            return poller
+
+    def release(self) -> None:
+        with self._registry_lock:
+            self._users -= 1
+            if self._users > 0:
+                return
+            if self._pollers.get(self.serial_port.port) is self:
+                del self._pollers[self.serial_port.port]
+        self.stop()
+
+    def start(self) -> None:
+        self._running = True
+        self._thread = threading.Thread(target=self._poll_loop, daemon=True)
+        self._thread.start()
+
+    def stop(self) -> None:
+        self._running = False
+        if self._thread:
+            self._thread.join()
+            self._thread = None
+        with self._cond:
+            self._cond.notify_all()
+
+    def write(self, data: bytes) -> None:
+        with self.lock:
+            self.serial_port.write(data)
+            self._last_command = time.monotonic()
+
+    def latest(self) -> GeckoStatus | None:
+        with self._cond:
+            return self._status
+
+    def wait_for_frame(self, after_frame: int = 0, timeout: float = 2.0) -> GeckoStatus:
+        """Block until a fresh frame newer than after_frame is available"""
+        deadline = time.monotonic() + timeout
+        with self._cond:
+            while not self._is_fresh(after_frame):
+                remaining = deadline - time.monotonic()
+                if remaining <= 0 or not self._running:
+                    raise TimeoutError("No Gecko status frame received, is the drive connected?")
+                self._cond.wait(remaining)
+            return self._status
+
+    def _is_fresh(self, after_frame: int) -> bool:
+        status = self._status
+        return status is not None and status.frame > after_frame and status.timestamp > self._last_command
+
+    def _poll_loop(self) -> None:
+        next_poll = time.monotonic()
+        while self._running:
+            with self.lock:
+                sent = time.monotonic()
+                self.serial_port.write(QUERY_LONG)
+                raw = self.serial_port.read(QUERY_LONG_SIZE)
+            if len(raw) == QUERY_LONG_SIZE:
+                with self._cond:
+                    self._frame += 1
+                    # stamped with the send time so fresh frames always postdate the last command
+                    self._status = GeckoStatus(self._frame, sent, bytes(raw))
+                    self._cond.notify_all()
+            else:
+                self.read_errors += 1
+            next_poll = max(next_poll + self.period, time.monotonic())
+            time.sleep(max(0.0, next_poll - time.monotonic()))
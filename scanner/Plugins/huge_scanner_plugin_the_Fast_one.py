@@ -5,11 +5,19 @@ from scanner.plugin_setting import PluginSettingString, PluginSettingInteger, Pl
 import serial
 from serial.tools import list_ports
 from scanner.Plugins import geckoInstructions
+from scanner.Plugins import geckoProgram
+from scanner.Plugins.geckoStatus import GeckoStatusPoller
+import numpy as np
 import time
 import tkinter as tk
 from tkinter import messagebox
+from scanner.scan_logging import get_logger
+
+log = get_logger("motion")
 
 class motion_controller_plugin(MotionControllerPlugin):
+    # move_absolute() takes per axis offsets
+    relative_moves = True
     
     def __init__(self):
         
@@ -28,9 +36,11 @@ class motion_controller_plugin(MotionControllerPlugin):
         ports = [port.device for port in list_ports.comports()]
         
         self.current_position = [500, 500, 0.0]
+        self._home_position = None
+        self._home_counts = None
         
         for port in list_ports.comports():
-            print(f"Found: {port.device}")
+            log.debug("Found: %s", port.device)
         if not ports:
             ports = ["NO_PORTS_FOUND"]
         # PluginSettingString with options
@@ -59,6 +69,8 @@ class motion_controller_plugin(MotionControllerPlugin):
         
         self.amps = PluginSettingFloat("Amps 0-7",7)
         
+        self.status_poll_rate = PluginSettingFloat("Status Poll Rate (Hz)", 50, value_min=1)
+        
         
         
         self.add_setting_pre_connect(self.motion_address)
@@ -79,6 +91,8 @@ class motion_controller_plugin(MotionControllerPlugin):
         
         self.add_setting_pre_connect(self.amps) #8
         
+        self.add_setting_pre_connect(self.status_poll_rate)
+        
         
         
         
@@ -95,6 +109,10 @@ class motion_controller_plugin(MotionControllerPlugin):
             stopbits=serial.STOPBITS_ONE,
             timeout=5 #seconds
         )
+        # every write to the port goes through the poller so it never interleaves with a status query
+        self.status_poller = GeckoStatusPoller.for_port(self.serial_port, self.status_poll_rate.value)
+        self._status_frame = 0
+        self._home_counts = None
         scanner_type_str = self.scanner_type.value
         if scanner_type_str == "Huge Scanner":
             self.x_min, self.x_max = 0.0, 1000.0 # adjusted for HUGE scanner
@@ -130,16 +148,17 @@ class motion_controller_plugin(MotionControllerPlugin):
         low_last_pair_y = binary_y & 0xFF
         
 
-        self.serial_port.write(bytes([0x04, 0x00, high_last_pair_x, high_first_pair_x, low_last_pair_x, low_first_pair_x]))
+        self.status_poller.write(bytes([0x04, 0x00, high_last_pair_x, high_first_pair_x, low_last_pair_x, low_first_pair_x]))
         
         
-        self.serial_port.write(bytes([0x04, 0x00, high_last_pair_y, high_first_pair_y, low_last_pair_y, low_first_pair_y]))
+        self.status_poller.write(bytes([0x04, 0x00, high_last_pair_y, high_first_pair_y, low_last_pair_y, low_first_pair_y]))
         
     def disconnect(self):
-        self.serial_port.close
+        self.status_poller.release()
+        self.serial_port.close()
     
     def get_axis_display_names(self):
-        pass
+        return ("X", "Y", "Z")
     
     def get_axis_units(self):
         pass
@@ -175,10 +194,10 @@ class motion_controller_plugin(MotionControllerPlugin):
         low_last_pair_y = binary_y & 0xFF
         
 
-        self.serial_port.write(bytes([0x04, 0x00, high_last_pair_x, high_first_pair_x, low_last_pair_x, low_first_pair_x]))
+        self.status_poller.write(bytes([0x04, 0x00, high_last_pair_x, high_first_pair_x, low_last_pair_x, low_first_pair_x]))
         
         
-        self.serial_port.write(bytes([0x04, 0x00, high_last_pair_y, high_first_pair_y, low_last_pair_y, low_first_pair_y]))
+        self.status_poller.write(bytes([0x04, 0x00, high_last_pair_y, high_first_pair_y, low_last_pair_y, low_first_pair_y]))
         
         
         
@@ -214,10 +233,10 @@ class motion_controller_plugin(MotionControllerPlugin):
         low_last_pair_y = binary_y & 0xFF
         
         
-        self.serial_port.write(bytes([0x04, 0x00, high_last_pair_x, high_first_pair_x, low_last_pair_x, low_first_pair_x]))
+        self.status_poller.write(bytes([0x04, 0x00, high_last_pair_x, high_first_pair_x, low_last_pair_x, low_first_pair_x]))
         
         
-        self.serial_port.write(bytes([0x04, 0x00, high_last_pair_y, high_first_pair_y, low_last_pair_y, low_first_pair_y]))
+        self.status_poller.write(bytes([0x04, 0x00, high_last_pair_y, high_first_pair_y, low_last_pair_y, low_first_pair_y]))
        
         
     
@@ -258,10 +277,10 @@ class motion_controller_plugin(MotionControllerPlugin):
 
         # swapping first and last h/l pairs due to little endian formatting
         
-        self.serial_port.write(bytes([0x04, 0x00, high_last_pair_x, high_first_pair_x, low_last_pair_x, low_first_pair_x]))
+        self.status_poller.write(bytes([0x04, 0x00, high_last_pair_x, high_first_pair_x, low_last_pair_x, low_first_pair_x]))
         
         
-        self.serial_port.write(bytes([0x04, 0x00, high_last_pair_y, high_first_pair_y, low_last_pair_y, low_first_pair_y]))
+        self.status_poller.write(bytes([0x04, 0x00, high_last_pair_y, high_first_pair_y, low_last_pair_y, low_first_pair_y]))
         
     
     def move_relative(self, move_dist):
@@ -281,7 +300,7 @@ class motion_controller_plugin(MotionControllerPlugin):
         axis_num = 0
         
         if not isinstance(move_pos, dict) or not move_pos:
-            print("Error: Input must be a non-empty dictionary.")
+            log.error("Input must be a non-empty dictionary.")
     
         
         for key, val in move_pos.items():
@@ -293,7 +312,7 @@ class motion_controller_plugin(MotionControllerPlugin):
                 
                 axis_num=1
             else:
-                print(f"Warning: Unexpected dictionary key '{key}'. Expected 0 for 'x' or 1 for 'y'.")
+                log.warning("Unexpected dictionary key '%s'. Expected 0 for 'x' or 1 for 'y'.", key)
                 
                 axis_num = 1
             break 
@@ -308,49 +327,97 @@ class motion_controller_plugin(MotionControllerPlugin):
             
         raw_value = int(raw_value*pos_mult*micro_mult)
         raw_valuex = int(raw_value/5)
-        if self.is_homed == True:
-
-            for axis_idx, delta in move_pos.items():
-                new_potential_pos = self.current_position[axis_idx] + delta
-                
-                if axis_idx == 0:  # X axis
-                    if new_potential_pos < self.x_min or new_potential_pos > self.x_max:
-                        raise ValueError(f"LIMIT VIOLATION: X move of {delta} would reach {new_potential_pos}, exceeding [{self.x_min}, {self.x_max}]")
-                elif axis_idx == 1:  # Y axis
-                    if new_potential_pos < self.y_min or new_potential_pos > self.y_max:
-                        raise ValueError(f"LIMIT VIOLATION: Y move of {delta} would reach {new_potential_pos}, exceeding [{self.y_min}, {self.y_max}]")
-                elif axis_idx == 2:  # Z axis
-                    if new_potential_pos < self.z_min or new_potential_pos > self.z_max:
-                        raise ValueError(f"LIMIT VIOLATION: Z move of {delta} would reach {new_potential_pos}, exceeding [{self.z_min}, {self.z_max}]")
-            
-        else:
-            pass  # If not homed, skip limit checks
-        
-        
-        if axis_num == 0:
+        # limits are checked by MotionController against its envelope (get_endstop_minimums/maximums)
         
-            motion_insn = geckoInstructions.MoveInsn(line=0,axis=axis_num,relative=is_negative,n=raw_valuex,chain=False)
-        elif axis_num == 1:
-            motion_insn = geckoInstructions.MoveInsn(line=0,axis=axis_num,relative=is_negative,n=raw_value,chain=False)
+        steps = raw_valuex if axis_num == 0 else raw_value
+        move_words = geckoProgram.encode_move_words([axis_num], [is_negative*steps])
         
+        self.status_poller.write(geckoProgram.pack_words(move_words).tobytes())
         
+        self.wait_until_idle()
         
-        binary_x = motion_insn.get_binary()
-    
-        high_first_pair = (binary_x >> 24) & 0xFF
-        high_last_pair = (binary_x >> 16) & 0xFF
-        low_first_pair = (binary_x >> 8) & 0xFF
-        low_last_pair = binary_x & 0xFF
-        
-        self.serial_port.write(bytes([0x04, 0x00, high_last_pair, high_first_pair, low_last_pair, low_first_pair]))
-        
+        self.current_position[key] += val
+
+    def wait_until_idle(self):
+        # until both X and Y are idle, not just one of them
         busy_bit = self.is_moving()
-        while busy_bit[0] and busy_bit[1] == True:
+        while any(busy_bit[:2]):
             busy_bit = self.is_moving()
+
+    def run_moves(self, moves, on_point=None, merge=True):
+        """Compile a list of (axis, distance) relative moves into one packed
+        program and stream it a move at a time, waiting for idle after each.
+        With on_point, the stage stops after every move and on_point(move_index)
+        is called; without it only the end of the sequence is a sync point, so
+        merge turns each straight run of a row into a single move."""
+        moves = list(moves)
+        if not moves:
+            return
+        pos_mult = float(PluginSettingFloat.get_value_as_string(self.position_multiplier))
+        micro_mult = float(PluginSettingFloat.get_value_as_string(self.microstep_multiplier))
+        if on_point is None:
+            sync = np.zeros(len(moves), dtype=bool)
+            sync[-1] = True
+        else:
+            sync = True
+        
+        axes = np.array([axis for axis, _ in moves])
+        deltas = np.array([dist for _, dist in moves], dtype=float)
+        program = geckoProgram.compile_moves(moves, pos_mult, micro_mult, sync=sync, merge=merge)
+        program.stream(self.status_poller, self.wait_until_idle, on_point)
         
-        self.current_position[axis_idx] += delta
+        for axis_idx in range(3):
+            self.current_position[axis_idx] += float(deltas[axes == axis_idx].sum())
         
         
+    def _trigger_counts(self, axis, offsets):
+        """Drive counts for trigger positions given as offsets from the current
+        position (same units as current_position). Only X and Y report positions."""
+        if axis not in (0, 1):
+            raise ValueError(f"Software-timed triggering needs a drive position, axis {axis} has none (only 0 = X and 1 = Y).")
+        pos_mult = float(PluginSettingFloat.get_value_as_string(self.position_multiplier))
+        micro_mult = float(PluginSettingFloat.get_value_as_string(self.microstep_multiplier))
+        status = self.status_poller.wait_for_frame(self._status_frame)
+        self._status_frame = status.frame
+        return geckoProgram.trigger_counts(axis, status.positions[axis], np.asarray(offsets, dtype=float), pos_mult, micro_mult)
+
+    def run_software_triggered_row(self, axis, distance, trigger_offsets, output=1):
+        """EXPERIMENTAL, not checked on hardware. Cover a row in one move and
+        pulse OUT<output> once as the axis passes each of trigger_offsets.
+
+        Software-timed, not hardware triggering: the GM215 has no output driven
+        by a position compare, so the pulse is written by the host when the
+        status poller sees the axis past the position. Each pulse lags its
+        position by up to one poll period of travel (1 mm at 50 Hz and 50 mm/s).
+        Returns the pulse count."""
+        counts = self._trigger_counts(axis, trigger_offsets)
+        pos_mult = float(PluginSettingFloat.get_value_as_string(self.position_multiplier))
+        micro_mult = float(PluginSettingFloat.get_value_as_string(self.microstep_multiplier))
+        steps = geckoProgram.steps_from_distance([axis], [distance], pos_mult, micro_mult)
+        direction = -1 if distance < 0 else 1
+        fired = 0
+
+        def fire_reached(position):
+            nonlocal fired
+            while fired < len(counts) and geckoProgram.count_reached(position, counts[fired], direction):
+                self.status_poller.write(geckoProgram.pulse_packets(axis, output))
+                fired += 1
+
+        # triggers at the start position go before the move
+        fire_reached(self.status_poller.latest().positions[axis])
+        if steps[0]:
+            self.status_poller.write(geckoProgram.pack_words(geckoProgram.encode_move_words([axis], steps)).tobytes())
+        while True:
+            status = self.status_poller.wait_for_frame(self._status_frame)
+            self._status_frame = status.frame
+            fire_reached(status.positions[axis])
+            if not status.is_moving():
+                break
+        self.current_position[axis] += distance
+        if fired < len(counts):
+            raise RuntimeError(f"Row ended with {fired} of {len(counts)} triggers fired.")
+        return fired
+
     def home(self, axes=None):
         query_long_command = bytes([0x08, 0x00])
         # Prompt user to manually home and place scanner in middle X/Y
@@ -363,9 +430,13 @@ class motion_controller_plugin(MotionControllerPlugin):
             )
             root.destroy()
         except Exception as e:
-            print(f"Could not show homing messagebox: {e}")
+            log.warning("Could not show homing messagebox: %s", e)
         self.is_homed = True
         self.current_position = [300, 300, 0.0]
+        homed_positions = {axis: float(pos) for axis, pos in enumerate(self.current_position)}
+        # drive counters at the home position, get_current_positions measures from them
+        self._home_position = list(self.current_position)
+        self._home_counts = self.status_poller.wait_for_frame().positions
         # Make sure it is in the middle position for manual homing
         
 
@@ -406,65 +477,44 @@ class motion_controller_plugin(MotionControllerPlugin):
         # PluginSettingFloat.set_value_from_string(self.travel_velocity, f"{temp_vel}")
             
         # self.set_velocity()
+
+        return homed_positions
         
 
         
         
         
     def get_current_positions(self):
-      
-        query_long_command = bytes([0x08, 0x00])
-        
-        self.serial_port.write(query_long_command)
-        
-        response = self.serial_port.read(22)
-        print(f"Response: \n \n { response } \n \n")
-        
-        self.tokens = list(response)
-        print(self.tokens)
-        
-        print(f"Position {self.tokens[8],self.tokens[9],self.tokens[10]}")
+        """X, Y, Z in the same units as current_position. X and Y come from
+        the drive counters relative to the counts read at home(); before
+        that there is no reference and the tracked position is returned."""
+        if self._home_counts is None:
+            return tuple(self.current_position)
+        pos_mult = float(PluginSettingFloat.get_value_as_string(self.position_multiplier))
+        micro_mult = float(PluginSettingFloat.get_value_as_string(self.microstep_multiplier))
+        status = self.status_poller.latest()
+        if status is None:
+            status = self.status_poller.wait_for_frame()
+        xy = [self._home_position[axis] + geckoProgram.counts_to_distance(axis, status.positions[axis], self._home_counts[axis],
+                                                                            pos_mult, micro_mult)
+              for axis in range(2)]
+        return (xy[0], xy[1], float(self.current_position[2]))
         
-                
-            
     def is_moving(self,axis=None):
+        # each call waits for a frame it hasn't seen yet, so busy loops run at the poll rate
+        status = self.status_poller.wait_for_frame(self._status_frame)
+        self._status_frame = status.frame
         
-        is_moving_x = True
-        is_moving_y = True
-        
-        query_long_command = bytes([0x08, 0x00])         
-        
-        
-        self.serial_port.write(query_long_command)
-        
-        read_qlong = self.serial_port.read(22)
-        
-        self.res_qlong = list(read_qlong)
-        
-        busy_bits= [self.res_qlong[2],self.res_qlong[12]]
-        
-        # 224,225 are values set by manufacturer
-        
-        if busy_bits[0] == 224:
-            is_moving_x = False
-        else:
-            is_moving_x = True
-            
-        if busy_bits[1] == 225:
-            is_moving_y = False
-        else:
-            is_moving_y = True
-        
-        movement = [is_moving_x,is_moving_y,False]
+        movement = [status.busy[0],status.busy[1],False]
         return movement
         
          
     def get_endstop_minimums(self):
-        pass
+        return (self.x_min, self.y_min, self.z_min)
 
     
     def get_endstop_maximums(self):
-        pass
+        return (self.x_max, self.y_max, self.z_max)
     
     def emergency_stop(self):
         ##TODO: 
@@ -0,0 +1,210 @@
+###############
+#  Kinematic model for simulated stages.
+#
+#  MotionProfile is one point-to-point move of one axis, built from
+#  constant jerk segments: trapezoidal (infinite jerk) or 7 segment
+#  S-curve. AxisModel queues profiles on a clock, SimClock is wall clock
+#  time optionally sped up, or a purely virtual clock that only moves when
+#  advanced, so long scans can be simulated in seconds.
+###############
+import time
+
+import numpy as np
+
+PROFILES = ("Instant", "Trapezoidal", "S-Curve")
+
+
+class SimClock:
+    """Simulation time in seconds.
+
+    speedup > 0 runs speedup times faster than the wall clock. speedup == 0
+    is a virtual clock that only moves through advance() and sleep(), so a
+    simulation takes as long as the computation, not the motion.
+    """
+
+    def __init__(self, speedup: float = 1.0) -> None:
+        self.speedup = float(speedup)
+        self._virtual = 0.0
+        self._wall_start = time.monotonic()
+
+    @property
+    def is_virtual(self) -> bool:
+        return self.speedup <= 0
+
+    def now(self) -> float:
+        if self.is_virtual:
+            return self._virtual
+        return self._virtual + (time.monotonic() - self._wall_start) * self.speedup
+
+    def advance(self, dt: float) -> None:
+        """Move a virtual clock forward, no effect on wall clock based time"""
+        if self.is_virtual:
+            self._virtual += max(0.0, dt)
+
+    def sleep(self, dt: float) -> None:
+        if self.is_virtual:
+            self.advance(dt)
+        elif dt > 0:
+            time.sleep(dt / self.speedup)
+
+
+class MotionProfile:
+    """Rest to rest move of distance over constant jerk segments.
+
+    Segments are (duration, start acceleration, jerk). Trapezoidal moves
+    jump in acceleration (3 segments), S-curve moves ramp it with the jerk
+    limit (7 segments). When the distance is too short to reach the
+    velocity limit the peak velocity is lowered to fit.
+    """
+
+    def __init__(self, distance: float, velocity: float, accel: float, jerk: float | None = None) -> None:
+        self.distance = float(distance)
+        self.sign = -1.0 if distance < 0 else 1.0
+        length = abs(self.distance)
+        if length == 0 or velocity <= 0 or accel <= 0:
+            segments = []
+        elif jerk is None or jerk <= 0:
+            segments = self._trapezoid(length, velocity, accel)
+        else:
+            segments = self._s_curve(length, velocity, accel, jerk)
+        self._build(segments)
+
+    @staticmethod
+    def _trapezoid(length, v, a):
+        if v * v / a > length:
+            v = np.sqrt(length * a)
+        ta = v / a
+        tv = (length - v * ta) / v
+        return [(ta, a, 0.0), (tv, 0.0, 0.0), (ta, -a, 0.0)]
+
+    @staticmethod
+    def _s_curve_times(v, a, j):
+        # accel limit only reached if the velocity is high enough
+        if v * j < a * a:
+            a = np.sqrt(v * j)
+        tj = a / j
+        ta = v / a - tj
+        return a, tj, ta
+
+    def _s_curve(self, length, v, a, j):
+        peak, tj, ta = self._s_curve_times(v, a, j)
+        accel_dist = v * (2 * tj + ta)
+        if accel_dist > length:
+            # distance too short for the velocity limit, bisect the peak velocity
+            lo, hi = 0.0, v
+            for _ in range(60):
+                mid = 0.5 * (lo + hi)
+                p, t1, t2 = self._s_curve_times(mid, a, j)
+                if mid * (2 * t1 + t2) > length:
+                    hi = mid
+                else:
+                    lo = mid
+            v = lo
+            peak, tj, ta = self._s_curve_times(v, a, j)
+            accel_dist = v * (2 * tj + ta)
+        tv = (length - accel_dist) / v if v > 0 else 0.0
+        return [(tj, 0.0, j), (ta, peak, 0.0), (tj, peak, -j), (tv, 0.0, 0.0),
+                (tj, 0.0, -j), (ta, -peak, 0.0), (tj, -peak, j)]
+
+    def _build(self, segments):
+        segments = [seg for seg in segments if seg[0] > 0]
+        n = len(segments)
+        self._t0 = np.zeros(n)
+        self._p0 = np.zeros(n)
+        self._v0 = np.zeros(n)
+        self._a0 = np.array([seg[1] for seg in segments], dtype=float)
+        self._j = np.array([seg[2] for seg in segments], dtype=float)
+        t = p = v = 0.0
+        for i, (dt, a, j) in enumerate(segments):
+            self._t0[i], self._p0[i], self._v0[i] = t, p, v
+            p += v * dt + a * dt**2 / 2 + j * dt**3 / 6
+            v += a * dt + j * dt**2 / 2
+            t += dt
+        self.duration = t
+        # float error over the segments is spread so the move ends exactly on distance
+        self._scale = abs(self.distance) / p if p > 0 else 1.0
+
+    def position(self, t):
+        """Signed distance travelled t seconds after the move started (scalar or array)"""
+        t = np.clip(np.asarray(t, dtype=float), 0.0, self.duration)
+        if self._t0.size == 0:
+            # instant move, already there
+            return self.distance + 0.0 * t
+        i = np.clip(np.searchsorted(self._t0, t, side="right") - 1, 0, self._t0.size - 1)
+        dt = t - self._t0[i]
+        p = self._p0[i] + self._v0[i] * dt + self._a0[i] * dt**2 / 2 + self._j[i] * dt**3 / 6
+        return self.sign * p * self._scale
+
+
+class AxisModel:
+    """One simulated axis. Moves are queued behind the one in progress and
+    the axis counts as moving until settle_time after the last one ends."""
+
+    def __init__(self, clock: SimClock, position: float = 0.0) -> None:
+        self.clock = clock
+        self.velocity = 50.0
+        self.accel = 500.0
+        self.jerk = None
+        self.settle_time = 0.0
+        self.noise = 0.0
+        self.profile_type = "Trapezoidal"
+        self._moves = []  # (start time, start position, profile)
+        self._rest_position = float(position)
+        self._busy_until = 0.0
+        self._rng = np.random.default_rng()
+
+    def move_by(self, distance: float) -> float:
+        """Queue a relative move, returns the simulated time it will be settled"""
+        now = self.clock.now()
+        self._retire(now)
+        start = max(now, self._busy_until)
+        start_pos = self.target
+        if self.profile_type == "Instant":
+            profile = MotionProfile(distance, 0, 0)
+        else:
+            profile = MotionProfile(distance, self.velocity, self.accel, self.jerk if self.profile_type == "S-Curve" else None)
+        self._moves.append((start, start_pos, profile))
+        self._busy_until = start + profile.duration + self.settle_time
+        return self._busy_until
+
+    def move_to(self, position: float) -> float:
+        return self.move_by(position - self.target)
+
+    def reset(self, position: float) -> None:
+        self._moves = []
+        self._rest_position = float(position)
+        self._busy_until = self.clock.now()
+
+    @property
+    def target(self) -> float:
+        if self._moves:
+            start, start_pos, profile = self._moves[-1]
+            return start_pos + profile.distance
+        return self._rest_position
+
+    @property
+    def busy_until(self) -> float:
+        return self._busy_until
+
+    def is_moving(self) -> bool:
+        return self.clock.now() < self._busy_until
+
+    def position(self) -> float:
+        now = self.clock.now()
+        self._retire(now)
+        pos = self._rest_position
+        for start, start_pos, profile in self._moves:
+            if now >= start:
+                pos = start_pos + float(profile.position(now - start))
+        if self.noise > 0:
+            pos += self._rng.normal(0.0, self.noise)
+        return pos
+
+    def _retire(self, now: float) -> None:
+        # drop finished moves, keeping the position they ended at
+        while self._moves:
+            start, start_pos, profile = self._moves[0]
+            if now < start + profile.duration:
+                break
+            self._rest_position = start_pos + profile.distance
+            self._moves.pop(0)
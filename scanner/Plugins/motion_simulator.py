@@ -1,6 +1,10 @@
 from scanner.motion_controller import MotionControllerPlugin
 from scanner.plugin_setting import PluginSettingString, PluginSettingInteger, PluginSettingFloat
 import tkinter as tk
+from scanner.Plugins.motionProfile import SimClock, AxisModel, PROFILES
+from scanner.scan_logging import get_logger
+
+log = get_logger("motion")
 
 class motion_controller_plugin(MotionControllerPlugin):
 
@@ -8,7 +12,7 @@ class motion_controller_plugin(MotionControllerPlugin):
 
         super().__init__()
 
-        print("Motion Controller Simulator: Initialized")
+        log.info("Motion Controller Simulator: Initialized")
 
         # Scanner type selection for boundary checking
         self.scanner_type = PluginSettingString(
@@ -20,8 +24,27 @@ class motion_controller_plugin(MotionControllerPlugin):
 
         self.address = PluginSettingString("Resource Address", "Motion Controller Simulator")
 
+        # Kinematics, Instant keeps the old behaviour of finishing every move at once
+        self.profile_type = PluginSettingString("Motion Profile", "Trapezoidal", select_options=list(PROFILES), restrict_selections=True)
+        self.velocity = PluginSettingFloat("Velocity (mm/s)", 50.0, value_min=0.0)
+        self.acceleration = PluginSettingFloat("Acceleration (mm/s^2)", 500.0, value_min=0.0)
+        self.jerk = PluginSettingFloat("Jerk (mm/s^3)", 5000.0, value_min=0.0)
+        self.settle_time = PluginSettingFloat("Settle Time (s)", 0.0, value_min=0.0)
+        self.position_noise = PluginSettingFloat("Position Noise (mm)", 0.0, value_min=0.0)
+        # 0 runs on a virtual clock that advances by the status query time per is_moving() call
+        self.clock_speedup = PluginSettingFloat("Clock Speedup (0 = virtual)", 1.0, value_min=0.0)
+        self.query_time = PluginSettingFloat("Status Query Time (s)", 0.002, value_min=0.0)
+
         self.add_setting_pre_connect(self.scanner_type)
         self.add_setting_pre_connect(self.address)
+        self.add_setting_pre_connect(self.clock_speedup)
+        self.add_setting_post_connect(self.profile_type)
+        self.add_setting_post_connect(self.velocity)
+        self.add_setting_post_connect(self.acceleration)
+        self.add_setting_post_connect(self.jerk)
+        self.add_setting_post_connect(self.settle_time)
+        self.add_setting_post_connect(self.position_noise)
+        self.add_setting_post_connect(self.query_time)
 
         # Position tracking variables
         self.current_position = [0.0, 0.0, 0.0]  # [X, Y, Z]
@@ -35,9 +58,16 @@ class motion_controller_plugin(MotionControllerPlugin):
         self.z_min = 0.0
         self.z_max = 0.0
 
+        self.clock = SimClock()
+        self.axis_models = [AxisModel(self.clock, pos) for pos in self.current_position]
+        self._velocity_override = {}
+        self._accel_override = {}
+
     def connect(self):
         """Connect to simulator and set boundary limits based on scanner type."""
-        print("Motor Controller Simulator: Connected")
+        log.info("Motor Controller Simulator: Connected")
+        self.clock = SimClock(self.clock_speedup.value)
+        self.axis_models = [AxisModel(self.clock, pos) for pos in self.current_position]
 
         # Set boundary limits based on scanner type
         scanner_type_str = self.scanner_type.value
@@ -49,7 +79,7 @@ class motion_controller_plugin(MotionControllerPlugin):
             self.y_max = 600.0
             self.z_min = 0.0
             self.z_max = 0.0  # No Z axis for Big Scanner
-            print("Scanner boundaries set: Big Scanner (600x600 mm, X-Y only)")
+            log.info("Scanner boundaries set: Big Scanner (600x600 mm, X-Y only)")
         else:  # "N-d Scanner"
             # N-d Scanner: 300x300x300 mm cube
             self.x_min = 0.0
@@ -58,10 +88,10 @@ class motion_controller_plugin(MotionControllerPlugin):
             self.y_max = 300.0
             self.z_min = 0.0
             self.z_max = 300.0
-            print("Scanner boundaries set: N-d Scanner (300x300x300 mm cube)")
+            log.info("Scanner boundaries set: N-d Scanner (300x300x300 mm cube)")
 
     def disconnect(self):
-        print("Disconnected")
+        log.info("Disconnected")
 
     def get_axis_display_names(self) -> tuple[str, ...]:
         return ("X", "Y", "Z")
@@ -71,21 +101,35 @@ class motion_controller_plugin(MotionControllerPlugin):
 
 
     def set_velocity(self, velocities: dict[int, float] = None) -> None:
-        print(f"Simulator: Set velocity to {velocities}")
+        log.debug("Simulator: Set velocity to %s", velocities)
+        if velocities:
+            self._velocity_override.update(velocities)
 
     def set_acceleration(self, accels: dict[int, float] = None) -> None:
-        print(f"Simulator: Set acceleration to {accels}")
+        log.debug("Simulator: Set acceleration to %s", accels)
+        if accels:
+            self._accel_override.update(accels)
+
+    def start_axis_moves(self, target_positions: dict[int, float]) -> None:
+        """Start the simulated moves to target_positions with the current kinematic settings"""
+        for axis_idx, target_pos in target_positions.items():
+            axis = self.axis_models[axis_idx]
+            axis.profile_type = self.profile_type.value
+            axis.velocity = self._velocity_override.get(axis_idx, self.velocity.value)
+            axis.accel = self._accel_override.get(axis_idx, self.acceleration.value)
+            axis.jerk = self.jerk.value
+            axis.settle_time = self.settle_time.value
+            axis.noise = self.position_noise.value
+            axis.move_to(target_pos)
+            self.current_position[axis_idx] = target_pos
 
 
     def move_relative(self, move_dist: dict[int, float]) -> dict[int, float] | None:
         """
-        Move relative distance with boundary checking.
+        Move relative distance.
 
         Args:
             move_dist: Dictionary mapping axis index to relative distance
-
-        Raises:
-            ValueError: If movement would violate endstop boundaries
         """
         if not self.is_homed:
             raise RuntimeError("Motors must be homed before relative movement. Call home() first.")
@@ -93,57 +137,27 @@ class motion_controller_plugin(MotionControllerPlugin):
         if not isinstance(move_dist, dict) or not move_dist:
             raise ValueError("Error: Input must be a non-empty dictionary.")
 
-        # Calculate target positions and check boundaries FIRST
+        # limits are checked by MotionController against its envelope (get_endstop_minimums/maximums)
         target_positions = {}
         for axis_idx, distance in move_dist.items():
             if axis_idx not in [0, 1, 2]:
-                print(f"Warning: Unexpected axis index '{axis_idx}'. Skipping.")
+                log.warning("Unexpected axis index '%s'. Skipping.", axis_idx)
                 continue
+            target_positions[axis_idx] = self.current_position[axis_idx] + distance
 
-            target_pos = self.current_position[axis_idx] + distance
-            target_positions[axis_idx] = target_pos
-
-            # Check boundaries
-            if axis_idx == 0:  # X axis
-                if target_pos < self.x_min or target_pos > self.x_max:
-                    raise ValueError(
-                        f"ENDSTOP VIOLATION: X-axis movement to {target_pos:.2f} mm "
-                        f"exceeds boundaries [{self.x_min:.2f}, {self.x_max:.2f}] mm. "
-                        f"Command stopped."
-                    )
-            elif axis_idx == 1:  # Y axis
-                if target_pos < self.y_min or target_pos > self.y_max:
-                    raise ValueError(
-                        f"ENDSTOP VIOLATION: Y-axis movement to {target_pos:.2f} mm "
-                        f"exceeds boundaries [{self.y_min:.2f}, {self.y_max:.2f}] mm. "
-                        f"Command stopped."
-                    )
-            elif axis_idx == 2:  # Z axis
-                if target_pos < self.z_min or target_pos > self.z_max:
-                    raise ValueError(
-                        f"ENDSTOP VIOLATION: Z-axis movement to {target_pos:.2f} mm "
-                        f"exceeds boundaries [{self.z_min:.2f}, {self.z_max:.2f}] mm. "
-                        f"Command stopped."
-                    )
-
-        # Only update positions after ALL boundary checks pass
-        for axis_idx, target_pos in target_positions.items():
-            self.current_position[axis_idx] = target_pos
+        self.start_axis_moves(target_positions)
 
-        print(f"Simulator: Moved relative {move_dist}")
-        print(f"Position updated: X={self.current_position[0]:.2f}, Y={self.current_position[1]:.2f}, Z={self.current_position[2]:.2f}")
+        log.debug("Simulator: Moved relative %s", move_dist)
+        log.debug("Position updated: X=%.2f, Y=%.2f, Z=%.2f", *self.current_position[:3])
 
         return None
 
     def move_absolute(self, move_pos: dict[int, float]) -> dict[int, float] | None:
         """
-        Move to absolute position with boundary checking and position tracking.
+        Move to absolute position with position tracking.
 
         Args:
             move_pos: Dictionary mapping axis index to target position {0: x_pos, 1: y_pos, 2: z_pos}
-
-        Raises:
-            ValueError: If movement would violate endstop boundaries
         """
         if not self.is_homed:
             raise RuntimeError("Motors must be homed before absolute movement. Call home() first.")
@@ -151,37 +165,11 @@ class motion_controller_plugin(MotionControllerPlugin):
         if not isinstance(move_pos, dict) or not move_pos:
             raise ValueError("Error: Input must be a non-empty dictionary.")
 
-        # Check boundaries BEFORE executing movement
-        for axis_idx, target_pos in move_pos.items():
-            if axis_idx == 0:  # X axis
-                if target_pos < self.x_min or target_pos > self.x_max:
-                    raise ValueError(
-                        f"ENDSTOP VIOLATION: X-axis movement to {target_pos:.2f} mm "
-                        f"exceeds boundaries [{self.x_min:.2f}, {self.x_max:.2f}] mm. "
-                        f"Command stopped."
-                    )
-            elif axis_idx == 1:  # Y axis
-                if target_pos < self.y_min or target_pos > self.y_max:
-                    raise ValueError(
-                        f"ENDSTOP VIOLATION: Y-axis movement to {target_pos:.2f} mm "
-                        f"exceeds boundaries [{self.y_min:.2f}, {self.y_max:.2f}] mm. "
-                        f"Command stopped."
-                    )
-            elif axis_idx == 2:  # Z axis
-                if target_pos < self.z_min or target_pos > self.z_max:
-                    raise ValueError(
-                        f"ENDSTOP VIOLATION: Z-axis movement to {target_pos:.2f} mm "
-                        f"exceeds boundaries [{self.z_min:.2f}, {self.z_max:.2f}] mm. "
-                        f"Command stopped."
-                    )
-
         # Execute movement and update positions
-        for axis_idx, target_pos in move_pos.items():
-            if axis_idx in [0, 1, 2]:
-                self.current_position[axis_idx] = target_pos
+        self.start_axis_moves({axis_idx: target_pos for axis_idx, target_pos in move_pos.items() if axis_idx in [0, 1, 2]})
 
-        print(f"Simulator: Moved to absolute position {move_pos}")
-        print(f"Position updated: X={self.current_position[0]:.2f}, Y={self.current_position[1]:.2f}, Z={self.current_position[2]:.2f}")
+        log.debug("Simulator: Moved to absolute position %s", move_pos)
+        log.debug("Position updated: X=%.2f, Y=%.2f, Z=%.2f", *self.current_position[:3])
 
         return None
 
@@ -203,20 +191,22 @@ class motion_controller_plugin(MotionControllerPlugin):
         if axes is None:
             axes = [0, 1, 2]  # Home all axes by default
 
-        print(f"Simulator: Homing axes {axes}")
+        log.info("Simulator: Homing axes %s", axes)
 
         # Set initial position based on scanner type
         scanner_type_str = self.scanner_type.value
         if scanner_type_str == "N-d Scanner":
             # N-d Scanner: Z starts at 300 mm (top of cube)
             self.current_position = [0.0, 0.0, 300.0]
-            print("Homing complete. Position initialized to (0, 0, 300) mm")
+            log.info("Homing complete. Position initialized to (0, 0, 300) mm")
         else:
             # Big Scanner: All axes at 0
             self.current_position = [0.0, 0.0, 0.0]
-            print("Homing complete. Position initialized to (0, 0, 0) mm")
+            log.info("Homing complete. Position initialized to (0, 0, 0) mm")
 
         self.is_homed = True
+        for axis_model, pos in zip(self.axis_models, self.current_position):
+            axis_model.reset(pos)
 
         return {axis: self.current_position[axis] for axis in axes}
 
@@ -224,12 +214,12 @@ class motion_controller_plugin(MotionControllerPlugin):
 
     def get_current_positions(self) -> tuple[float, ...]:
         """
-        Return current tracked positions.
+        Return the simulated positions, part way along a move while moving.
 
         Returns:
             tuple: (x, y, z) positions in mm
         """
-        return tuple(self.current_position)
+        return tuple(axis.position() for axis in self.axis_models)
 
     def get_endstop_minimums(self) -> tuple[float, ...]:
         """Return minimum position limits for all axes."""
@@ -240,7 +230,7 @@ class motion_controller_plugin(MotionControllerPlugin):
         return (self.x_max, self.y_max, self.z_max)
 
     def set_config(self, amps,idle_p, idle_time):
-        print(f"Simulator: Set config - amps={amps}, idle_p={idle_p}, idle_time={idle_time}")
+        log.debug("Simulator: Set config - amps=%s, idle_p=%s, idle_time=%s", amps, idle_p, idle_time)
 
     def is_moving(self, axis=None):
         """
@@ -249,5 +239,18 @@ class motion_controller_plugin(MotionControllerPlugin):
         Returns:
             List of booleans for each axis [X_moving, Y_moving, Z_moving]
         """
-        # Simulator: Always return False (not moving)
-        return [False, False, False]
\ No newline at end of file
+        # every status query takes a little time, this is what moves a virtual clock along
+        self.clock.advance(self.query_time.value)
+        return [axis.is_moving() for axis in self.axis_models]
+
+    def emergency_stop(self):
+        """Stop every axis where it currently is."""
+        log.warning("Simulator: EMERGENCY STOP")
+        for axis_idx, axis in enumerate(self.axis_models):
+            axis.noise = 0.0
+            axis.reset(axis.position())
+            self.current_position[axis_idx] = axis.target
+
+    def get_simulated_time(self) -> float:
+        """Simulation clock in seconds, for throughput estimates"""
+        return self.clock.now()
\ No newline at end of file
@@ -0,0 +1,186 @@
+import struct
+import threading
+import time
+from collections import deque
+from datetime import datetime, timedelta
+
+from scanner.scan_logging import get_logger
+
+log = get_logger("cybot")
+
+
+class TelemetryLogger:
+    """Buffered logger for raw socket telemetry.
+
+    The receive thread only calls feed(), which stamps the bytes with a
+    monotonic timestamp and appends them to a bounded ring buffer. A writer
+    thread drains the ring in batches, when flush_bytes have piled up or every
+    flush_interval seconds, whichever comes first. Console echo is optional
+    and limited to one line per echo_interval seconds.
+
+    Text format writes one "[time] RX: ..." line per received chunk, binary
+    format writes "<qI" (monotonic ns, length) headers followed by the bytes.
+    """
+
+    BINARY_HEADER = struct.Struct("<qI")
+    ECHO_MAX_CHARS = 120
+
+    def __init__(self, filename: str, binary: bool = False, capacity: int = 65536, flush_bytes: int = 256 * 1024,
+                 flush_interval: float = 0.5, echo: bool = False, echo_interval: float = 1.0) -> None:
+        self.filename = filename
+        self.binary = binary
+        self.flush_bytes = flush_bytes
+        self.flush_interval = flush_interval
+        self.echo = echo
+        self.echo_interval = echo_interval
+        self.dropped = 0
+        self.bytes_written = 0
+        self._ring = deque(maxlen=capacity)
+        self._pending_bytes = 0
+        # feed() and _drain() run on different threads, the ring and its byte count change together
+        self._lock = threading.Lock()
+        self._wake = threading.Event()
+        self._running = False
+        self._writer_thread = None
+        self._last_echo = 0.0
+        self._echo_skipped = 0
+
+    def start(self) -> None:
+        # monotonic stamps are turned into wall clock time only when written
+        self._wall_start = datetime.now()
+        self._mono_start = time.monotonic_ns()
+        self._running = True
+        self._writer_thread = threading.Thread(target=self._writer_loop, daemon=True)
+        self._writer_thread.start()
+
+    def feed(self, data: bytes) -> None:
+        """Queue one received chunk. Cheap enough to call from the receive loop."""
+        stamp = time.monotonic_ns()
+        with self._lock:
+            if len(self._ring) == self._ring.maxlen:
+                # the oldest chunk falls out of the ring, and out of the count
+                self.dropped += 1
+                self._pending_bytes -= len(self._ring[0][1])
+            self._ring.append((stamp, data))
+            self._pending_bytes += len(data)
+            full = self._pending_bytes >= self.flush_bytes
+        if full:
+            self._wake.set()
+
+    def stop(self) -> None:
+        self._running = False
+        self._wake.set()
+        if self._writer_thread:
+            self._writer_thread.join()
+            self._writer_thread = None
+
+    def _drain(self) -> list:
+        with self._lock:
+            batch = list(self._ring)
+            self._ring.clear()
+            self._pending_bytes = 0
+        return batch
+
+    def _timestamp(self, mono_ns: int) -> str:
+        wall = self._wall_start + timedelta(microseconds=(mono_ns - self._mono_start) // 1000)
+        return wall.strftime("%H:%M:%S.%f")[:-3]
+
+    def _format_batch(self, batch) -> bytes:
+        if self.binary:
+            header = self.BINARY_HEADER.pack
+            return b"".join(header(stamp, len(data)) + data for stamp, data in batch)
+        lines = [f"[{self._timestamp(stamp)}] RX: {data.decode('utf-8', errors='ignore').strip()}\n" for stamp, data in batch]
+        return "".join(lines).encode("utf-8")
+
+    def _echo_batch(self, batch) -> None:
+        now = time.monotonic()
+        if now - self._last_echo < self.echo_interval:
+            self._echo_skipped += len(batch)
+            return
+        stamp, data = batch[-1]
+        skipped = self._echo_skipped + len(batch) - 1
+        suffix = f" (+{skipped} more)" if skipped else ""
+        text = data.decode('utf-8', errors='ignore').strip()
+        if len(text) > self.ECHO_MAX_CHARS:
+            text = text[:self.ECHO_MAX_CHARS] + "..."
+        log.info("[%s] RX: %s%s", self._timestamp(stamp), text, suffix)
+        self._last_echo = now
+        self._echo_skipped = 0
+
+    def _writer_loop(self) -> None:
+        with open(self.filename, "ab") as f:
+            if not self.binary:
+                f.write(f"\n--- Session Started: {self._wall_start} ---\n".encode("utf-8"))
+            while True:
+                self._wake.wait(self.flush_interval)
+                self._wake.clear()
+                running = self._running
+                batch = self._drain()
+                if batch:
+                    payload = self._format_batch(batch)
+                    f.write(payload)
+                    f.flush()
+                    self.bytes_written += len(payload)
+                    if self.echo:
+                        self._echo_batch(batch)
+                if not running:
+                    break
+        if self.dropped:
+            log.warning("Telemetry logger dropped %d chunks, ring buffer was full.", self.dropped)
+
+
+if __name__ == "__main__":
+    # local TCP stand-in for the cyBot: a sender streams telemetry lines as fast as it can,
+    # the receive loop only feeds the logger, the way cyBot_Plugin.read_thread_interrupt does
+    import os
+    import socket
+    import tempfile
+
+    lines = b"".join(b"t=%08d x=%7.3f y=%7.3f rssi=-%02d\n" % (i, i * 0.01, -i * 0.02, i % 90) for i in range(200_000))
+    server = socket.create_server(("127.0.0.1", 0))
+
+    def send():
+        conn, _ = server.accept()
+        with conn:
+            for start in range(0, len(lines), 1000):
+                conn.sendall(lines[start:start + 1000])
+
+    def receive(logger):
+        threading.Thread(target=send, daemon=True).start()
+        chunks = 0
+        with socket.create_connection(server.getsockname()) as sock:
+            logger.start()
+            start = time.perf_counter()
+            while data := sock.recv(65536):
+                logger.feed(data)
+                chunks += 1
+            logger.stop()
+        return chunks, time.perf_counter() - start
+
+    with tempfile.TemporaryDirectory() as tmp:
+        binary_file = os.path.join(tmp, "telemetry.bin")
+        binary_chunks, elapsed = receive(TelemetryLogger(binary_file, binary=True))
+        with open(binary_file, "rb") as f:
+            raw = f.read()
+        received, stamps, offset = [], [], 0
+        while offset < len(raw):
+            stamp, length = TelemetryLogger.BINARY_HEADER.unpack_from(raw, offset)
+            offset += TelemetryLogger.BINARY_HEADER.size
+            received.append(raw[offset:offset + length])
+            stamps.append(stamp)
+            offset += length
+        checks = [b"".join(received) == lines, len(received) == binary_chunks, stamps == sorted(stamps)]
+
+        text_file = os.path.join(tmp, "telemetry.txt")
+        chunks, _ = receive(TelemetryLogger(text_file, echo=True, echo_interval=0.05))
+        with open(text_file, encoding="utf-8") as f:
+            text = f.read()
+        checks.append(text.count("] RX: ") == chunks and "t=00199999" in text)
+
+    # a full ring drops the oldest chunks and their bytes
+    ring = TelemetryLogger(os.devnull, capacity=4)
+    for size in range(1, 11):
+        ring.feed(b"x" * size)
+    checks.append(ring.dropped == 6 and ring._pending_bytes == 7 + 8 + 9 + 10)
+    print("telemetry:", "ok" if all(checks) else f"FAILED {checks}")
+    print(f"{len(lines) / 1e6:.1f} MB over TCP in {binary_chunks} chunks, logged in {elapsed:.2f}s")
@@ -3,17 +3,16 @@ from typing import Sequence, Any
 
 from scanner.plugin_setting import PluginSettingString, PluginSettingInteger
 from scanner.motion_controller import MotionControllerPlugin
+from scanner.gcode_simulator_server import GcodeSimulatorServer, DEFAULT_PORT
 
 import zmq
 
 
-
-DEFAULT_PORT = 5556
-
-
 class GcodeSimulator(MotionControllerPlugin):
     port: PluginSettingInteger
     number_of_axes: PluginSettingInteger
+    server_mode: PluginSettingString
+    command_mode: PluginSettingString
     
     _socket: zmq.Socket
 
@@ -22,9 +21,17 @@ class GcodeSimulator(MotionControllerPlugin):
     def __init__(self) -> None:
         self.port = PluginSettingInteger("Port Number", DEFAULT_PORT)
         self.number_of_axes = PluginSettingInteger("Number of Axes", 0, read_only=True)
+        # Bundled starts gcode_simulator_server on the port, External expects one already running
+        self.server_mode = PluginSettingString("Simulator Server", "Bundled", select_options=["Bundled", "External"], restrict_selections=True)
+        # Pipelined sends batches tagged with correlation ids instead of one command per round trip
+        self.command_mode = PluginSettingString("Command Mode", "Pipelined", select_options=["Lock-step", "Pipelined"], restrict_selections=True)
         super().__init__()
         self.add_setting_pre_connect(self.port)
+        self.add_setting_pre_connect(self.server_mode)
         self.add_setting_post_connect(self.number_of_axes)
+        self.add_setting_post_connect(self.command_mode)
+        self._server = None
+        self._next_id = 0
     
     def write_line(self, line: str) -> None:
         self._socket.send_string(f"{line}\n")
@@ -32,6 +39,35 @@ class GcodeSimulator(MotionControllerPlugin):
     def read_line(self) -> str:
         return self._socket.recv_string()
 
+    def send_batch(self, lines: Sequence[str]) -> list[str]:
+        """Send lines and return their replies in order, raising on the first error.
+
+        Pipelined, all lines go out in one message as "#<id> <line>" and the
+        replies are matched back by id, so a whole row costs one round trip.
+        Lock-step sends them one at a time.
+        """
+        if self.command_mode.value != "Pipelined":
+            replies = []
+            for line in lines:
+                self.write_line(line)
+                replies.append(self.check_for_error(self.read_line()))
+            return replies
+        first = self._next_id
+        self._next_id += len(lines)
+        self._socket.send_string("\n".join(f"#{first + i} {line}" for i, line in enumerate(lines)))
+        replies = {}
+        while len(replies) < len(lines):
+            for reply in self._socket.recv_string().splitlines():
+                tag, _, text = reply.partition(" ")
+                corr_id = int(tag.lstrip("#"))
+                # replies to an earlier, abandoned batch are dropped
+                if first <= corr_id < first + len(lines):
+                    replies[corr_id] = text
+        return [self.check_for_error(replies[first + i]) for i in range(len(lines))]
+
+    def query(self, line: str) -> str:
+        return self.send_batch([line])[0]
+
     def format_axis_command(self, command: str, axis_vals: dict[int, float]) -> str:
         return f"{command} " + " ".join(f"{self.axis_names[axis]}{vel}" for axis,vel in axis_vals.items())
     
@@ -41,6 +77,8 @@ class GcodeSimulator(MotionControllerPlugin):
         return return_code
 
     def connect(self) -> None:
+        if self.server_mode.value == "Bundled":
+            self._server = GcodeSimulatorServer(self.port.value).start()
         self._context = zmq.Context()
         self._socket = self._context.socket(zmq.PAIR)
         self._socket.connect(f"tcp://localhost:{self.port.value}")
@@ -50,7 +88,11 @@ class GcodeSimulator(MotionControllerPlugin):
 
     def disconnect(self) -> None:
         self.number_of_axes.value = 0
-        # self.port.close()
+        self._socket.close(linger=0)
+        self._context.term()
+        if self._server is not None:
+            self._server.stop()
+            self._server = None
 
     def get_axis_display_names(self) -> tuple[str, ...]:
         return self.axis_names
@@ -58,52 +100,83 @@ class GcodeSimulator(MotionControllerPlugin):
     def get_axis_units(self) -> tuple[str, ...]:
         return tuple(["mm"] * len(self.axis_names))
     
-    def set_velocity(self, velocities: dict[int, float]) -> None:
-        self.write_line(self.format_axis_command("V00", velocities))
-        self.check_for_error(self.read_line())
+    def set_velocity(self, velocities: dict[int, float] | None = None) -> None:
+        if velocities:
+            self.query(self.format_axis_command("V00", velocities))
 
-    def set_acceleration(self, accel: dict[int, float]) -> None:
-        self.write_line(self.format_axis_command("A00", accel))
-        self.check_for_error(self.read_line())
+    def set_acceleration(self, accel: dict[int, float] | None = None) -> None:
+        if accel:
+            self.query(self.format_axis_command("A00", accel))
 
 
     def move_relative(self, move_dist: dict[int, float]) -> dict[int, float] | None:
-        self.write_line(self.format_axis_command("G01", move_dist))
-        self.check_for_error(self.read_line())
+        self.query(self.format_axis_command("G01", move_dist))
         return None
 
     def move_absolute(self, move_pos: dict[int, float]) -> dict[int, float] | None:
-        self.write_line(self.format_axis_command("G00", move_pos))
-        self.check_for_error(self.read_line())
+        self.query(self.format_axis_command("G00", move_pos))
         return None
 
-    def home(self, axes: list[int]) -> dict[int, float]:
-        self.write_line("G28 + " " ".join(self.axis_names[axis] for axis in axes))
-        self.check_for_error(self.read_line())
+    def run_program(self, program, on_sample=None) -> None:
+        """Run a compiled gcodeProgram.GcodeProgram, waiting for the stage only at its sample points.
+        Pipelined, the moves up to each sample point and the wait go out as one batch."""
+        sample = 0
+        moves = list(program.axis_moves())
+        batch = []
+        for move_idx in range(len(moves) + 1):
+            while sample < program.num_samples and program.sample_after_move[sample] == move_idx:
+                self.wait_for_moves(batch)
+                batch = []
+                if on_sample is not None:
+                    on_sample(int(program.sample_points[sample]))
+                sample += 1
+            if move_idx < len(moves):
+                batch.append(self.format_axis_command("G01", moves[move_idx]))
+        self.wait_for_moves(batch)
+
+    def run_moves(self, moves, on_point=None) -> None:
+        """Relative (axis, distance) moves, one batch for the whole list unless on_point(move_index) needs the stage stopped after each"""
+        lines = [self.format_axis_command("G01", {axis: dist}) for axis, dist in moves]
+        if on_point is None:
+            self.wait_for_moves(lines)
+            return
+        for move_idx, line in enumerate(lines):
+            self.wait_for_moves([line])
+            on_point(move_idx)
+
+    def wait_for_moves(self, lines: Sequence[str]) -> None:
+        """Send lines and return once the stage has stopped after them"""
+        if self.command_mode.value == "Pipelined":
+            self.send_batch(list(lines) + ["M400"])
+            return
+        self.send_batch(lines)
+        while self.is_moving():
+            pass
+
+    def home(self, axes: list[int] | None = None) -> dict[int, float]:
+        if axes is None:
+            axes = list(range(len(self.axis_names)))
+        self.query("G28 " + " ".join(self.axis_names[axis] for axis in axes))
         return {axis:0.0 for axis in axes}
 
 
     def get_current_positions(self) -> tuple[float, ...]:
-        self.write_line("G00?")
-        ret = self.check_for_error(self.read_line())
+        ret = self.query("G00?")
         return tuple(float(pos.strip("XYZW")) for pos in ret.split())
     
-    def is_moving(self) -> bool:
-        self.write_line("Status?")
-        ret = self.check_for_error(self.read_line())
-        return ret == "Moving"
+    def is_moving(self, axis=None) -> bool:
+        return self.query("Status?") == "Moving"
 
     def get_endstop_minimums(self) -> tuple[float, ...]:
-        self.write_line("E00-?")
-        ret = self.check_for_error(self.read_line())
+        ret = self.query("E00-?")
         return tuple(float(pos.strip("XYZW")) for pos in ret.split())
 
     def get_endstop_maximums(self) -> tuple[float, ...]:
-        self.write_line("E00+?")
-        ret = self.check_for_error(self.read_line())
+        ret = self.query("E00+?")
         return tuple(float(pos.strip("XYZW")) for pos in ret.split())
 
+    def set_config(self, amps, idle_p, idle_time):
+        pass
 
-
-
-
+    def emergency_stop(self):
+        self.query("M112")
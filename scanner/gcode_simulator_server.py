@@ -0,0 +1,198 @@
+###############
+#  Local ZeroMQ server for gcode_simulator.GcodeSimulator.
+#
+#  Speaks the simulator protocol over a PAIR socket (V00/A00 velocity and
+#  acceleration, G01 relative and G00 absolute moves, G28 home, M400 wait
+#  for idle, M112 stop, G00? positions, Status?, E00-?/E00+? endstops), with the
+#  axes moved by motionProfile.AxisModel so status and positions behave
+#  like a real stage.
+#
+#  A message is one command and gets one reply (lock-step), or several
+#  newline separated "#<id> <command>" lines that are all executed and
+#  answered in one message of "#<id> <reply>" lines (pipelined). After an
+#  error the rest of a batch is skipped, like a controller that stops on
+#  a bad line.
+###############
+import threading
+import time
+
+import zmq
+
+from scanner.Plugins.motionProfile import SimClock, AxisModel
+
+DEFAULT_PORT = 5556
+AXIS_NAMES = ("X", "Y", "Z", "W")
+
+
+class GcodeSimulatorServer:
+    """Simulated 4 axis stage behind a ZMQ PAIR socket, served from a thread.
+
+    speedup is passed to SimClock: 1 runs in real time, 0 is a virtual
+    clock that moves on by query_time per Status? and jumps to the end of
+    the motion on M400.
+    """
+
+    def __init__(self, port: int = DEFAULT_PORT, speedup: float = 0.0, query_time: float = 0.002,
+                 minimums=(0.0, 0.0, 0.0, 0.0), maximums=(300.0, 300.0, 300.0, 360.0)) -> None:
+        self.port = port
+        self.query_time = query_time
+        self.minimums = tuple(float(v) for v in minimums)
+        self.maximums = tuple(float(v) for v in maximums)
+        self.clock = SimClock(speedup)
+        self.axes = [AxisModel(self.clock) for _ in AXIS_NAMES]
+        self.commands_handled = 0
+        self.messages_handled = 0
+        self._context = None
+        self._socket = None
+        self._thread = None
+        self._running = False
+
+    def start(self) -> "GcodeSimulatorServer":
+        self._context = zmq.Context()
+        self._socket = self._context.socket(zmq.PAIR)
+        self._socket.bind(f"tcp://127.0.0.1:{self.port}")
+        self._running = True
+        self._thread = threading.Thread(target=self._serve, name="gcode-sim-server", daemon=True)
+        self._thread.start()
+        return self
+
+    def stop(self) -> None:
+        self._running = False
+        if self._thread is not None:
+            self._thread.join()
+            self._thread = None
+        if self._socket is not None:
+            self._socket.close(linger=0)
+            self._context.term()
+            self._socket = self._context = None
+
+    def _serve(self) -> None:
+        poller = zmq.Poller()
+        poller.register(self._socket, zmq.POLLIN)
+        while self._running:
+            if not poller.poll(50):
+                continue
+            message = self._socket.recv_string()
+            self._socket.send_string(self.handle_message(message))
+
+    def handle_message(self, message: str) -> str:
+        self.messages_handled += 1
+        lines = [line for line in message.splitlines() if line.strip()]
+        if len(lines) == 1 and not lines[0].startswith("#"):
+            return self.handle(lines[0])
+        replies = []
+        failed = False
+        for line in lines:
+            tag, _, command = line.partition(" ")
+            if failed:
+                reply = "Error: skipped after an earlier error"
+            else:
+                reply = self.handle(command)
+                failed = reply.startswith("Error")
+            replies.append(f"{tag} {reply}")
+        return "\n".join(replies)
+
+    def handle(self, line: str) -> str:
+        self.commands_handled += 1
+        tokens = line.split()
+        if not tokens:
+            return "Error: empty command"
+        word = tokens[0]
+        try:
+            if word == "Status?":
+                self.clock.advance(self.query_time)
+                return "Moving" if any(axis.is_moving() for axis in self.axes) else "Stopped"
+            if word == "G00?":
+                return " ".join(f"{name}{axis.position():.4f}" for name, axis in zip(AXIS_NAMES, self.axes))
+            if word == "E00-?":
+                return " ".join(f"{name}{pos:g}" for name, pos in zip(AXIS_NAMES, self.minimums))
+            if word == "E00+?":
+                return " ".join(f"{name}{pos:g}" for name, pos in zip(AXIS_NAMES, self.maximums))
+            if word == "M400":
+                self._wait_idle()
+                return "OK"
+            if word == "M112":
+                # stop where the axes are now
+                for axis in self.axes:
+                    axis.reset(axis.position())
+                return "OK"
+            if word == "G28":
+                names = [tok for tok in tokens[1:] if tok in AXIS_NAMES] or AXIS_NAMES
+                for name in names:
+                    self.axes[AXIS_NAMES.index(name)].reset(0.0)
+                return "OK"
+            if word in ("V00", "A00", "G00", "G01"):
+                return self._axis_command(word, self._parse_axes(tokens[1:]))
+        except ValueError as e:
+            return f"Error: {e}"
+        return f"Error: Unknown command '{line}'"
+
+    @staticmethod
+    def _parse_axes(tokens) -> dict[int, float]:
+        values = {}
+        for tok in tokens:
+            if tok[:1] not in AXIS_NAMES:
+                raise ValueError(f"Unknown axis in '{tok}'")
+            values[AXIS_NAMES.index(tok[0])] = float(tok[1:])
+        return values
+
+    def _axis_command(self, word: str, values: dict[int, float]) -> str:
+        if word == "V00":
+            for idx, val in values.items():
+                self.axes[idx].velocity = val
+            return "OK"
+        if word == "A00":
+            for idx, val in values.items():
+                self.axes[idx].accel = val
+            return "OK"
+        # check every axis of the move before starting any of them
+        targets = {idx: (self.axes[idx].target + val if word == "G01" else val) for idx, val in values.items()}
+        for idx, target in targets.items():
+            if not self.minimums[idx] <= target <= self.maximums[idx]:
+                return f"Error: {AXIS_NAMES[idx]} target {target:g} outside [{self.minimums[idx]:g}, {self.maximums[idx]:g}]"
+        for idx, target in targets.items():
+            self.axes[idx].move_to(target)
+        return "OK"
+
+    def _wait_idle(self) -> None:
+        busy_until = max(axis.busy_until for axis in self.axes)
+        wait = busy_until - self.clock.now()
+        if self.clock.is_virtual:
+            self.clock.advance(wait)
+        elif wait > 0:
+            time.sleep(wait / self.clock.speedup)
+
+
+def benchmark(rows: int = 20, row_length: int = 50, port: int = DEFAULT_PORT + 100) -> dict[str, float]:
+    """Commands per second for rows of (move, Status?) pairs, sent one at a
+    time in lock-step and as one pipelined burst per row."""
+    from scanner.gcode_simulator import GcodeSimulator
+    server = GcodeSimulatorServer(port).start()
+    client = GcodeSimulator()
+    client.port.value = port
+    client.server_mode.value = "External"
+    results = {}
+    try:
+        client.connect()
+        for mode in ("Lock-step", "Pipelined"):
+            client.command_mode.value = mode
+            client.home([0, 1])
+            start = time.perf_counter()
+            for row in range(rows):
+                step = 1.0 if row % 2 == 0 else -1.0
+                lines = []
+                for _ in range(row_length):
+                    lines += [client.format_axis_command("G01", {0: step}), "Status?"]
+                lines.append(client.format_axis_command("G01", {1: 1.0}))
+                client.send_batch(lines)
+            elapsed = time.perf_counter() - start
+            results[mode] = rows * (2 * row_length + 1) / elapsed
+        client.disconnect()
+    finally:
+        server.stop()
+    return results
+
+
+if __name__ == "__main__":
+    for mode, rate in benchmark().items():
+        print(f"{mode:>10}: {rate:10.0f} commands/s")
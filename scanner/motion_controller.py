@@ -1,6 +1,10 @@
 
 from abc import ABC, abstractmethod
+from concurrent.futures import Future, ThreadPoolExecutor
 from typing import Sequence
+import threading
+
+import numpy as np
 
 from scanner.plugin_setting import PluginSetting
 import time
@@ -9,6 +13,10 @@ class MotionControllerPlugin(ABC):
     settings_pre_connect: list[PluginSetting]
     settings_post_connect: list[PluginSetting]
 
+    # True when move_absolute() takes per axis offsets (what run_scan sends),
+    # False when it takes absolute targets. MotionController tracks targets from this.
+    relative_moves: bool = False
+
     def __init__(self) -> None:
         self.settings_pre_connect = []
         self.settings_post_connect = []
@@ -71,27 +79,48 @@ class MotionControllerPlugin(ABC):
 class MotionController:
     _axis_labels: tuple[str, ...]
     _target_positions: list[float]
+    # bumped whenever an axis target is set outright, so a failed async move knows whether to undo its offset
+    _target_epochs: list[int]
     # axis_velocities: list[float]
     # axis_accels: list[float]
     _endstop_minimums: tuple[float, ...]
     _endstop_maximums: tuple[float, ...]
+    # soft limit envelope, tolerance already applied, infinite where an axis has no limit
+    _lower: tuple[float, ...]
+    _upper: tuple[float, ...]
+    # limits are only enforced once home() has told us where the stage is
+    _has_reference: bool
 
     _driver: MotionControllerPlugin
     _is_driver_connected: bool
 
+    # seconds between is_moving() polls while an async move waits for the stage
+    poll_interval: float = 0.002
+    # slack on the envelope so summed float steps ending on a limit still pass
+    limit_tolerance: float = 1e-6
+
     def __init__(self, motion_plugin: MotionControllerPlugin) -> None:
         self._driver = motion_plugin
         self._is_driver_connected = False
+        # one worker runs async commands in order, the lock keeps them and direct calls off the port at the same time
+        self._executor = None
+        self._port_lock = threading.RLock()
+        self._targets_lock = threading.Lock()
         self.disconnect()
 
     def connect(self) -> None:
         self._driver.connect()
         self._is_driver_connected = True
-        self._axis_labels = self._driver.get_axis_display_names()
+        # plugins that don't name their axes get the three the scanner drives
+        self._axis_labels = tuple(self._driver.get_axis_display_names() or ("X", "Y", "Z"))
         #self._target_positions = list(self._driver.get_current_positions())
         
         self._endstop_minimums = self._driver.get_endstop_minimums()
         self._endstop_maximums = self._driver.get_endstop_maximums()
+        self._target_positions = [0.0] * len(self._axis_labels)
+        self._target_epochs = [0] * len(self._axis_labels)
+        self._has_reference = False
+        self.set_soft_limits(self._endstop_minimums, self._endstop_maximums)
         #time.sleep(2)
         #self._endstop_maximums = self._driver.home()
         self._driver.set_velocity()
@@ -102,12 +131,19 @@ class MotionController:
         return self._is_driver_connected
     
     def disconnect(self) -> None:
+        if self._executor is not None:
+            self._executor.shutdown(wait=True)
+            self._executor = None
         was_connected = self._is_driver_connected
         self._is_driver_connected = False
         self._axis_labels = ()
         self._target_positions = []
+        self._target_epochs = []
         self._endstop_minimums = ()
         self._endstop_maximums = ()
+        self._lower = ()
+        self._upper = ()
+        self._has_reference = False
         if was_connected:
             self._driver.disconnect()
     
@@ -136,44 +172,250 @@ class MotionController:
     def set_config(self, amps,idle_p, idle_time):
         self.must_be_connected()
         self._driver.set_config(amps,idle_p, idle_time)
-    #TODO:
+
+    def set_soft_limits(self, minimums: Sequence[float | None] | None = None, maximums: Sequence[float | None] | None = None) -> None:
+        """Set the per axis envelope moves are checked against, None (or a
+        missing entry) leaves that side of an axis unlimited. connect() sets
+        it to the plugin's endstops, call again to narrow it."""
+        num_axes = len(self._axis_labels)
+        def side(values, default):
+            values = list(values or [])[:num_axes]
+            values += [None] * (num_axes - len(values))
+            return tuple(default if v is None else float(v) for v in values)
+        self._lower = tuple(v - self.limit_tolerance for v in side(minimums, -np.inf))
+        self._upper = tuple(v + self.limit_tolerance for v in side(maximums, np.inf))
+
+    def get_soft_limits(self) -> tuple[tuple[float, ...], tuple[float, ...]]:
+        return (tuple(v + self.limit_tolerance for v in self._lower),
+                tuple(v - self.limit_tolerance for v in self._upper))
+
+    def set_reference_positions(self, axis_positions: dict[int, float]) -> None:
+        """Tell the controller where the stage is (home() does this), which turns the limits on"""
+        self._target_positions_update({axis: float(pos) for axis, pos in axis_positions.items()}, absolute=True)
+        self._has_reference = True
+
+    @property
+    def relative_moves(self) -> bool:
+        """True when move_absolute() offsets are passed on as offsets (see MotionControllerPlugin.relative_moves)"""
+        return self._driver.relative_moves
+
+    def get_target_positions(self) -> tuple[float, ...]:
+        """Where the stage was last commanded to, in the plugin's units"""
+        return tuple(self._target_positions)
+
+    def _resolve_targets(self, axis_values: dict[int, float], relative: bool) -> dict[int, float]:
+        # one compare pair per axis, the envelope is precomputed
+        targets = {}
+        for axis, val in axis_values.items():
+            if not 0 <= axis < len(self._axis_labels):
+                raise ValueError(f"Axis index '{axis}' is invalid.")
+            pos = self._target_positions[axis] + val if relative else float(val)
+            if self._has_reference and not self._lower[axis] <= pos <= self._upper[axis]:
+                lo, hi = self._lower[axis] + self.limit_tolerance, self._upper[axis] - self.limit_tolerance
+                raise ValueError(f"ENDSTOP VIOLATION: {self._axis_labels[axis]}-axis movement to {pos:.2f} "
+                                 f"exceeds boundaries [{lo:.2f}, {hi:.2f}]. Command stopped.")
+            targets[axis] = pos
+        return targets
+
+    def validate_path(self, points, relative: bool = False, origin=None, first_index: int = 0):
+        """Check a whole path against the envelope before running it.
+
+        points is (num_axes, N) like a pattern matrix, absolute positions or,
+        with relative=True, successive moves from origin (the current targets
+        by default). Raises ValueError naming the first point outside the
+        envelope, numbered from first_index. Returns the last position, the
+        origin for the next piece of a path checked in chunks.
+        """
+        points = np.asarray(points, dtype=float)
+        if points.ndim == 1:
+            points = points[:, np.newaxis]
+        num_axes = points.shape[0]
+        if num_axes > len(self._axis_labels):
+            raise ValueError(f"Path has {num_axes} axes, the stage has {len(self._axis_labels)}.")
+        if relative:
+            if origin is None:
+                origin = self._target_positions[:num_axes]
+            points = np.asarray(origin, dtype=float)[:, np.newaxis] + np.cumsum(points, axis=1)
+        end = points[:, -1] if points.shape[1] else origin
+        if not self._has_reference:
+            return end
+        lower = np.asarray(self._lower[:num_axes])[:, np.newaxis]
+        upper = np.asarray(self._upper[:num_axes])[:, np.newaxis]
+        outside = (points < lower) | (points > upper)
+        if outside.any():
+            axis, point = np.argwhere(outside.T)[0][::-1]
+            lo, hi = lower[axis, 0] + self.limit_tolerance, upper[axis, 0] - self.limit_tolerance
+            raise ValueError(f"ENDSTOP VIOLATION: path point {first_index + point} moves the {self._axis_labels[axis]}-axis to "
+                             f"{points[axis, point]:.2f}, outside [{lo:.2f}, {hi:.2f}].")
+        return end
+
+    def validate_chunks(self, chunks, relative: bool = False) -> None:
+        """validate_path over a path given as successive (num_axes, k) pieces,
+        e.g. scan_patterns.step_chunks(), without joining them"""
+        if not self._has_reference:
+            return
+        origin = None
+        checked = 0
+        for points in chunks:
+            origin = self.validate_path(points, relative, origin, checked)
+            checked += np.shape(points)[1]
+
     def move_absolute(self, axis_positions: dict[int, float]) -> None:
+        """Send axis_positions to the plugin as is (offsets for relative_moves
+        plugins, targets otherwise) after checking the targets against the envelope"""
         self.must_be_connected()
-        
+        targets = self._resolve_targets(axis_positions, self._driver.relative_moves)
+        with self._port_lock:
+            ret_positions = self._driver.move_absolute(axis_positions)
+        self._target_positions_update(targets, absolute=not self._driver.relative_moves)
+        return ret_positions
 
-        
-        # for ind in axis_positions:
-        #     if axis_positions[ind] > self._endstop_maximums[ind]:
-        #         axis_positions[ind] = self._endstop_maximums[ind]
-        #     if axis_positions[ind] < self._endstop_minimums[ind]:
-        #         axis_positions[ind] = self._endstop_minimums[ind]
-        ret_positions = self._driver.move_absolute(axis_positions)
-        
-        if ret_positions is None:
-            ret_positions = axis_positions
-        for ind,val in axis_positions.items():
-            #self._target_positions[ind] = val 
-            #TODO:
-        
-            pass
-        
+    def _target_positions_update(self, targets: dict[int, float], absolute: bool = False) -> None:
+        with self._targets_lock:
+            for axis, pos in targets.items():
+                self._target_positions[axis] = pos
+                if absolute:
+                    self._target_epochs[axis] += 1
+
+    def _relative_command(self, axis_offsets: dict[int, float]) -> tuple[dict[int, float], dict[int, float]]:
+        # (checked targets, what the plugin's move_absolute expects) for a relative move
+        targets = self._resolve_targets(axis_offsets, True)
+        return targets, (dict(axis_offsets) if self._driver.relative_moves else targets)
 
     def move_relative(self, axis_offsets: dict[int, float]) -> None:
-        for axis,pos in enumerate(self._target_positions):
-            if axis in axis_offsets:
-                axis_offsets[axis] += pos
-        self.move_absolute(axis_offsets)
+        self.must_be_connected()
+        targets, command = self._relative_command(axis_offsets)
+        with self._port_lock:
+            ret_positions = self._driver.move_absolute(command)
+        self._target_positions_update(targets)
+        return ret_positions
+
+    def run_program(self, program, on_sample=None) -> None:
+        """Run a compiled motion program (e.g. gcodeProgram.GcodeProgram) on drivers that support it"""
+        self.must_be_connected()
+        if not hasattr(self._driver, "run_program"):
+            raise NotImplementedError(f"{type(self._driver).__name__} cannot run compiled programs.")
+        moves = np.asarray(program.moves, dtype=float)
+        self.validate_path(moves.T, relative=True)
+        with self._port_lock:
+            self._driver.run_program(program, on_sample)
+        self._advance_targets(moves.sum(axis=0))
+
+    def run_moves(self, moves: Sequence[tuple[int, float]], on_point=None, **kwargs) -> None:
+        """Run a list of (axis, distance) moves as one plugin side sequence, checked as a whole first"""
+        self.must_be_connected()
+        if not hasattr(self._driver, "run_moves"):
+            raise NotImplementedError(f"{type(self._driver).__name__} cannot run move sequences.")
+        moves = list(moves)
+        deltas = np.zeros((len(self._axis_labels), len(moves)))
+        for idx, (axis, dist) in enumerate(moves):
+            deltas[axis, idx] = dist
+        self.validate_path(deltas, relative=True)
+        with self._port_lock:
+            self._driver.run_moves(moves, on_point, **kwargs)
+        self._advance_targets(deltas.sum(axis=1))
+
+    def _advance_targets(self, offsets) -> None:
+        with self._targets_lock:
+            for axis, offset in enumerate(offsets):
+                self._target_positions[axis] += float(offset)
+
+    def supports_software_triggered_rows(self) -> bool:
+        return hasattr(self._driver, "run_software_triggered_row")
+
+    def run_software_triggered_row(self, axis: int, distance: float, trigger_offsets: Sequence[float], output: int = 1) -> None:
+        """Move axis by distance in one move while the plugin pulses a trigger
+        output as the polled position passes trigger_offsets from the start of
+        the row. Software-timed, so pulses lag by up to one status poll of
+        travel (experimental, see the plugin's run_software_triggered_row)"""
+        self.must_be_connected()
+        self.must_be_valid_index([axis])
+        if not self.supports_software_triggered_rows():
+            raise NotImplementedError(f"{type(self._driver).__name__} has no software-timed trigger output.")
+        targets = self._resolve_targets({axis: distance}, True)
+        with self._port_lock:
+            self._driver.run_software_triggered_row(axis, distance, trigger_offsets, output)
+        self._target_positions_update(targets)
+
+    def move_absolute_async(self, axis_positions: dict[int, float], wait_idle: bool = True) -> Future:
+        """Start move_absolute on the command executor and return at once.
+
+        The Future resolves to the plugin's return value once the move has
+        been sent and, with wait_idle, once is_moving() reports the stage
+        stopped. Works with every plugin, blocking or not. Use
+        asyncio.wrap_future() to await it from a coroutine. The limits are
+        checked and the targets updated before the move is queued, so moves
+        queued behind it are checked from where this one ends. If the move
+        fails its offset is taken back out of the targets.
+        """
+        self.must_be_connected()
+        targets = self._resolve_targets(axis_positions, self._driver.relative_moves)
+        return self._submit_move(targets, dict(axis_positions), not self._driver.relative_moves, wait_idle)
+
+    def move_relative_async(self, axis_offsets: dict[int, float], wait_idle: bool = True) -> Future:
+        self.must_be_connected()
+        targets, command = self._relative_command(axis_offsets)
+        return self._submit_move(targets, command, False, wait_idle)
+
+    def _submit_move(self, targets: dict[int, float], command: dict[int, float], absolute: bool, wait_idle: bool) -> Future:
+        with self._targets_lock:
+            offsets = {axis: pos - self._target_positions[axis] for axis, pos in targets.items()}
+            for axis, pos in targets.items():
+                self._target_positions[axis] = pos
+                if absolute:
+                    self._target_epochs[axis] += 1
+            epochs = {axis: self._target_epochs[axis] for axis in targets}
+        future = self._get_executor().submit(self._run_move, command, wait_idle)
+        future.add_done_callback(lambda done: self._undo_failed_move(done, offsets, epochs))
+        return future
+
+    def _undo_failed_move(self, future: Future, offsets: dict[int, float], epochs: dict[int, int]) -> None:
+        if not future.cancelled() and future.exception() is None:
+            return
+        # moves queued behind this one were offsets from its end, taking the offset out
+        # keeps them right; an axis set outright since then is left as it is
+        with self._targets_lock:
+            for axis, offset in offsets.items():
+                if self._target_epochs[axis] == epochs[axis]:
+                    self._target_positions[axis] -= offset
+
+    def _get_executor(self) -> ThreadPoolExecutor:
+        if self._executor is None:
+            self._executor = ThreadPoolExecutor(max_workers=1, thread_name_prefix="motion")
+        return self._executor
+
+    def _run_move(self, axis_positions: dict[int, float], wait_idle: bool):
+        with self._port_lock:
+            ret_positions = self._driver.move_absolute(axis_positions)
+        if wait_idle:
+            self.wait_until_idle()
+        return ret_positions
+
+    def wait_until_idle(self) -> None:
+        """Poll is_moving() until no axis reports motion"""
+        while True:
+            with self._port_lock:
+                status = self._driver.is_moving()
+            moving = any(status) if isinstance(status, (list, tuple)) else bool(status)
+            if not moving:
+                return
+            time.sleep(self.poll_interval)
 
     def is_moving(self,axis=None) -> bool:
         self.must_be_connected()
-        return self._driver.is_moving()
+        with self._port_lock:
+            return self._driver.is_moving()
     
     def get_current_positions(self) -> tuple[float, ...]:
-        return self._driver.get_current_positions()
+        with self._port_lock:
+            return self._driver.get_current_positions()
 
     def home(self) -> None:
         self.must_be_connected()
-        return self._driver.home()
+        homed_positions = self._driver.home()
+        if homed_positions:
+            self.set_reference_positions(homed_positions)
+        return homed_positions
     def emergency_stop(self):
         self.must_be_connected()
         self._driver.emergency_stop()
\ No newline at end of file
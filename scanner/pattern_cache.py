@@ -0,0 +1,201 @@
+###############
+#  On-disk cache for generated scan paths.
+#
+#  Entries are .npz files of named arrays (points, normals, ...) keyed by a
+#  hash of the mesh file contents plus the recipe name and every parameter
+#  that went into it, so reopening a part and re-running a known recipe
+#  loads instead of recomputing, and any change to the mesh or a parameter
+#  misses. Reads refresh an entry's mtime and writes evict the least
+#  recently used entries once the directory is over max_bytes.
+###############
+import hashlib
+import json
+import os
+import tempfile
+
+import numpy as np
+
+from scanner.scan_logging import get_logger
+
+log = get_logger("cache")
+
+CACHE_DIR_NAME = ".pattern_cache"
+DEFAULT_MAX_BYTES = 1 << 30
+SUFFIX = ".npz"
+
+
+def file_digest(path: str, chunk_size: int = 1 << 20) -> str:
+    """sha256 of a file's contents"""
+    digest = hashlib.sha256()
+    with open(path, "rb") as f:
+        for chunk in iter(lambda: f.read(chunk_size), b""):
+            digest.update(chunk)
+    return digest.hexdigest()
+
+
+def _canonical(value):
+    # JSON friendly and stable: floats by repr, arrays and tuples as lists
+    if isinstance(value, np.ndarray):
+        return [_canonical(v) for v in value.tolist()]
+    if isinstance(value, (list, tuple)):
+        return [_canonical(v) for v in value]
+    if isinstance(value, dict):
+        return {str(k): _canonical(v) for k, v in value.items()}
+    if isinstance(value, (float, np.floating)):
+        return repr(float(value))
+    if isinstance(value, np.integer):
+        return int(value)
+    return value
+
+
+def cache_key(source_digest: str, recipe: str, **params) -> str:
+    """Key for recipe run on source_digest (file_digest of the mesh) with params"""
+    text = json.dumps({"source": source_digest, "recipe": recipe, "params": _canonical(params)}, sort_keys=True)
+    return hashlib.sha256(text.encode("utf-8")).hexdigest()
+
+
+def default_directory(project_file: str) -> str:
+    """The cache directory next to a project or mesh file"""
+    return os.path.join(os.path.dirname(os.path.abspath(project_file)), CACHE_DIR_NAME)
+
+
+class PatternCache:
+
+    def __init__(self, directory: str, max_bytes: int = DEFAULT_MAX_BYTES) -> None:
+        self.directory = directory
+        self.max_bytes = max_bytes
+        self.hits = 0
+        self.misses = 0
+
+    def _path(self, key: str) -> str:
+        return os.path.join(self.directory, key + SUFFIX)
+
+    def get(self, key: str) -> dict[str, np.ndarray] | None:
+        path = self._path(key)
+        try:
+            with np.load(path, allow_pickle=False) as data:
+                arrays = {name: data[name] for name in data.files}
+        except FileNotFoundError:
+            self.misses += 1
+            return None
+        except (OSError, ValueError) as e:
+            # a damaged entry is a miss, it gets rewritten
+            log.warning("Dropping unreadable cache entry %s: %s", path, e)
+            self._remove(path)
+            self.misses += 1
+            return None
+        os.utime(path)
+        self.hits += 1
+        log.debug("Cache hit %s", key[:12])
+        return arrays
+
+    def put(self, key: str, **arrays) -> None:
+        os.makedirs(self.directory, exist_ok=True)
+        # write to a temporary name and rename, readers never see half a file
+        fd, tmp_path = tempfile.mkstemp(suffix=".tmp", dir=self.directory)
+        try:
+            with os.fdopen(fd, "wb") as f:
+                np.savez(f, **{name: np.asarray(value) for name, value in arrays.items()})
+            os.replace(tmp_path, self._path(key))
+        except BaseException:
+            self._remove(tmp_path)
+            raise
+        log.debug("Cached %s", key[:12])
+        self.evict(keep=key)
+
+    def get_or_compute(self, key: str, compute) -> dict[str, np.ndarray]:
+        """Cached arrays for key, or compute() -> dict of arrays, stored first"""
+        arrays = self.get(key)
+        if arrays is None:
+            arrays = compute()
+            self.put(key, **arrays)
+        return arrays
+
+    def entries(self) -> list[tuple[float, int, str]]:
+        """(mtime, size, path) of every entry, least recently used first"""
+        try:
+            names = os.listdir(self.directory)
+        except FileNotFoundError:
+            return []
+        entries = []
+        for name in names:
+            if name.endswith(SUFFIX):
+                path = os.path.join(self.directory, name)
+                try:
+                    stat = os.stat(path)
+                except FileNotFoundError:
+                    continue
+                entries.append((stat.st_mtime, stat.st_size, path))
+        entries.sort()
+        return entries
+
+    def size(self) -> int:
+        return sum(size for _, size, _ in self.entries())
+
+    def evict(self, keep: str | None = None) -> int:
+        """Remove least recently used entries until the cache fits in
+        max_bytes (never keep, the entry just written). Returns the count."""
+        entries = self.entries()
+        total = sum(size for _, size, _ in entries)
+        keep_path = self._path(keep) if keep else None
+        removed = 0
+        for _, size, path in entries:
+            if total <= self.max_bytes:
+                break
+            if path == keep_path:
+                continue
+            self._remove(path)
+            total -= size
+            removed += 1
+        if removed:
+            log.info("Evicted %d cache entries, %d bytes left", removed, total)
+        return removed
+
+    def clear(self) -> None:
+        for _, _, path in self.entries():
+            self._remove(path)
+
+    @staticmethod
+    def _remove(path: str) -> None:
+        try:
+            os.remove(path)
+        except FileNotFoundError:
+            pass
+
+
+if __name__ == "__main__":
+    import shutil
+    import time
+
+    directory = tempfile.mkdtemp()
+    try:
+        mesh = os.path.join(directory, "part.stl")
+        with open(mesh, "wb") as f:
+            f.write(os.urandom(1 << 20))
+        digest = file_digest(mesh)
+        cache = PatternCache(default_directory(mesh), max_bytes=3 * 8 * 3 * 200_000 + 4096)
+        key = cache_key(digest, "surface_projection", step=1.0)
+        checks = [key == cache_key(digest, "surface_projection", step=1.0),
+                  key != cache_key(digest, "surface_projection", step=1.0 + 1e-12),
+                  cache.get(key) is None]
+
+        def slow():
+            time.sleep(0.2)
+            return {"points": np.random.default_rng(0).random((200_000, 3))}
+
+        start = time.perf_counter()
+        first = cache.get_or_compute(key, slow)
+        cold = time.perf_counter() - start
+        start = time.perf_counter()
+        again = cache.get_or_compute(key, slow)
+        warm = time.perf_counter() - start
+        checks.append(np.array_equal(first["points"], again["points"]))
+        # three more entries in a cache that holds three: the first goes
+        for step in (2.0, 3.0, 4.0):
+            time.sleep(0.01)
+            cache.put(cache_key(digest, "surface_projection", step=step), **slow())
+        checks.append(cache.get(key) is None and len(cache.entries()) == 3 and cache.size() <= cache.max_bytes)
+        print("cache:", "ok" if all(checks) else f"FAILED {checks}")
+        print(f"cold {cold * 1e3:.0f} ms, warm {warm * 1e3:.1f} ms")
+    finally:
+        shutil.rmtree(directory)
@@ -51,6 +51,21 @@ class ProbePlugin(ABC):
     @abstractmethod
     def scan_end(self) -> None:
         pass
+
+    def scan_postprocess(self, hdf5_file) -> None:
+        """Optional hook to add derived datasets to the scan file once all points are written."""
+        pass
+
+    def scan_arm_triggers(self, num_triggers: int, scan_locations=None) -> None:
+        """Optional: get ready to take num_triggers measurements on external hardware
+        triggers (e.g. a trigger output pulsed by the motion controller). Called before the motion
+        that makes the triggers starts, the plugin must be listening when it returns.
+        scan_locations holds the expected (num_triggers, 3) positions for plugins that need them."""
+        raise NotImplementedError(f"{type(self).__name__} does not support external triggers.")
+
+    def scan_read_triggered(self) -> dict[str, Any]:
+        """Optional: wait for the armed triggers and return {channel name: (num_triggers, points) array}."""
+        raise NotImplementedError(f"{type(self).__name__} does not support external triggers.")
         
 
 
@@ -94,6 +109,18 @@ class ProbeController:
     def scan_end(self) -> None:
         self.must_be_connected()
         self._probe.scan_end()
+
+    def scan_postprocess(self, hdf5_file) -> None:
+        self.must_be_connected()
+        self._probe.scan_postprocess(hdf5_file)
+
+    def scan_arm_triggers(self, num_triggers: int, scan_locations=None) -> None:
+        self.must_be_connected()
+        self._probe.scan_arm_triggers(num_triggers, scan_locations)
+
+    def scan_read_triggered(self) -> dict[str, Any]:
+        self.must_be_connected()
+        return self._probe.scan_read_triggered()
         
     def get_channel_names(self):
         self.must_be_connected()
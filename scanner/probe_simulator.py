@@ -1,11 +1,31 @@
-
-import math
 import time
 
+import numpy as np
+
 from scanner.probe_controller import ProbePlugin
 from scanner.plugin_setting import PluginSettingInteger, PluginSettingFloat, PluginSettingString
 
 
+SPEED_OF_LIGHT = 299792458.0
+
+# Hz per x-axis unit, used to turn the displayed axis into physical frequencies
+_FREQ_UNIT_SCALE = {"Hz": 1.0, "kHz": 1e3, "MHz": 1e6, "GHz": 1e9}
+
+# positions per chunk in simulate_batch, keeps the (points, freqs) temporaries small
+_BATCH_CHUNK = 65536
+
+
+def _phase_ramp(path: np.ndarray, wavenumbers: np.ndarray) -> np.ndarray:
+    """exp(-j k r) over a uniform wavenumber grid, built as a running product
+    of the per-step phasor instead of one complex exp per sample."""
+    ramp = np.empty((path.size, wavenumbers.size), dtype=complex)
+    ramp[:, 0] = np.exp(-1j * wavenumbers[0] * path)
+    if wavenumbers.size > 1:
+        ramp[:, 1:] = np.exp(-1j * (wavenumbers[1] - wavenumbers[0]) * path)[:, np.newaxis]
+        np.cumprod(ramp, axis=1, out=ramp)
+    return ramp
+
+
 class ProbeSimulator(ProbePlugin):
     num_channels: PluginSettingInteger
     num_points_per_channel: PluginSettingInteger
@@ -15,16 +35,24 @@ class ProbeSimulator(ProbePlugin):
     yaxis_unit: PluginSettingString
     measure_time: PluginSettingFloat
     init_time: PluginSettingFloat
+    field_model: PluginSettingString
+    scatterers: PluginSettingString
+    channel_spacing: PluginSettingFloat
+    noise_level: PluginSettingFloat
 
     def __init__(self) -> None:
         self.num_channels = PluginSettingInteger("Number of Channels", 2, value_min=1)
         self.num_points_per_channel = PluginSettingInteger("Points Per Channel", 20, value_min=2)
         self.xaxis_min = PluginSettingFloat("X-axis Min", 1)
         self.xaxis_max = PluginSettingFloat("X-axis Max", 10)
-        self.xaxis_unit = PluginSettingString("X-axis Unit", "GHz")
+        self.xaxis_unit = PluginSettingString("X-axis Unit", "GHz", select_options=list(_FREQ_UNIT_SCALE))
         self.yaxis_unit = PluginSettingString("Y-axis Unit", "V")
         self.measure_time = PluginSettingFloat("Measurement Time (s)", 0.5, value_min=0.0)
         self.init_time = PluginSettingFloat("Initialization Time (s)", 1.0, value_min=0.0)
+        self.field_model = PluginSettingString("Field Model", "Point Scatterer", select_options=["Point Scatterer", "Dipole"], restrict_selections=True)
+        self.scatterers = PluginSettingString("Scatterers x,y,z[,amp] (mm; ...)", "0,0,-100,1")
+        self.channel_spacing = PluginSettingFloat("Channel Rx Spacing (mm)", 10.0)
+        self.noise_level = PluginSettingFloat("Noise Level", 0.0, value_min=0.0)
         super().__init__()
         self.add_setting_post_connect(self.num_channels)
         self.add_setting_post_connect(self.num_points_per_channel)
@@ -34,50 +62,118 @@ class ProbeSimulator(ProbePlugin):
         self.add_setting_post_connect(self.yaxis_unit)
         self.add_setting_post_connect(self.measure_time)
         self.add_setting_post_connect(self.init_time)
-    
+        self.add_setting_post_connect(self.field_model)
+        self.add_setting_post_connect(self.scatterers)
+        self.add_setting_post_connect(self.channel_spacing)
+        self.add_setting_post_connect(self.noise_level)
+        self._scatterer_cache = ("", np.zeros((0, 4)))
+        self._rng = np.random.default_rng()
+        self._armed_locations = np.zeros((0, 3))
+
     def connect(self) -> None:
         pass
-    
+
     def disconnect(self) -> None:
         pass
-    
-    
+
+
     def get_xaxis_coords(self) -> tuple[float, ...]:
-        minVal = self.xaxis_min.value
-        maxVal = self.xaxis_max.value
-        num_points = self.num_points_per_channel.value
-        step = (maxVal-minVal) / (num_points-1)
-        return tuple(minVal + ii*step for ii in range(num_points))
-    
+        return tuple(np.linspace(self.xaxis_min.value, self.xaxis_max.value, self.num_points_per_channel.value).tolist())
+
     def get_xaxis_units(self) -> str:
         return self.xaxis_unit.value
-    
+
     def get_yaxis_units(self) -> tuple[str, ...] | str:
         return self.yaxis_unit.value
-    
+
     def get_channel_names(self) -> tuple[str, ...]:
         return tuple(f"Channel {ii+1}" for ii in range(self.num_channels.value))
-    
+
     def scan_begin(self) -> None:
         time.sleep(self.init_time.value)
-    
+
     def scan_trigger_and_wait(self, scan_index: int, scan_location: tuple[float, ...]) -> list[list[float]] | list[float] | None:
         return None
-    
-    def scan_read_measurement(self, scan_index: int, scan_location: tuple[float, ...]) -> list[list[float]] | list[float] | None:
+
+    def scan_read_measurement(self, scan_index: int, scan_location: tuple[float, ...]) -> dict[str, np.ndarray]:
         time.sleep(self.measure_time.value)
-        num_channels = self.num_channels.value
-        num_points = self.num_points_per_channel.value
-        ret: list[list[float]] = []
-        for c_ind in range(num_channels):
-            ret.append([math.cos(c_ind * p_ind / (num_points - 1) * (2*math.pi)) for p_ind in range(num_points)])
-        return ret
-    
+        position = np.zeros(3)
+        location = np.asarray(scan_location, dtype=float)[:3]
+        position[:location.size] = location
+        batch = self.simulate_batch(position[np.newaxis, :])
+        return {name: values[0] for name, values in batch.items()}
+
     def scan_end(self) -> None:
         pass
 
+    def scan_arm_triggers(self, num_triggers: int, scan_locations=None) -> None:
+        locations = np.zeros((num_triggers, 3))
+        if scan_locations is not None:
+            scan_locations = np.asarray(scan_locations, dtype=float).reshape(num_triggers, -1)[:, :3]
+            locations[:, :scan_locations.shape[1]] = scan_locations
+        self._armed_locations = locations
+
+    def scan_read_triggered(self) -> dict[str, np.ndarray]:
+        time.sleep(self.measure_time.value)
+        batch = self.simulate_batch(self._armed_locations)
+        self._armed_locations = np.zeros((0, 3))
+        return batch
 
+    def get_frequencies_hz(self) -> np.ndarray:
+        scale = _FREQ_UNIT_SCALE.get(self.xaxis_unit.value, 1.0)
+        return np.linspace(self.xaxis_min.value, self.xaxis_max.value, self.num_points_per_channel.value) * scale
 
+    def get_scatterers(self) -> np.ndarray:
+        """Parsed scatterer table as an (K, 4) array of x, y, z in mm and amplitude."""
+        text = self.scatterers.value
+        if text != self._scatterer_cache[0]:
+            rows = []
+            for entry in text.split(";"):
+                if not entry.strip():
+                    continue
+                vals = [float(v) for v in entry.split(",")]
+                if len(vals) not in (3, 4):
+                    raise ValueError(f"Scatterer '{entry.strip()}' must be x,y,z or x,y,z,amp.")
+                rows.append(vals if len(vals) == 4 else vals + [1.0])
+            self._scatterer_cache = (text, np.array(rows, dtype=float).reshape(-1, 4))
+        return self._scatterer_cache[1]
 
+    def simulate_batch(self, positions) -> dict[str, np.ndarray]:
+        """Simulated response at many probe positions at once.
 
+        positions is an (N, 3) array in mm. Returns {channel name: (N, F)
+        complex array}, the same per-channel format the VNA plugins return
+        per point. Channel c receives at an x offset of c * channel spacing
+        from the transmitter, so channel 1 is monostatic.
+        """
+        positions = np.atleast_2d(np.asarray(positions, dtype=float))
+        if positions.shape[1] != 3:
+            raise ValueError("Positions must have shape (N, 3).")
+        wavenumbers = 2 * np.pi * self.get_frequencies_hz() / SPEED_OF_LIGHT * 1e-3  # rad/mm
+        scatterers = self.get_scatterers()
+        dipole = self.field_model.value == "Dipole"
+        num_positions = positions.shape[0]
+        noise = self.noise_level.value
 
+        results = {}
+        for c_ind, name in enumerate(self.get_channel_names()):
+            rx_offset = np.array([c_ind * self.channel_spacing.value, 0.0, 0.0])
+            out = np.zeros((num_positions, wavenumbers.size), dtype=complex)
+            for start in range(0, num_positions, _BATCH_CHUNK):
+                tx = positions[start:start + _BATCH_CHUNK]
+                rx = tx + rx_offset
+                chunk = out[start:start + _BATCH_CHUNK]
+                for sx, sy, sz, amp in scatterers:
+                    d_tx = tx - (sx, sy, sz)
+                    d_rx = rx - (sx, sy, sz)
+                    r_tx = np.sqrt(np.einsum("ij,ij->i", d_tx, d_tx))
+                    r_rx = np.sqrt(np.einsum("ij,ij->i", d_rx, d_rx))
+                    weight = amp / (r_tx * r_rx)
+                    if dipole:
+                        # x-oriented dipoles, sin^2 of the angle to the dipole axis on each leg
+                        weight = weight * (1 - (d_tx[:, 0] / r_tx)**2) * (1 - (d_rx[:, 0] / r_rx)**2)
+                    chunk += weight[:, np.newaxis] * _phase_ramp(r_tx + r_rx, wavenumbers)
+            if noise > 0:
+                out += noise * (self._rng.standard_normal(out.shape) + 1j * self._rng.standard_normal(out.shape))
+            results[name] = out
+        return results
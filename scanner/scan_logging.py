@@ -0,0 +1,240 @@
+###############
+#  Logging for the scanner engine and plugins.
+#
+#  Everything logs under "scanner.<subsystem>" (engine, motion, probe, ...)
+#  so each subsystem can get its own level. Records go to an in-memory ring
+#  buffer (last ring_size records, no formatting on the hot path), an
+#  optional file written from a background thread, and the console, which
+#  is rate limited so a per-point debug level cannot stall a scan on
+#  terminal output. Hot paths log with %-style arguments so a disabled
+#  level costs one level check and no string formatting.
+#
+#  Levels can also be set with SCANNER_LOG_LEVELS, e.g.
+#  "motion=DEBUG,probe=WARNING,console=DEBUG".
+###############
+import logging
+import logging.handlers
+import os
+import queue
+import sys
+import threading
+import time
+from collections import deque
+
+ROOT = "scanner"
+DEFAULT_FORMAT = "%(asctime)s %(levelname)-7s %(name)s: %(message)s"
+
+_lock = threading.Lock()
+_configured = False
+_ring = None
+_console = None
+_listener = None
+_file_handler = None
+
+
+class RingBufferHandler(logging.Handler):
+    """Keeps the last capacity records in memory.
+
+    handle() skips the handler lock: deque.append with a maxlen is atomic,
+    so the logging threads never wait on each other here. Records are only
+    formatted when read back with recent().
+    """
+
+    def __init__(self, capacity: int = 10000) -> None:
+        super().__init__()
+        self.records = deque(maxlen=capacity)
+
+    def handle(self, record) -> bool:
+        if self.filter(record):
+            self.records.append(record)
+            return True
+        return False
+
+    def emit(self, record) -> None:
+        self.records.append(record)
+
+    def recent(self, n: int | None = None) -> list[str]:
+        records = list(self.records)
+        if n is not None:
+            records = records[-n:]
+        return [self.format(record) for record in records]
+
+    def clear(self) -> None:
+        self.records.clear()
+
+
+class RateLimitedConsoleHandler(logging.StreamHandler):
+    """Console output limited to max_per_second records below WARNING.
+
+    Warnings and errors always get through. Records over the budget are
+    dropped from the console (they are still in the ring buffer and the
+    file) and their count is printed once the next second starts.
+    """
+
+    def __init__(self, stream=None, max_per_second: float = 20) -> None:
+        super().__init__(stream)
+        self.max_per_second = max_per_second
+        self.suppressed = 0
+        self._window = 0.0
+        self._count = 0
+
+    def handle(self, record) -> bool:
+        if record.levelno < logging.WARNING and self.max_per_second > 0:
+            now = time.monotonic()
+            with self.lock:
+                if now - self._window >= 1.0:
+                    self._window, self._count = now, 0
+                    if self.suppressed:
+                        self.stream.write(f"({self.suppressed} log messages not shown)\n")
+                        self.suppressed = 0
+                if self._count >= self.max_per_second:
+                    self.suppressed += 1
+                    return False
+                self._count += 1
+        return super().handle(record)
+
+
+def _parse_levels(text: str) -> dict[str, str]:
+    levels = {}
+    for item in text.split(","):
+        if "=" in item:
+            name, level = item.split("=", 1)
+            levels[name.strip()] = level.strip().upper()
+    return levels
+
+
+def _ensure_configured() -> None:
+    if not _configured:
+        configure()
+
+
+def configure(levels: dict[str, str | int] | None = None, level: str | int = "INFO", console_level: str | int | None = None,
+              file: str | None = None, ring_size: int = 10000, console_rate: float = 20) -> None:
+    """(Re)configure the scanner loggers.
+
+    level is the default for every subsystem, levels overrides it per
+    subsystem ({"motion": "DEBUG"}). console_level filters the console only
+    (default level), file adds a file sink written by a background thread.
+    """
+    global _configured, _ring, _console, _listener, _file_handler
+    with _lock:
+        env = _parse_levels(os.environ.get("SCANNER_LOG_LEVELS", ""))
+        root = logging.getLogger(ROOT)
+        root.propagate = False
+        root.setLevel(env.pop("scanner", level))
+        for handler in list(root.handlers):
+            root.removeHandler(handler)
+        _stop_file()
+
+        formatter = logging.Formatter(DEFAULT_FORMAT)
+        _ring = RingBufferHandler(ring_size)
+        _ring.setFormatter(formatter)
+        root.addHandler(_ring)
+
+        _console = RateLimitedConsoleHandler(sys.stdout, console_rate)
+        _console.setFormatter(logging.Formatter("%(name)s: %(message)s"))
+        _console.setLevel(env.pop("console", console_level if console_level is not None else level))
+        root.addHandler(_console)
+
+        if file is not None:
+            _file_handler = logging.FileHandler(file)
+            _file_handler.setFormatter(formatter)
+            log_queue = queue.SimpleQueue()
+            root.addHandler(logging.handlers.QueueHandler(log_queue))
+            _listener = logging.handlers.QueueListener(log_queue, _file_handler)
+            _listener.start()
+
+        for name, value in {**(levels or {}), **env}.items():
+            logging.getLogger(f"{ROOT}.{name}").setLevel(value)
+        _configured = True
+
+
+def get_logger(subsystem: str) -> logging.Logger:
+    """Logger for one subsystem, "scanner.<subsystem>" """
+    _ensure_configured()
+    return logging.getLogger(f"{ROOT}.{subsystem}")
+
+
+def set_level(subsystem: str, level: str | int) -> None:
+    """Change one subsystem's level at runtime, "scanner" for all of them"""
+    _ensure_configured()
+    name = ROOT if subsystem == ROOT else f"{ROOT}.{subsystem}"
+    logging.getLogger(name).setLevel(level)
+
+
+def set_console_level(level: str | int) -> None:
+    _ensure_configured()
+    _console.setLevel(level)
+
+
+def recent(n: int | None = None) -> list[str]:
+    """Formatted last n records of the ring buffer (all by default)"""
+    _ensure_configured()
+    return _ring.recent(n)
+
+
+def _stop_file() -> None:
+    global _listener, _file_handler
+    if _listener is not None:
+        _listener.stop()
+        _listener = None
+    if _file_handler is not None:
+        _file_handler.close()
+        _file_handler = None
+
+
+def shutdown() -> None:
+    """Flush and close the file sink"""
+    with _lock:
+        _stop_file()
+
+
+def benchmark(points: int = 20000) -> dict[str, float]:
+    """Per-point cost in microseconds of the old print() lines of a scan
+    point against the logger, with debug off (the default) and on. print
+    writes to os.devnull here, a real terminal is slower still."""
+    import numpy as np
+    position = [12.5, 40.0, 0.0]
+    move = {0: 2.0}
+    s_param = np.zeros(201, dtype=np.complex64)
+    log = get_logger("benchmark")
+    results = {}
+
+    def run(label, body):
+        start = time.perf_counter()
+        for _ in range(points):
+            body()
+        results[label] = (time.perf_counter() - start) / points * 1e6
+
+    def old_prints():
+        print(f"Simulator: Moved relative {move}")
+        print(f"Position updated: X={position[0]:.2f}, Y={position[1]:.2f}, Z={position[2]:.2f}")
+        print(f"s_param_name: S21, shape: {s_param.shape}, type: {s_param.dtype}")
+
+    def new_logs():
+        log.debug("Moved relative %s", move)
+        log.debug("Position X=%.2f, Y=%.2f, Z=%.2f", *position)
+        log.debug("s_param_name: %s, shape: %s, type: %s", "S21", s_param.shape, s_param.dtype)
+
+    stdout = sys.stdout
+    with open(os.devnull, "w") as devnull:
+        sys.stdout = devnull
+        try:
+            run("print", old_prints)
+        finally:
+            sys.stdout = stdout
+    old_level = log.level
+    log.setLevel(logging.INFO)
+    run("logger, debug off", new_logs)
+    log.setLevel(logging.DEBUG)
+    old_console = _console.level
+    _console.setLevel(logging.INFO)
+    run("logger, debug to ring buffer", new_logs)
+    _console.setLevel(old_console)
+    log.setLevel(old_level)
+    return results
+
+
+if __name__ == "__main__":
+    for label, us in benchmark().items():
+        print(f"{label:>30}: {us:7.2f} us/point")
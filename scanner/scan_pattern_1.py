@@ -8,6 +8,7 @@ from tkinter import messagebox
 import numpy as np
 #from scan_pattern_controller import ScanPatternControllerPlugin
 from scanner.plugin_setting import PluginSettingString, PluginSettingInteger, PluginSettingFloat
+from scanner import scan_patterns
 import matplotlib.pyplot as plt
 
 class ScanPattern(ScanPatternControllerPlugin):
@@ -62,17 +63,10 @@ class ScanPattern(ScanPatternControllerPlugin):
             self.x_points = int(self.x_points)
             self.y_points = int(self.y_points)
             # self.matrix = self.create_pattern_matrix(self.points)
-            self.matrix = self.create_pattern_matrix_generalized(self.x_points,self.y_points)
-            print(self.matrix)
-            
-            if self.pattern_style == "XY" :
-                temp_row = self.matrix[0].copy()
-                self.matrix[0] = self.matrix[1]
-                self.matrix[1] = temp_row
-                print(f"Swapped Matrix: {self.matrix}")
+            self.matrix = self.build_pattern()
                 
             
-            self.time_est = self.time_estimate(self.points,self.float_step_size)
+            self.time_est = self.time_estimate(self.matrix,self.float_step_size)
             print(f"Time EST: {self.time_est} Hours")
             root = tk.Tk()
             root.withdraw() 
@@ -95,124 +89,81 @@ class ScanPattern(ScanPatternControllerPlugin):
     def disconnect(self):
         self._is_connected = False
     
+    def planned_points(self) -> int:
+        # point count from the current settings, before connect
+        step = self.step_size.value
+        return int(self.x_length.value / step + 1) * int(self.y_length.value / step + 1)
+    
+    def planned_time(self) -> float:
+        step = self.step_size.value
+        grid = scan_patterns.GridPattern(int(self.x_length.value / step + 1), int(self.y_length.value / step + 1))
+        return self.time_estimate(grid, step)
+    
+    def build_pattern(self):
+        # XY comes out with rows 0 and 1 swapped; columns are made as the scan reaches them
+        self.pattern_type = f"Serpentine {self.pattern_style}"
+        return scan_patterns.GridPattern(self.x_points, self.y_points, order=self.pattern_style)
+    
     def create_pattern_matrix(self,n):
         #generates (n+1)^2 (x,y) column
-        row1 = np.repeat(np.arange(n+1), n+1)
-        row2 = []
-        for i in range(n+1):
-            if i % 2 == 0:
-                row2.extend(range(n+1))        
-            else:
-                row2.extend(range(n, -1, -1))   
-        return np.array([row1, row2])
+        return scan_patterns.serpentine(n + 1, n + 1, dtype=np.int64)[:2]
     
     def create_pattern_matrix_generalized(self,rows, cols):
-        
-
-        x_coords = np.tile(np.arange(cols), rows)
-
-        y_coords = []
-        
-        for r in range(rows):
-            if r % 2 == 0:
-                
-                y_coords.extend(np.arange(cols))
-            else:
-                
-                y_coords.extend(np.arange(cols - 1, -1, -1))
-
-      
-        final_x = []
-        final_y = []
-
-        for r in range(rows):
-            if r % 2 == 0:
-                
-                final_x.extend(np.arange(cols))
-            else:
-                
-                final_x.extend(np.arange(cols - 1, -1, -1))
-           
-            final_y.extend([r] * cols)
-
-
-        z = np.zeros(len(final_x))
-                
-        
-        return np.array([final_y, final_x,z])
+        return scan_patterns.serpentine(rows, cols)
     
     def rotate_points(self,matrix, theta_rad):
-    
-        R = np.array([
-            [np.cos(theta_rad), -np.sin(theta_rad)],
-            [np.sin(theta_rad),  np.cos(theta_rad)]
-        ])
-        
-        R = R @ matrix
-        R[np.abs(R) < 1e-10] = 0
-        
-        
-        return R
+        return scan_patterns.rotate(matrix, np.rad2deg(theta_rad))
     
     def time_estimate(self,points,step_size):
+        # points is a point count or a pattern, a pattern counts the axis moves it actually makes
         acceleration = 10
-        time_to_point = 2*np.sqrt(step_size/acceleration)
-        total_time = points*(time_to_point)
+        if isinstance(points, (int, float)):
+            time_to_point = 2*np.sqrt(step_size/acceleration)
+            total_time = points*(time_to_point)
+        else:
+            total_time = scan_patterns.estimate_time(points, step_size, acceleration)
         total_time = total_time / (60*60)
         return np.round(total_time,3)
     
     
+    def planar_slope_transform(self, step_size, s_deg=10, s_dir=90.0, z_off=50.0, order="YX"):
+        # grid indices -> XYZ mm on the sloped plane, add .tilt(), .surface(height_map) etc. to taste
+        return scan_patterns.PatternTransform().grid(step_size, order).slope(s_deg, s_dir).offset(dz=z_off)
+
+    def apply_planar_slope(self, matrix_xy, step_size, s_deg=10, s_dir=90.0, z_off=50.0, order="YX"):
+        """Headless planar slope: (XYZ matrix, z step size), no windows"""
+        transform = self.planar_slope_transform(step_size, s_deg, s_dir, z_off, order)
+        return transform.apply(matrix_xy), scan_patterns.slope_z_step(step_size, s_deg)
+
     def apply_planar_slope_ui(self, matrix_xy, step_size, s_deg=10, s_dir=90.0, z_off=50.0):
-        
+        # Tk front end for apply_planar_slope
         root = tk.Tk()
         root.withdraw()
 
         popup = tk.Toplevel(root)
         popup.title("Planar Slope Parameters")
         popup.attributes('-topmost', True)
-        
+
         self._result_matrix = None
-        z_step_size = step_size * np.tan(np.deg2rad(s_deg))
+        self._result_z_step = None
         def on_generate():
-            
-           
-            order = order_var.get()
-
-            if order == "YX":
-                y_idx, x_idx, z_old = matrix_xy
-            else:
-                x_idx, y_idx, z_old = matrix_xy
-
-            
-            x = x_idx * step_size
-            y = y_idx * step_size
-
-            
-            slope = np.tan(np.deg2rad(s_deg))
-            phi = np.deg2rad(s_dir)
-
-            
-            z = z_off + slope * (x * np.cos(phi) + y * np.sin(phi))
-
-            self._result_matrix = np.vstack((x, y, z))
-            
-            
-            
-            
-            print("\n--- Generated Scan Matrix (XYZ) ---")
-            print(self._result_matrix)
-            print(f"Shape: {self._result_matrix.shape}\n")
-
-            # 4. Plot and Clean up
-            self.plot_scan_3d(self._result_matrix)
+            try:
+                step, slope, direction, z0 = (float(e.get()) for e in entries)
+            except ValueError:
+                messagebox.showerror("Planar Slope", "All fields must be numbers.", parent=popup)
+                return
+            self._result_matrix, self._result_z_step = self.apply_planar_slope(
+                matrix_xy, step, slope, direction, z0, order=order_var.get())
+
+            print(f"Sloped scan matrix (XYZ): {self._result_matrix.shape}")
             popup.destroy()
             root.quit()
-                
-            
+            self.plot_scan_3d(self._result_matrix, stride=max(1, self._result_matrix.shape[1] // 100000))
+
         # --- UI Setup ---
-        fields = [("Step Size", str(step_size)), ("Slope (deg)", "5.0"), 
-                  ("Slope Dir (deg)", "0"), ("Z Offset (z0)", "50.0")]
-        
+        fields = [("Step Size", str(step_size)), ("Slope (deg)", str(s_deg)),
+                  ("Slope Dir (deg)", str(s_dir)), ("Z Offset (z0)", str(z_off))]
+
         entries = []
         for i, (label_text, default_val) in enumerate(fields):
             tk.Label(popup, text=label_text).grid(row=i, column=0, padx=15, pady=5, sticky="e")
@@ -221,23 +172,21 @@ class ScanPattern(ScanPatternControllerPlugin):
             e.grid(row=i, column=1, padx=15, pady=5)
             entries.append(e)
 
-        entry_step, entry_slope, entry_dir, entry_z0 = entries
-
         tk.Label(popup, text="Order:").grid(row=4, column=0, sticky="e")
         order_var = tk.StringVar(value="YX")
         ttk.OptionMenu(popup, order_var, "YX", "YX", "XY").grid(row=4, column=1, sticky="w", padx=15)
 
-        tk.Button(popup, text="GENERATE & PRINT", command=on_generate, 
+        tk.Button(popup, text="GENERATE", command=on_generate,
                   bg="#27ae60", fg="white", font=('Arial', 10, 'bold'), height=2).grid(row=5, columnspan=2, pady=20)
 
         # Run the UI loop
-        popup.mainloop() 
-        
+        popup.mainloop()
+
         # Cleanup and return to the main script
         try: root.destroy()
         except: pass
-        
-        return self._result_matrix, z_step_size
+
+        return self._result_matrix, self._result_z_step
 
     def plot_scan_3d(self, xyz, stride=1):
         X, Y, Z = xyz[0, ::stride], xyz[1, ::stride], xyz[2, ::stride]
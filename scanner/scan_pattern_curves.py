@@ -0,0 +1,27 @@
+###############
+#  Space filling curve scan patterns.
+#
+#  Same lengths and step size as the raster ScanPattern, but the grid is
+#  walked along a Hilbert, Peano or Morton curve (scan_patterns.CURVES).
+#  Neighbouring points along the curve are neighbours on the stage, so a
+#  partial scan covers a compact area and there are no long row returns.
+###############
+from scanner.scan_pattern_1 import ScanPattern
+from scanner.plugin_setting import PluginSettingString
+from scanner import scan_patterns
+
+
+class CurveScanPattern(ScanPattern):
+
+    def __init__(self):
+        super().__init__()
+        self.curve = PluginSettingString("Curve: ", "Hilbert", select_options=list(scan_patterns.CURVES),
+                                         restrict_selections=True)
+        self.settings_pre_connect.insert(0, self.curve)
+
+    def build_pattern(self):
+        curve_name = PluginSettingString.get_value_as_string(self.curve)
+        self.pattern_type = f"{curve_name} {self.pattern_style}"
+        matrix = scan_patterns.CURVES[curve_name](self.x_points, self.y_points, order=self.pattern_style)
+        # Peano and Morton jump at times, grid units make run_scan move the whole jump
+        return scan_patterns.ArrayPattern(matrix, grid_units=True)
@@ -0,0 +1,128 @@
+###############
+#  Polar and cylindrical scan patterns.
+#
+#  Archimedean spiral, concentric rings and cylindrical helix, sampled at
+#  a constant spacing along the path (scan_patterns.spiral/rings/helix).
+#  The matrix is stage positions in mm about the pattern centre and the
+#  scan starts with the stage at the first point: the centre for the
+#  spiral and rings, (radius, 0, 0) from the cylinder axis for the helix.
+###############
+import tkinter as tk
+from tkinter import messagebox
+from scanner.scan_pattern_controller import ScanPatternControllerPlugin
+from scanner.plugin_setting import PluginSettingFloat
+from scanner import scan_patterns
+
+
+class PolarScanPattern(ScanPatternControllerPlugin):
+    """Settings and connect shared by the polar patterns, subclasses add
+    their own settings and give kind and generate()"""
+    kind = ""
+
+    def __init__(self):
+        super().__init__()
+        self._is_connected = False
+        self.radius = PluginSettingFloat("Radius(mm): ", 100, value_min=0.001)
+        self.spacing = PluginSettingFloat("Point Spacing(mm): ", 2, value_min=0.001)
+        self.add_setting_pre_connect(self.radius)
+        self.add_setting_pre_connect(self.spacing)
+
+    def generate(self):
+        raise NotImplementedError
+
+    def pitch_value(self) -> float:
+        return 1.0
+
+    def height_value(self) -> float:
+        return 0.0
+
+    def planned_points(self) -> int:
+        return scan_patterns.polar_point_count(self.kind, self.radius.value, self.spacing.value,
+                                               self.pitch_value(), self.height_value())
+
+    def planned_time(self) -> float:
+        return self.time_estimate(scan_patterns.ArrayPattern(self.generate(), positions=True))
+
+    def time_estimate(self, pattern) -> float:
+        # hours, same motion model as ScanPattern.time_estimate
+        return round(scan_patterns.estimate_time(pattern, self.spacing.value) / (60 * 60), 3)
+
+    def connect(self):
+        try:
+            self.matrix = scan_patterns.ArrayPattern(self.generate(), positions=True)
+        except ValueError as e:
+            root = tk.Tk()
+            root.withdraw()
+            messagebox.showinfo("Error", str(e))
+            root.destroy()
+            self.disconnect()
+            return
+        self._is_connected = True
+        self.pattern_type = self.kind.capitalize()
+        self.points = len(self.matrix)
+        # what the GUI passes on to run_scan for the raster plugin
+        self.float_step_size = self.spacing.value
+        self.x_axis_len = self.y_axis_len = 2 * self.radius.value
+        self.x_axis_len_int = self.y_axis_len_int = int(self.x_axis_len)
+        self.time_est = self.time_estimate(self.matrix)
+        print(f"{self.points} points, Time EST: {self.time_est} Hours")
+        root = tk.Tk()
+        root.withdraw()
+        messagebox.showinfo("Time EST", f"{self.points} points\nTime EST: {self.time_est} Hours")
+        root.destroy()
+
+    def is_connected(self) -> bool:
+        return self._is_connected
+
+    def disconnect(self):
+        self._is_connected = False
+
+
+class SpiralScanPattern(PolarScanPattern):
+    kind = "spiral"
+
+    def __init__(self):
+        super().__init__()
+        self.pitch = PluginSettingFloat("Turn Spacing(mm): ", 2, value_min=0.001)
+        self.add_setting_pre_connect(self.pitch)
+
+    def pitch_value(self) -> float:
+        return self.pitch.value
+
+    def generate(self):
+        return scan_patterns.spiral(self.radius.value, self.pitch.value, self.spacing.value)
+
+
+class RingScanPattern(PolarScanPattern):
+    kind = "rings"
+
+    def __init__(self):
+        super().__init__()
+        self.ring_spacing = PluginSettingFloat("Ring Spacing(mm): ", 2, value_min=0.001)
+        self.add_setting_pre_connect(self.ring_spacing)
+
+    def pitch_value(self) -> float:
+        return self.ring_spacing.value
+
+    def generate(self):
+        return scan_patterns.rings(self.radius.value, self.ring_spacing.value, self.spacing.value)
+
+
+class CylinderScanPattern(PolarScanPattern):
+    kind = "helix"
+
+    def __init__(self):
+        super().__init__()
+        self.height = PluginSettingFloat("Height(mm): ", 100, value_min=0.001)
+        self.pitch = PluginSettingFloat("Helix Pitch(mm): ", 2, value_min=0.001)
+        self.add_setting_pre_connect(self.height)
+        self.add_setting_pre_connect(self.pitch)
+
+    def pitch_value(self) -> float:
+        return self.pitch.value
+
+    def height_value(self) -> float:
+        return self.height.value
+
+    def generate(self):
+        return scan_patterns.helix(self.radius.value, self.height.value, self.pitch.value, self.spacing.value)
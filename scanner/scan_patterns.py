@@ -0,0 +1,799 @@
+###############
+#  Scan pattern generators.
+#
+#  Every generator returns a (3, N) float array in the layout run_scan
+#  takes, computed with whole array NumPy operations (no Python loops
+#  over points, no Tk). Grid patterns are in step units, row 0 is the
+#  slow axis and row 1 the fast one for order "YX" (ScanPattern's
+#  default), swapped for "XY". Transforms work on rows 0 and 1 and keep
+#  any Z row.
+#
+#  For scans too large to hold as one array, Pattern subclasses give the
+#  same columns lazily: len() is the point count and chunks() yields
+#  (start, (3, k) block) pieces, so the scan engine, the pre-flight limit
+#  check and the time estimate run in memory set by the chunk size, not
+#  the pattern size.
+#
+#  Polar patterns (spiral, rings, helix) are stage positions in mm about
+#  the pattern centre instead of grid indices; run_scan moves between
+#  them by the position change.
+#
+#  PatternTransform turns any of these into X/Y/Z positions in mm without
+#  a GUI: grid scaling, planar slope, rotation about any axis and offsets
+#  compose into one 4x4 affine, optionally followed by a height map lookup
+#  for Z, applied in one pass per matrix or per chunk of a lazy pattern.
+###############
+import numpy as np
+
+ORDERS = ("YX", "XY")
+DEFAULT_CHUNK = 65536
+
+
+def _grid_columns(idx: np.ndarray, rows: int, cols: int, serpentine: bool, order: str, dtype) -> np.ndarray:
+    """Columns idx of the rows x cols grid"""
+    if order not in ORDERS:
+        raise ValueError(f"Axis order must be one of {ORDERS}.")
+    row, col = np.divmod(idx, cols)
+    if serpentine:
+        # every odd row runs backwards
+        odd = (row & 1).astype(bool)
+        col[odd] = cols - 1 - col[odd]
+    matrix = np.zeros((3, idx.size), dtype=dtype)
+    slow, fast = (0, 1) if order == "YX" else (1, 0)
+    matrix[slow] = row
+    matrix[fast] = col
+    return matrix
+
+
+def _grid(rows: int, cols: int, serpentine: bool, order: str, dtype) -> np.ndarray:
+    return _grid_columns(np.arange(rows * cols), rows, cols, serpentine, order, dtype)
+
+
+def serpentine(rows: int, cols: int, order: str = "YX", dtype=np.float64) -> np.ndarray:
+    """Boustrophedon grid of rows x cols points, same as
+    ScanPattern.create_pattern_matrix_generalized(rows, cols) (then swapped for "XY")"""
+    return _grid(rows, cols, True, order, dtype)
+
+
+def raster(rows: int, cols: int, order: str = "YX", dtype=np.float64) -> np.ndarray:
+    """Unidirectional grid, every row starts at column 0 (fly back between rows)"""
+    return _grid(rows, cols, False, order, dtype)
+
+
+def _gilbert(w: int, h: int, memo: dict) -> np.ndarray:
+    """Generalized Hilbert curve over a w x h rectangle as (2, w*h) (i, j)
+    columns, i along w, starting at (0, 0) and ending next to (w - 1, 0).
+
+    The gilbert construction (J. Cervený), written in the rectangle's own
+    frame so equal sub-rectangles are built once and reused rotated.
+    """
+    if (w, h) in memo:
+        return memo[w, h]
+    if h == 1:
+        curve = np.vstack((np.arange(w), np.zeros(w, dtype=int)))
+    elif w == 1:
+        curve = np.vstack((np.zeros(h, dtype=int), np.arange(h)))
+    elif 2 * w > 3 * h:
+        # long rectangle, two halves side by side (prefer even widths)
+        w2 = w // 2
+        if w2 % 2 and w > 2:
+            w2 += 1
+        curve = np.hstack((_gilbert(w2, h, memo), _gilbert(w - w2, h, memo) + [[w2], [0]]))
+    else:
+        # up the left half, across the top, down the right half
+        w2, h2 = w // 2, h // 2
+        if h2 % 2 and h > 2:
+            h2 += 1
+        curve = np.hstack((_gilbert(h2, w2, memo)[::-1],
+                           _gilbert(w, h - h2, memo) + [[0], [h2]],
+                           [[w - 1], [h2 - 1]] - _gilbert(h2, w - w2, memo)[::-1]))
+    memo[w, h] = curve
+    return curve
+
+
+def _peano_index(x: np.ndarray, y: np.ndarray, levels: int) -> np.ndarray:
+    """Position along Peano's 3^levels square curve of the points (x, y)"""
+    index = np.zeros(x.shape, dtype=np.int64)
+    sum_a = np.zeros(x.shape, dtype=np.int64)
+    sum_b = np.zeros(x.shape, dtype=np.int64)
+    for level in range(levels - 1, -1, -1):
+        x_digit = (x // 3 ** level) % 3
+        y_digit = (y // 3 ** level) % 3
+        # a digit is mirrored when the other axis' digits so far sum to odd
+        a = np.where(sum_b & 1, 2 - x_digit, x_digit)
+        sum_a += a
+        b = np.where(sum_a & 1, 2 - y_digit, y_digit)
+        sum_b += b
+        index = index * 9 + a * 3 + b
+    return index
+
+
+def _morton_index(x: np.ndarray, y: np.ndarray, bits: int) -> np.ndarray:
+    index = np.zeros(x.shape, dtype=np.int64)
+    for bit in range(bits):
+        index |= ((x >> bit) & 1) << (2 * bit)
+        index |= ((y >> bit) & 1) << (2 * bit + 1)
+    return index
+
+
+def _curve_matrix(row: np.ndarray, col: np.ndarray, order: str) -> np.ndarray:
+    if order not in ORDERS:
+        raise ValueError(f"Axis order must be one of {ORDERS}.")
+    matrix = np.zeros((3, row.size))
+    slow, fast = (0, 1) if order == "YX" else (1, 0)
+    matrix[slow] = row
+    matrix[fast] = col
+    return matrix
+
+
+def hilbert(rows: int, cols: int, order: str = "YX") -> np.ndarray:
+    """Generalized Hilbert (gilbert) curve over any rows x cols grid.
+
+    Every step is to a neighbouring point, apart from at most one diagonal
+    step on some odd sized grids. On 2^k squares it is the classic Hilbert
+    curve.
+    """
+    memo = {}
+    if cols >= rows:
+        col, row = _gilbert(cols, rows, memo)
+    else:
+        row, col = _gilbert(rows, cols, memo)
+    return _curve_matrix(row, col, order)
+
+
+def peano(rows: int, cols: int, order: str = "YX") -> np.ndarray:
+    """Peano curve over any rows x cols grid, the 3^k square curve with the
+    points outside the grid left out (so it can jump where it was cut)"""
+    levels = max(1, int(np.ceil(np.log(max(rows, cols)) / np.log(3) - 1e-9)))
+    row, col = np.divmod(np.arange(rows * cols), cols)
+    walk = np.argsort(_peano_index(col, row, levels), kind="stable")
+    return _curve_matrix(row[walk], col[walk], order)
+
+
+def morton(rows: int, cols: int, order: str = "YX") -> np.ndarray:
+    """Morton (Z-order) curve over any rows x cols grid"""
+    bits = max(1, int(max(rows, cols) - 1).bit_length())
+    row, col = np.divmod(np.arange(rows * cols), cols)
+    walk = np.argsort(_morton_index(col, row, bits), kind="stable")
+    return _curve_matrix(row[walk], col[walk], order)
+
+
+CURVES = {"Hilbert": hilbert, "Peano": peano, "Morton": morton}
+
+
+def _check_positive(**values) -> None:
+    for name, value in values.items():
+        if not value > 0:
+            raise ValueError(f"{name} must be positive, got {value}.")
+
+
+def _spiral_length(theta: np.ndarray, b: float) -> np.ndarray:
+    return 0.5 * b * (theta * np.sqrt(1 + theta ** 2) + np.arcsinh(theta))
+
+
+def spiral(radius: float, pitch: float, spacing: float) -> np.ndarray:
+    """Archimedean spiral r = pitch * theta / 2pi out from the centre to
+    radius, with points spacing mm apart along the curve. Returns (3, N)
+    x, y, z positions in mm about the centre, z = 0."""
+    _check_positive(radius=radius, pitch=pitch, spacing=spacing)
+    b = pitch / (2 * np.pi)
+    length = _spiral_length(np.array(radius / b), b)
+    s = np.arange(int(length // spacing) + 1) * spacing
+    # invert the arc length by Newton's method from the large theta approximation
+    theta = np.sqrt(2 * s / b)
+    for _ in range(50):
+        step = (_spiral_length(theta, b) - s) / (b * np.sqrt(1 + theta ** 2))
+        theta -= step
+        if np.abs(step).max(initial=0) < 1e-10:
+            break
+    r = b * theta
+    return np.vstack((r * np.cos(theta), r * np.sin(theta), np.zeros(theta.size)))
+
+
+def rings(radius: float, ring_spacing: float, spacing: float) -> np.ndarray:
+    """Concentric rings ring_spacing apart out to radius, each sampled at
+    equal angles no more than spacing mm apart, starting with the centre
+    point. Returns (3, N) x, y, z positions in mm, z = 0."""
+    _check_positive(radius=radius, ring_spacing=ring_spacing, spacing=spacing)
+    radii = np.arange(int(radius / ring_spacing + 1e-9) + 1) * ring_spacing
+    counts = np.maximum(np.ceil(2 * np.pi * radii / spacing - 1e-9).astype(int), 1)
+    ring = np.repeat(np.arange(radii.size), counts)
+    starts = np.cumsum(counts) - counts
+    theta = 2 * np.pi * (np.arange(ring.size) - starts[ring]) / counts[ring]
+    r = radii[ring]
+    return np.vstack((r * np.cos(theta), r * np.sin(theta), np.zeros(theta.size)))
+
+
+def helix(radius: float, height: float, pitch: float, spacing: float) -> np.ndarray:
+    """Cylindrical helix of radius around the Z axis rising pitch per turn
+    up to height, points spacing mm apart along the curve. Returns (3, N)
+    x, y, z positions in mm from the axis at z = 0."""
+    _check_positive(radius=radius, height=height, pitch=pitch, spacing=spacing)
+    c = pitch / (2 * np.pi)
+    d_theta = spacing / np.hypot(radius, c)
+    theta = np.arange(int(height / c / d_theta + 1e-9) + 1) * d_theta
+    return np.vstack((radius * np.cos(theta), radius * np.sin(theta), c * theta))
+
+
+def polar_point_count(kind: str, radius: float, spacing: float, pitch: float = 1.0, height: float = 0.0) -> int:
+    """Points spiral(), rings() or helix() ("spiral", "rings", "helix") will
+    make, for showing before generating. pitch is the ring spacing for rings."""
+    _check_positive(radius=radius, spacing=spacing, pitch=pitch)
+    if kind == "helix":
+        _check_positive(height=height)
+    if kind == "spiral":
+        b = pitch / (2 * np.pi)
+        return int(_spiral_length(np.array(radius / b), b) // spacing) + 1
+    if kind == "rings":
+        radii = np.arange(int(radius / pitch + 1e-9) + 1) * pitch
+        return int(np.maximum(np.ceil(2 * np.pi * radii / spacing - 1e-9), 1).sum())
+    if kind == "helix":
+        c = pitch / (2 * np.pi)
+        return int(height / c / (spacing / np.hypot(radius, c)) + 1e-9) + 1
+    raise ValueError(f"Unknown polar pattern '{kind}'.")
+
+
+def layered(pattern: np.ndarray, layers: int, z_step: float = 1.0, reverse_odd: bool = True) -> np.ndarray:
+    """Repeat a pattern on layers Z planes, z = pattern z + layer * z_step.
+    With reverse_odd every other layer runs the pattern backwards, so each
+    layer starts where the previous one ended."""
+    pattern = np.asarray(pattern, dtype=float)
+    num_points = pattern.shape[1]
+    idx = np.arange(layers * num_points)
+    layer, point = np.divmod(idx, num_points)
+    if reverse_odd:
+        odd = (layer & 1).astype(bool)
+        point[odd] = num_points - 1 - point[odd]
+    matrix = pattern[:, point]
+    matrix[2] += layer * z_step
+    return matrix
+
+
+def rotate(matrix: np.ndarray, theta_deg: float, center=(0.0, 0.0)) -> np.ndarray:
+    """Rotate rows 0 and 1 of a (2 or 3, N) matrix counter clockwise about center"""
+    matrix = np.array(matrix, dtype=float)
+    theta = np.deg2rad(theta_deg)
+    c, s = np.cos(theta), np.sin(theta)
+    a = matrix[0] - center[0]
+    b = matrix[1] - center[1]
+    matrix[0] = c * a - s * b + center[0]
+    matrix[1] = s * a + c * b + center[1]
+    matrix[:2][np.abs(matrix[:2]) < 1e-10] = 0
+    return matrix
+
+
+def shear(matrix: np.ndarray, shear_x: float = 0.0, shear_y: float = 0.0) -> np.ndarray:
+    """Shear rows 0 and 1 of a (2 or 3, N) matrix"""
+    matrix = np.array(matrix, dtype=float)
+    a = matrix[0].copy()
+    matrix[0] += shear_x * matrix[1]
+    matrix[1] += shear_y * a
+    matrix[:2][np.abs(matrix[:2]) < 1e-10] = 0
+    return matrix
+
+
+def planar_slope(matrix: np.ndarray, step_size: float, slope_deg: float, direction_deg: float = 0.0, z_offset: float = 0.0,
+                 order: str = "YX") -> np.ndarray:
+    """Grid pattern -> X/Y/Z in mm on the plane z = z_offset + tan(slope) * distance along direction.
+
+    Rows come out as (x, y, z), the layout of ScanPattern.apply_planar_slope_ui.
+    """
+    transform = PatternTransform().grid(step_size, order).slope(slope_deg, direction_deg).offset(dz=z_offset)
+    return transform.apply(matrix)
+
+
+def slope_z_step(step_size: float, slope_deg: float) -> float:
+    """Z change over one step along the slope direction"""
+    return step_size * np.tan(np.deg2rad(slope_deg))
+
+
+class Pattern:
+    """A (3, N) scan pattern produced a block of columns at a time.
+
+    Subclasses give __len__ and block(start, stop). Patterns also have
+    .shape and convert with np.asarray() for code that wants the whole
+    matrix, which is what the chunked consumers avoid. grid_units is True
+    when columns are grid indices, so a change of n is n steps, positions
+    when they are stage positions in mm.
+    """
+    grid_units = True
+    positions = False
+
+    def __len__(self) -> int:
+        raise NotImplementedError
+
+    def block(self, start: int, stop: int) -> np.ndarray:
+        """Columns start..stop as a (3, stop - start) float array"""
+        raise NotImplementedError
+
+    @property
+    def shape(self) -> tuple[int, int]:
+        return (3, len(self))
+
+    def chunks(self, chunk_size: int = DEFAULT_CHUNK):
+        """Yield (start, block) over the whole pattern"""
+        num_points = len(self)
+        for start in range(0, num_points, chunk_size):
+            yield start, self.block(start, min(start + chunk_size, num_points))
+
+    def point(self, i: int) -> np.ndarray:
+        return self.block(i, i + 1)[:, 0]
+
+    def __array__(self, dtype=None, copy=None):
+        matrix = self.block(0, len(self))
+        return matrix if dtype is None else matrix.astype(dtype)
+
+
+class GridPattern(Pattern):
+    """serpentine()/raster() grid, optionally stacked on layers Z planes the
+    way layered() does it, computed per block from the point index"""
+
+    def __init__(self, rows: int, cols: int, layers: int = 1, serpentine: bool = True, order: str = "YX",
+                 z_step: float = 1.0, reverse_odd: bool = True) -> None:
+        if order not in ORDERS:
+            raise ValueError(f"Axis order must be one of {ORDERS}.")
+        self.rows, self.cols, self.layers = int(rows), int(cols), int(layers)
+        self.serpentine = serpentine
+        self.order = order
+        self.z_step = z_step
+        self.reverse_odd = reverse_odd
+
+    def __len__(self) -> int:
+        return self.rows * self.cols * self.layers
+
+    def block(self, start: int, stop: int) -> np.ndarray:
+        per_layer = self.rows * self.cols
+        layer, idx = np.divmod(np.arange(start, stop), per_layer)
+        if self.reverse_odd:
+            odd = (layer & 1).astype(bool)
+            idx[odd] = per_layer - 1 - idx[odd]
+        matrix = _grid_columns(idx, self.rows, self.cols, self.serpentine, self.order, np.float64)
+        matrix[2] = layer * self.z_step
+        return matrix
+
+
+class ArrayPattern(Pattern):
+    """An existing (2 or 3, N) matrix behind the Pattern interface. Left
+    with grid_units and positions False, any change above the threshold
+    is one step."""
+
+    def __init__(self, matrix, grid_units: bool = False, positions: bool = False) -> None:
+        matrix = np.asarray(matrix)
+        if matrix.ndim != 2 or not 2 <= matrix.shape[0] <= 3:
+            raise ValueError(f"Pattern matrix must be (2 or 3, N), got {matrix.shape}.")
+        self.matrix = matrix
+        self.grid_units = grid_units
+        self.positions = positions
+
+    def __len__(self) -> int:
+        return self.matrix.shape[1]
+
+    def block(self, start: int, stop: int) -> np.ndarray:
+        block = np.zeros((3, stop - start))
+        block[:self.matrix.shape[0]] = self.matrix[:, start:stop]
+        return block
+
+    def point(self, i: int) -> np.ndarray:
+        return self.matrix[:, i]
+
+    def __array__(self, dtype=None, copy=None):
+        return np.asarray(self.matrix, dtype=dtype)
+
+
+def as_pattern(obj) -> Pattern:
+    return obj if isinstance(obj, Pattern) else ArrayPattern(obj)
+
+
+class PatternTransform:
+    """Affine transform of (2 or 3, N) pattern matrices into (3, N) X/Y/Z
+    positions, built by chaining steps that each apply after the previous
+    ones:
+
+        PatternTransform().grid(2.0).slope(10, 90).offset(dz=50).apply(matrix)
+
+    Steps multiply into one 4x4 matrix, so applying costs one matrix
+    product however many steps there are. surface() adds a height map's Z
+    under each transformed X/Y after the affine part.
+    """
+
+    def __init__(self) -> None:
+        self.affine = np.eye(4)
+        self.height_map = None
+        self.standoff = 0.0
+
+    def then(self, affine) -> "PatternTransform":
+        """Append a 4x4 (or 3x3 linear) transform"""
+        affine = np.asarray(affine, dtype=float)
+        if affine.shape == (3, 3):
+            affine = np.block([[affine, np.zeros((3, 1))], [np.zeros((1, 3)), np.ones((1, 1))]])
+        if affine.shape != (4, 4):
+            raise ValueError(f"Transform must be 3x3 or 4x4, got {affine.shape}.")
+        self.affine = affine @ self.affine
+        return self
+
+    def grid(self, step_size: float, order: str = "YX", z_step: float = 0.0) -> "PatternTransform":
+        """Grid indices -> mm: step_size per index, rows swapped for order
+        "YX", layer index times z_step for Z (0 drops it, as planar_slope)"""
+        if order not in ORDERS:
+            raise ValueError(f"Axis order must be one of {ORDERS}.")
+        linear = np.diag([step_size, step_size, z_step])
+        if order == "YX":
+            linear = linear[:, [1, 0, 2]]
+        return self.then(linear)
+
+    def scale(self, sx: float, sy: float | None = None, sz: float | None = None) -> "PatternTransform":
+        sy = sx if sy is None else sy
+        sz = sx if sz is None else sz
+        return self.then(np.diag([sx, sy, sz]))
+
+    def slope(self, slope_deg: float, direction_deg: float = 0.0) -> "PatternTransform":
+        """Raise Z by tan(slope) * distance along direction (degrees from +X)"""
+        slope = np.tan(np.deg2rad(slope_deg))
+        phi = np.deg2rad(direction_deg)
+        linear = np.eye(3)
+        linear[2, :2] = slope * np.cos(phi), slope * np.sin(phi)
+        return self.then(linear)
+
+    def rotate(self, angle_deg: float, axis=(0.0, 0.0, 1.0), center=(0.0, 0.0, 0.0)) -> "PatternTransform":
+        """Rotate counter clockwise (right hand) by angle about axis through center"""
+        k = np.asarray(axis, dtype=float)
+        norm = np.linalg.norm(k)
+        if norm == 0:
+            raise ValueError("Rotation axis must not be zero.")
+        k = k / norm
+        theta = np.deg2rad(angle_deg)
+        cross = np.array([[0, -k[2], k[1]], [k[2], 0, -k[0]], [-k[1], k[0], 0]])
+        linear = np.cos(theta) * np.eye(3) + np.sin(theta) * cross + (1 - np.cos(theta)) * np.outer(k, k)
+        center = np.asarray(center, dtype=float)
+        affine = np.eye(4)
+        affine[:3, :3] = linear
+        affine[:3, 3] = center - linear @ center
+        return self.then(affine)
+
+    def tilt(self, angle_deg: float, axis=(1.0, 0.0, 0.0), center=(0.0, 0.0, 0.0)) -> "PatternTransform":
+        """rotate() with a horizontal axis by default, tilting the pattern's plane"""
+        return self.rotate(angle_deg, axis, center)
+
+    def offset(self, dx: float = 0.0, dy: float = 0.0, dz: float = 0.0) -> "PatternTransform":
+        affine = np.eye(4)
+        affine[:3, 3] = dx, dy, dz
+        return self.then(affine)
+
+    def surface(self, height_map, standoff: float = 0.0) -> "PatternTransform":
+        """Add height_map.height(x, y) + standoff to Z after the affine steps
+        (surface_projection.HeightMap or anything with that method). Points
+        off the map get NaN Z."""
+        self.height_map = height_map
+        self.standoff = standoff
+        return self
+
+    def apply(self, matrix, out: np.ndarray | None = None) -> np.ndarray:
+        """(3, N) X/Y/Z for a (2 or 3, N) matrix, written into out if given"""
+        matrix = np.asarray(matrix, dtype=float)
+        if matrix.ndim != 2 or not 2 <= matrix.shape[0] <= 3:
+            raise ValueError(f"Pattern matrix must be (2 or 3, N), got {matrix.shape}.")
+        rows = matrix.shape[0]
+        if out is None:
+            out = np.empty((3, matrix.shape[1]))
+        np.matmul(self.affine[:3, :rows], matrix, out=out)
+        out += self.affine[:3, 3:]
+        if self.height_map is not None:
+            out[2] += self.height_map.height(out[0], out[1])
+            out[2] += self.standoff
+        return out
+
+    def pattern(self, source) -> "TransformedPattern":
+        """source (a Pattern or matrix) transformed lazily, chunk by chunk"""
+        return TransformedPattern(as_pattern(source), self)
+
+    def z_step(self) -> float:
+        """Largest Z change for one unit of input row 0 or 1 (one grid step
+        after grid()), the Z axis step; slope_z_step for a plain slope"""
+        return float(np.abs(self.affine[2, :2]).max())
+
+
+class TransformedPattern(Pattern):
+    """A pattern with a PatternTransform applied to each block as it is
+    read. The columns are stage positions in mm."""
+    grid_units = False
+    positions = True
+
+    def __init__(self, source: Pattern, transform: PatternTransform) -> None:
+        self.source = source
+        self.transform = transform
+
+    def __len__(self) -> int:
+        return len(self.source)
+
+    def block(self, start: int, stop: int) -> np.ndarray:
+        return self.transform.apply(self.source.block(start, stop))
+
+
+def iter_points(pattern, chunk_size: int = DEFAULT_CHUNK):
+    """Yield (i, point, previous point) over a pattern, previous is None at i = 0"""
+    previous = None
+    for start, block in as_pattern(pattern).chunks(chunk_size):
+        for j, point in enumerate(block.T):
+            yield start + j, point, previous
+            previous = point
+
+
+def step_counts(diffs, grid_units: bool) -> np.ndarray:
+    """Steps per axis for the index changes diffs: the rounded change for
+    grid patterns, which can jump several points, one step otherwise"""
+    diffs = np.asarray(diffs, dtype=float)
+    if grid_units:
+        return np.maximum(np.rint(np.abs(diffs)), 1.0)
+    return np.ones_like(diffs)
+
+
+def axis_moves(pattern, diffs, step_size: float, negative_step_size: float, threshold: float = 0.01) -> np.ndarray:
+    """Relative move per axis run_scan sends for the column changes diffs:
+    step_counts() of step_size or negative_step_size, 0 for changes within
+    threshold. Position patterns move by the change itself however small,
+    dropping small moves would let the stage drift off the path."""
+    diffs = np.asarray(diffs, dtype=float)
+    if pattern.positions:
+        return np.where(np.abs(diffs) > 1e-9, diffs, 0.0)
+    steps = np.where(diffs > threshold, step_size, np.where(diffs < -threshold, negative_step_size, 0.0))
+    return steps * step_counts(diffs, pattern.grid_units)
+
+
+def position_scale(pattern, step_size: float) -> float:
+    """mm per pattern unit"""
+    return 1.0 if pattern.positions else step_size
+
+
+def step_chunks(pattern, step_size: float, negative_step_size: float, threshold: float = 0.01,
+                chunk_size: int = DEFAULT_CHUNK):
+    """Yield the (3, k) relative moves (axis_moves()) run_scan sends between successive points"""
+    pattern = as_pattern(pattern)
+    previous = None
+    for _, block in pattern.chunks(chunk_size):
+        if previous is not None:
+            block = np.hstack((previous, block))
+        previous = block[:, -1:]
+        diffs = np.diff(block, axis=1)
+        if diffs.shape[1]:
+            yield axis_moves(pattern, diffs, step_size, negative_step_size, threshold)
+
+
+def estimate_time(pattern, step_size: float, acceleration: float = 10.0, threshold: float = 0.01,
+                  chunk_size: int = DEFAULT_CHUNK) -> float:
+    """Seconds of motion for a scan, counting each single axis move run_scan
+    makes as an accelerate/decelerate move of 2 * sqrt(distance / acceleration)"""
+    total = 0.0
+    for steps in step_chunks(pattern, step_size, -step_size, threshold, chunk_size):
+        total += float(np.sqrt(np.abs(steps[steps != 0])).sum())
+    return 2 * total / np.sqrt(acceleration)
+
+
+def scan_rows(pattern, step_size: float, negative_step_size: float, threshold: float = 0.01,
+              chunk_size: int = DEFAULT_CHUNK):
+    """Split a pattern into rows for triggered acquisition, runs of points
+    joined by moves along one axis in one direction (the axis_moves() run_scan
+    would send). Yields (first, approach, axis, offsets): approach is the (3,)
+    move from the previous row's last point to point first (None for the
+    first row), offsets the distances of the row's points along axis from
+    point first, offsets[0] == 0. A point with no row to join is a row of one."""
+    pattern = as_pattern(pattern)
+    if len(pattern) == 0:
+        return
+    first, approach, axis, key, row = 0, None, 0, None, []
+
+    def finish():
+        steps = np.concatenate(row) if row else np.zeros(0)
+        return first, approach, axis, np.concatenate(([0.0], np.cumsum(steps)))
+
+    moves_done = 0
+    for moves in step_chunks(pattern, step_size, negative_step_size, threshold, chunk_size):
+        nonzero = moves != 0
+        move_axis = nonzero.argmax(axis=0)
+        value = moves[move_axis, np.arange(moves.shape[1])]
+        keys = np.where(nonzero.sum(axis=0) == 1, move_axis * 2 + (value > 0), -1)
+        bounds = np.concatenate(([0], np.flatnonzero(np.diff(keys)) + 1, [keys.size]))
+        for a, b in zip(bounds[:-1], bounds[1:]):
+            k = int(keys[a])
+            if k < 0:
+                # moves on several axes (or none) are never part of a row
+                for j in range(a, b):
+                    yield finish()
+                    first, approach, key, row = moves_done + j + 1, moves[:, j].copy(), None, []
+                continue
+            if key is not None and key != k:
+                yield finish()
+                first, approach, key, row = moves_done + a + 1, moves[:, a].copy(), None, []
+                a += 1
+            if a < b:
+                axis, key = k // 2, k
+                row.append(value[a:b])
+        moves_done += moves.shape[1]
+    yield finish()
+
+
+if __name__ == "__main__":
+    # equivalence with the loop based generators these replace, then timing
+    import time
+
+    def old_generalized(rows, cols):
+        final_x, final_y = [], []
+        for r in range(rows):
+            final_x.extend(np.arange(cols) if r % 2 == 0 else np.arange(cols - 1, -1, -1))
+            final_y.extend([r] * cols)
+        return np.array([final_y, final_x, np.zeros(len(final_x))])
+
+    def old_matrix(n):
+        row2 = []
+        for i in range(n + 1):
+            row2.extend(range(n + 1) if i % 2 == 0 else range(n, -1, -1))
+        return np.array([np.repeat(np.arange(n + 1), n + 1), row2])
+
+    def old_rotate(matrix, theta_rad):
+        R = np.array([[np.cos(theta_rad), -np.sin(theta_rad)], [np.sin(theta_rad), np.cos(theta_rad)]]) @ matrix
+        R[np.abs(R) < 1e-10] = 0
+        return R
+
+    checks = []
+    for rows, cols in ((1, 1), (1, 7), (6, 1), (5, 8), (8, 5), (101, 101)):
+        old = old_generalized(rows, cols)
+        checks.append(np.array_equal(serpentine(rows, cols), old))
+        swapped = old.copy()
+        swapped[[0, 1]] = swapped[[1, 0]]
+        checks.append(np.array_equal(serpentine(rows, cols, order="XY"), swapped))
+    for n in (0, 1, 4, 9):
+        checks.append(np.array_equal(serpentine(n + 1, n + 1)[:2], old_matrix(n)))
+    m = serpentine(11, 13)
+    checks.append(np.allclose(rotate(m, 30)[:2], old_rotate(m[:2], np.deg2rad(30))))
+    checks.append(np.allclose(shear(m, 0.2, 0.1)[:2], np.array([[1, 0.2], [0.1, 1]]) @ m[:2]))
+    x, y = m[1] * 2.0, m[0] * 2.0
+    checks.append(np.allclose(planar_slope(m, 2.0, 10, 45, 50), [x, y, 50 + np.tan(np.deg2rad(10)) * (x + y) * np.cos(np.deg2rad(45))]))
+    cube = layered(m, 4, 0.5)
+    checks.append(cube.shape == (3, 4 * m.shape[1]) and np.abs(np.diff(cube[:2], axis=1)).sum(axis=0).max() <= 1)
+    print("equivalence:", "ok" if all(checks) else f"FAILED {checks}")
+
+    lazy_checks = []
+    for rows, cols, layers in ((1, 1, 1), (5, 8, 1), (8, 5, 3), (7, 7, 4)):
+        for serp in (True, False):
+            for order in ORDERS:
+                eager = _grid(rows, cols, serp, order, np.float64)
+                if layers > 1:
+                    eager = layered(eager, layers, 0.5)
+                lazy = GridPattern(rows, cols, layers, serp, order, z_step=0.5)
+                blocks = [block for _, block in lazy.chunks(7)]
+                lazy_checks.append(np.array_equal(np.hstack(blocks), eager) and len(lazy) == eager.shape[1])
+                diffs = np.diff(eager, axis=1)
+                steps = np.where(diffs > 0.01, 2.0, np.where(diffs < -0.01, -2.0, 0.0)) * np.maximum(np.rint(np.abs(diffs)), 1)
+                chunked = list(step_chunks(lazy, 2.0, -2.0, chunk_size=3))
+                lazy_checks.append(np.array_equal(np.hstack(chunked) if chunked else steps, steps))
+    pts = list(iter_points(serpentine(4, 6), chunk_size=5))
+    lazy_checks.append([i for i, _, _ in pts] == list(range(24)) and pts[0][2] is None
+                       and all(np.array_equal(prev, pts[i - 1][1]) for i, _, prev in pts[1:]))
+    print("lazy patterns:", "ok" if all(lazy_checks) else f"FAILED {lazy_checks}")
+
+    def d2xy(n, d):
+        # classic Hilbert curve on an n x n square, n a power of 2
+        x = np.zeros_like(d)
+        y = np.zeros_like(d)
+        t = d.copy()
+        s = 1
+        while s < n:
+            rx = 1 & (t // 2)
+            ry = 1 & (t ^ rx)
+            flip = (ry == 0) & (rx == 1)
+            x = np.where(flip, s - 1 - x, x)
+            y = np.where(flip, s - 1 - y, y)
+            x, y = np.where(ry == 0, y, x), np.where(ry == 0, x, y)
+            x += s * rx
+            y += s * ry
+            t //= 4
+            s *= 2
+        return x, y
+
+    curve_checks = []
+    for rows, cols in ((1, 1), (1, 9), (7, 1), (2, 2), (3, 5), (8, 8), (9, 9), (10, 17), (33, 20), (64, 64), (101, 57)):
+        for name, curve in CURVES.items():
+            m = curve(rows, cols)
+            covered = np.unique(m[0] * cols + m[1]).size == rows * cols == m.shape[1]
+            steps = np.abs(np.diff(m[:2], axis=1)).max(axis=0) if m.shape[1] > 1 else np.zeros(0)
+            curve_checks.append(covered and (name != "Hilbert" or (steps <= 1).all() and (steps.size == 0 or
+                                np.count_nonzero(np.abs(np.diff(m[:2], axis=1)).sum(axis=0) == 2) <= 1)))
+    for n in (3, 9, 27):
+        curve_checks.append(bool((np.abs(np.diff(peano(n, n)[:2], axis=1)).sum(axis=0) == 1).all()))
+    for n in (2, 4, 16, 64):
+        y, x = hilbert(n, n)[:2]
+        hx, hy = d2xy(n, np.arange(n * n))
+        curve_checks.append(np.array_equal(x, hx) and np.array_equal(y, hy))
+    print("curves:", "ok" if all(curve_checks) else f"FAILED {curve_checks}")
+
+    polar_checks = []
+    for radius, pitch, spacing in ((50, 2, 2), (100, 5, 1), (10, 1, 0.5)):
+        path = spiral(radius, pitch, spacing)
+        gaps = np.linalg.norm(np.diff(path, axis=1), axis=0)
+        # chords of a curved path are a little shorter than the arc
+        polar_checks.append(np.allclose(gaps[20:], spacing, rtol=0.03) and (gaps <= spacing + 1e-9).all()
+                            and np.hypot(*path[:2, -1]) <= radius + 1e-9
+                            and path.shape[1] == polar_point_count("spiral", radius, spacing, pitch))
+        path = rings(radius, pitch, spacing)
+        r = np.hypot(*path[:2])
+        same_ring = np.abs(np.diff(r)) < 1e-9
+        gaps = np.linalg.norm(np.diff(path, axis=1), axis=0)[same_ring]
+        polar_checks.append((gaps <= spacing + 1e-9).all() and r.max() <= radius + 1e-9
+                            and path.shape[1] == polar_point_count("rings", radius, spacing, pitch))
+        path = helix(radius, 3 * pitch, pitch, spacing)
+        gaps = np.linalg.norm(np.diff(path, axis=1), axis=0)
+        polar_checks.append(np.allclose(gaps, gaps[0]) and gaps[0] <= spacing and path[2, -1] <= 3 * pitch + 1e-9
+                            and path.shape[1] == polar_point_count("helix", radius, spacing, pitch, 3 * pitch))
+    for kind, args in (("spiral", (10, 0, 1)), ("rings", (10, 1, 0)), ("helix", (10, 1, 1, 0)), ("helix", (0, 1, 1, 3))):
+        try:
+            polar_point_count(kind, *args)
+            polar_checks.append(False)
+        except ValueError:
+            polar_checks.append(True)
+    print("polar:", "ok" if all(polar_checks) else f"FAILED {polar_checks}")
+
+    class Plane:
+        # stands in for surface_projection.HeightMap, z = 5 + x / 10
+        @staticmethod
+        def height(x, y):
+            return 5 + x / 10
+
+    transform_checks = []
+    m = serpentine(11, 13)
+    tilted = PatternTransform().grid(2.0).tilt(30, axis=(0, 1, 0), center=(12, 0, 0)).apply(m)
+    x = m[1] * 2.0
+    transform_checks.append(np.allclose(tilted, [12 + (x - 12) * np.cos(np.deg2rad(30)), m[0] * 2.0,
+                                                 -(x - 12) * np.sin(np.deg2rad(30))]))
+    # steps compose: a quarter turn about Z then an offset, all in one matrix
+    turned = PatternTransform().grid(1.0, "XY").rotate(90).offset(1, 2, 3).apply(m)
+    transform_checks.append(np.allclose(turned, [1 - m[1], 2 + m[0], 3 + np.zeros(m.shape[1])]))
+    surface = PatternTransform().grid(2.0).slope(10).surface(Plane, standoff=1.5)
+    expected = planar_slope(m, 2.0, 10)
+    expected[2] += 6.5 + expected[0] / 10
+    transform_checks.append(np.allclose(surface.apply(m), expected))
+    lazy = surface.pattern(GridPattern(11, 13))
+    transform_checks.append(lazy.positions and np.allclose(np.hstack([blk for _, blk in lazy.chunks(7)]), expected))
+    transform_checks.append(np.isclose(PatternTransform().grid(2.0).slope(10, 90).z_step(), slope_z_step(2.0, 10)))
+    print("transforms:", "ok" if all(transform_checks) else f"FAILED {transform_checks}")
+
+    row_checks = []
+    rows = list(scan_rows(GridPattern(4, 6), 2.0, -2.0, chunk_size=5))
+    row_checks.append([(r[0], r[2], r[3].tolist()) for r in rows] ==
+                      [(i * 6, 1, [0.0, sgn * 2, sgn * 4, sgn * 6, sgn * 8, sgn * 10]) for i, sgn in zip(range(4), (1, -1, 1, -1))])
+    row_checks.append(rows[0][1] is None and all(np.array_equal(r[1], [2.0, 0, 0]) for r in rows[1:]))
+    # every point lands in exactly one row, whatever the pattern
+    for pattern in (hilbert(8, 8), spiral(10, 2, 1), serpentine(3, 1)):
+        rows = list(scan_rows(pattern, 1.0, -1.0, chunk_size=7))
+        row_checks.append(sum(len(r[3]) for r in rows) == pattern.shape[1]
+                          and [r[0] for r in rows] == list(np.cumsum([0] + [len(r[3]) for r in rows[:-1]])))
+    print("rows:", "ok" if all(row_checks) else f"FAILED {row_checks}")
+
+    for name, gen in (("serpentine", serpentine), ("raster", raster)):
+        start = time.perf_counter()
+        big = gen(3163, 3163)
+        print(f"{big.shape[1] / 1e6:.1f}M point {name} in {time.perf_counter() - start:.3f}s")
+
+    for name, curve in CURVES.items():
+        start = time.perf_counter()
+        big = curve(1000, 1000)
+        print(f"{big.shape[1] / 1e6:.1f}M point {name} in {time.perf_counter() - start:.3f}s")
+
+    start = time.perf_counter()
+    big = spiral(1000, 1, 1)
+    print(f"{big.shape[1] / 1e6:.1f}M point spiral in {time.perf_counter() - start:.3f}s")
+
+    big = serpentine(3163, 3163)
+    transform = PatternTransform().grid(0.5).slope(5, 30).tilt(3, axis=(1, 1, 0)).offset(dz=40)
+    out = np.empty((3, big.shape[1]))
+    start = time.perf_counter()
+    transform.apply(big, out=out)
+    print(f"{big.shape[1] / 1e6:.1f}M point slope + tilt + offset in {time.perf_counter() - start:.3f}s")
+
+    # 100M point cube, never held whole
+    import tracemalloc
+    tracemalloc.start()
+    start = time.perf_counter()
+    cube = GridPattern(1000, 1000, 100)
+    seconds = estimate_time(cube, 2.0)
+    peak = tracemalloc.get_traced_memory()[1]
+    print(f"{len(cube) / 1e6:.0f}M point lazy estimate ({seconds / 3600:.0f} h) in {time.perf_counter() - start:.2f}s, "
+          f"peak {peak / 2**20:.0f} MiB")
@@ -3,6 +3,8 @@ from scanner.motion_controller import MotionController
 from scanner.probe_controller import ProbeController
 from scanner.plugin_switcher import PluginSwitcher
 from scanner.plugin_switcher_motion import PluginSwitcherMotion
+from scanner.scan_logging import get_logger
+from scanner import scan_patterns
 import importlib
 import numpy as np
 import threading
@@ -16,6 +18,8 @@ import tkinter as tk
 from tkinter import ttk
 from alive_progress import alive_bar
 
+log = get_logger("engine")
+
 
 
 class Scanner():
@@ -99,9 +103,15 @@ class Scanner():
     
     
     
-    def run_scan(self, matrix, length,lenx,leny, step_size, negative_step_size,z_step_size, meta_data, meta_data_labels, camera_app=None, scan_settings=None, scan_point_callback=None) -> None:
+    def run_scan(self, matrix, length,lenx,leny, step_size, negative_step_size,z_step_size, meta_data, meta_data_labels, camera_app=None, scan_settings=None, scan_point_callback=None, software_triggers=False) -> None:
+        # software_triggers=True (experimental): rows are covered in one move each and the probe
+        # is triggered by pulses the motion plugin sends as it polls the position, see
+        # _run_software_triggered_rows. Not hardware triggering, points lag by up to one poll of travel
         self.data_inc = 0
-        self.matrix_copy = matrix
+        # walked a chunk at a time, a plain matrix works the same as a lazy pattern
+        pattern = scan_patterns.as_pattern(matrix)
+        self.matrix_copy = pattern
+        num_points = len(pattern)
         negative_thresh = -0.01
         positive_thresh = 0.01
         step_size = step_size 
@@ -124,7 +134,7 @@ class Scanner():
         self.HDF5FILE.attrs['wasUniform'] = 1  
         self.HDF5FILE.attrs['isComplex'] = 1  
         self.HDF5FILE.attrs['isComplex'] = True
-        self.HDF5FILE.attrs['numPoints'] = len(matrix[0])
+        self.HDF5FILE.attrs['numPoints'] = num_points
         self.HDF5FILE.attrs['numFrequencies'] = len(self.frequencies)
 
         
@@ -146,22 +156,25 @@ class Scanner():
                         self.HDF5FILE.create_dataset("/CameraImage", data=np.frombuffer(buffer, dtype=np.uint8))
                         self.HDF5FILE["/CameraImage"].attrs['format'] = 'PNG'
                         self.HDF5FILE["/CameraImage"].attrs['timestamp'] = datetime.datetime.now().isoformat()
-                        print("Camera image saved to HDF5 file")
+                        log.info("Camera image saved to HDF5 file")
             except Exception as e:
-                print(f"Failed to save camera image: {e}")
+                log.error("Failed to save camera image: %s", e)
 
         freqs_ghz = np.asarray(self.frequencies, dtype=float) / 1e9
         # Create datasets for frequencies and coordinates
         self.HDF5FILE.create_dataset("/Frequencies/Range", data=freqs_ghz)  # Store frequencies in GHz
-        self.HDF5FILE.create_dataset("/Coords/x_data", data=self.matrix_copy[0, :]*step_size)
-        self.HDF5FILE.create_dataset("/Coords/y_data", data=self.matrix_copy[1, :]*step_size)
-        self.HDF5FILE.create_dataset("/Coords/z_data", data=np.zeros(len(matrix[0])))
+        # grid patterns are in steps, position patterns already in mm
+        scale = scan_patterns.position_scale(pattern, step_size)
+        coords = [self.HDF5FILE.create_dataset(f"/Coords/{name}", (num_points,), dtype='float64')
+                  for name in ("x_data", "y_data", "z_data")]
+        for start, block in pattern.chunks():
+            for row, dset in enumerate(coords):
+                dset[start:start + block.shape[1]] = block[row] * scale
 
         # Get S-parameter names from probe controller
         self.s_param_names = self._probe_controller.get_channel_names()
 
         # Pre-allocate arrays for bulk data storage
-        num_points = len(matrix[0])
         num_freqs = len(self.frequencies)
 
         # Create datasets for each S-parameter dynamically
@@ -169,7 +182,7 @@ class Scanner():
         for s_param_name in self.s_param_names:
             self.HDF5FILE.create_dataset(f"/Data/{s_param_name}_real", (num_points, num_freqs), dtype='float64')
             self.HDF5FILE.create_dataset(f"/Data/{s_param_name}_imag", (num_points, num_freqs), dtype='float64')
-            print(f"Created datasets for {s_param_name}")
+            log.debug("Created datasets for %s", s_param_name)
 
         # Determine scan pattern style (e.g., 'YX' or 'XY') from provided settings or metadata
         pattern_style = None
@@ -207,28 +220,46 @@ class Scanner():
         # busy_bit = self._motion_controller.is_moving()
         # while busy_bit[1] and busy_bit[0] == True:
         #     busy_bit = self._motion_controller.is_moving()
+        # the steps the loop below sends, checked against the soft limits before the first move
+        if self._motion_controller.relative_moves:
+            steps = scan_patterns.step_chunks(pattern, step_size, negative_step_size, positive_thresh)
+            self._motion_controller.validate_chunks(steps, relative=True)
         ##End bounding box check
 
-        with alive_bar(len(matrix[0])) as bar:
-            for i in range(len(matrix[0])):
+        if software_triggers:
+            self._run_software_triggered_rows(pattern, step_size, negative_step_size, positive_thresh, scale, scan_point_callback)
+            self._probe_controller.scan_end()
+            try:
+                self._probe_controller.scan_postprocess(self.HDF5FILE)
+            except Exception as e:
+                log.error("Probe post-processing failed: %s", e)
+            self.HDF5FILE.close()
+            self._close_output_file()
+            return
+
+        with alive_bar(num_points) as bar:
+            for i, point, previous_point in scan_patterns.iter_points(pattern):
                 start = time.time()
 
                 if self.pause:
-                    print("Scan paused. Waiting to resume...")
+                    log.info("Scan paused. Waiting to resume...")
                     self.handle_pause()
 
                     
                     
                 # Move to position FIRST (except for point 0 where we're already there)
                 if i > 0:
-                    diff_Var = matrix[:, i] - matrix[:, i-1]
+                    diff_Var = point - previous_point
+                    moves = scan_patterns.axis_moves(pattern, diff_Var, step_size, negative_step_size, positive_thresh)
+                    # the previous point's data is written once, during the first axis move
+                    self.vna_thread = None
 
                     try:
                         if self.signal_scope:
                             self.signal_scope.set_lane_active("Motor")
 
-                        if diff_Var[0] > positive_thresh:
-                            self._motion_controller.move_absolute({0: step_size})
+                        if moves[0] > 0:
+                            self._motion_controller.move_absolute({0: moves[0]})
                             busy_bit = self._motion_controller.is_moving()
 
 
@@ -237,59 +268,63 @@ class Scanner():
                             if self.signal_scope:
                                 self.signal_scope.set_lane_active("File I/O")
                             # self.vna_write_data_bulk(all_s_params_data)
-                            self.vna_thread = threading.Thread(target=self.vna_write_data_bulk, args=(all_s_params_data,))
-                            self.vna_thread.start()
+                            if self.vna_thread is None:
+                                self.vna_thread = threading.Thread(target=self.vna_write_data_bulk, args=(all_s_params_data,))
+                                self.vna_thread.start()
 
                             while busy_bit[0] == True:
                                 busy_bit = self._motion_controller.is_moving()
                             
                                 
-                        elif diff_Var[0] < negative_thresh:
-                            self._motion_controller.move_absolute({0: negative_step_size})
+                        elif moves[0] < 0:
+                            self._motion_controller.move_absolute({0: moves[0]})
                             busy_bit = self._motion_controller.is_moving()
 
                             
                             if self.signal_scope:
                                 self.signal_scope.set_lane_active("File I/O")
                             # self.vna_write_data_bulk(all_s_params_data)
-                            self.vna_thread = threading.Thread(target=self.vna_write_data_bulk, args=(all_s_params_data,))
-                            self.vna_thread.start()
+                            if self.vna_thread is None:
+                                self.vna_thread = threading.Thread(target=self.vna_write_data_bulk, args=(all_s_params_data,))
+                                self.vna_thread.start()
                             while busy_bit[0] == True:
                                 busy_bit = self._motion_controller.is_moving()
                             
                             
-                        if diff_Var[1] > positive_thresh:
-                            self._motion_controller.move_absolute({1: step_size})
+                        if moves[1] > 0:
+                            self._motion_controller.move_absolute({1: moves[1]})
                             busy_bit = self._motion_controller.is_moving()
                             
                             if self.signal_scope:
                                 self.signal_scope.set_lane_active("File I/O")
                             # self.vna_write_data_bulk(all_s_params_data)
-                            self.vna_thread = threading.Thread(target=self.vna_write_data_bulk, args=(all_s_params_data,))
-                            self.vna_thread.start()
+                            if self.vna_thread is None:
+                                self.vna_thread = threading.Thread(target=self.vna_write_data_bulk, args=(all_s_params_data,))
+                                self.vna_thread.start()
                             
                             
                             while busy_bit[1] == True:
                                 busy_bit = self._motion_controller.is_moving()
                             
-                        elif diff_Var[1] < negative_thresh:
-                            self._motion_controller.move_absolute({1: negative_step_size})
+                        elif moves[1] < 0:
+                            self._motion_controller.move_absolute({1: moves[1]})
                             busy_bit = self._motion_controller.is_moving()
                             
                             if self.signal_scope:
                                 self.signal_scope.set_lane_active("File I/O")
                             # self.vna_write_data_bulk(all_s_params_data)
 
-                            self.vna_thread = threading.Thread(target=self.vna_write_data_bulk, args=(all_s_params_data,))
-                            self.vna_thread.start()
+                            if self.vna_thread is None:
+                                self.vna_thread = threading.Thread(target=self.vna_write_data_bulk, args=(all_s_params_data,))
+                                self.vna_thread.start()
 
 
                             while busy_bit[1] == True:
                                 busy_bit = self._motion_controller.is_moving()
                             
 
-                        if diff_Var[2] > positive_thresh:
-                            self._motion_controller.move_absolute({2: step_size})
+                        if moves[2] > 0:
+                            self._motion_controller.move_absolute({2: moves[2]})
                             busy_bit = self._motion_controller.is_moving()
                             
                             if self.signal_scope:
@@ -301,15 +336,16 @@ class Scanner():
                                 self.signal_scope.set_lane_active("File I/O")
                             # self.vna_write_data_bulk(all_s_params_data)
 
-                            self.vna_thread = threading.Thread(target=self.vna_write_data_bulk, args=(all_s_params_data,))
-                            self.vna_thread.start()
+                            if self.vna_thread is None:
+                                self.vna_thread = threading.Thread(target=self.vna_write_data_bulk, args=(all_s_params_data,))
+                                self.vna_thread.start()
                                 
                             while busy_bit[2] == True:
                                 busy_bit = self._motion_controller.is_moving()
 
 
-                        elif diff_Var[2] < negative_thresh:
-                            self._motion_controller.move_absolute({2: negative_step_size})
+                        elif moves[2] < 0:
+                            self._motion_controller.move_absolute({2: moves[2]})
                             busy_bit = self._motion_controller.is_moving()
                             
 
@@ -317,14 +353,19 @@ class Scanner():
                                 self.signal_scope.set_lane_active("File I/O")
                             # self.vna_write_data_bulk(all_s_params_data)
 
-                            self.vna_thread = threading.Thread(target=self.vna_write_data_bulk, args=(all_s_params_data,))
-                            self.vna_thread.start()
+                            if self.vna_thread is None:
+                                self.vna_thread = threading.Thread(target=self.vna_write_data_bulk, args=(all_s_params_data,))
+                                self.vna_thread.start()
                             while busy_bit[2] == True:
                                 busy_bit = self._motion_controller.is_moving()
 
                         
                         self.signal_scope.set_lane_idle("Motor")
-                        self.vna_thread.join()
+                        if self.vna_thread is None:
+                            # nothing moved, still record the previous point
+                            self.vna_write_data_bulk(all_s_params_data)
+                        else:
+                            self.vna_thread.join()
                     except Exception as e:
                         if self.signal_scope:
                             self.signal_scope.set_lane_idle("Motor")
@@ -333,7 +374,7 @@ class Scanner():
                         error_category = "Endstop Violation" if is_endstop else "Motor Failure"
                         error_msg = f"{error_category}: {str(e)}"
                         
-                        print(error_msg)
+                        log.error(error_msg)
 
                         if self.signal_scope:
                             self.signal_scope.freeze_on_error(
@@ -341,8 +382,8 @@ class Scanner():
                                 "Motor",
                                 {
                                     "point_index": i,
-                                    "current_position": matrix[:, i-1].tolist(),
-                                    "target_position": matrix[:, i].tolist(),
+                                    "current_position": previous_point.tolist(),
+                                    "target_position": point.tolist(),
                                     "exception_type": type(e).__name__,
                                     "is_boundary_violation": is_endstop
                                 }
@@ -430,7 +471,7 @@ class Scanner():
                     if self.signal_scope:
                         self.signal_scope.set_lane_active("VNA")
 
-                    all_s_params_data = self.vna_sim()
+                    all_s_params_data = self.vna_sim(i, tuple(point * scale))
 
                     if self.signal_scope:
                         self.signal_scope.set_lane_idle("VNA")
@@ -444,7 +485,7 @@ class Scanner():
 
                     vna_consecutive_failures += 1
                     error_msg = f"VNA measurement failed (attempt {vna_consecutive_failures}): {str(e)}"
-                    print(error_msg)
+                    log.error(error_msg)
 
                     # Only treat as fatal error if it fails twice in a row
                     if vna_consecutive_failures >= 2:
@@ -454,7 +495,7 @@ class Scanner():
                                 "VNA",
                                 {
                                     "point_index": i,
-                                    "position": matrix[:, i].tolist(),
+                                    "position": point.tolist(),
                                     "exception_type": type(e).__name__,
                                     "consecutive_failures": vna_consecutive_failures
                                 }
@@ -462,7 +503,7 @@ class Scanner():
                         break
                     else:
                         # Single failure - zero pad this data point and continue
-                        print(f"Single VNA failure at point {i}. Zero-padding data and continuing...")
+                        log.warning("Single VNA failure at point %d. Zero-padding data and continuing...", i)
                         all_s_params_data = {}
                         for s_param_name in self.s_param_names:
                             # Create zero-padded data with correct shape
@@ -513,7 +554,7 @@ class Scanner():
                     try:
                         scan_point_callback(i, all_s_params_data)
                     except Exception as e:
-                        print(f"Warning: Scan point callback failed: {e}")
+                        log.warning("Scan point callback failed: %s", e)
 
                                 
                 bar()
@@ -523,17 +564,76 @@ class Scanner():
             
             # Write the final measurement captured at the last point
             self.vna_write_data_bulk(all_s_params_data)
+
+            try:
+                self._probe_controller.scan_postprocess(self.HDF5FILE)
+            except Exception as e:
+                log.error("Probe post-processing failed: %s", e)
             
             self.HDF5FILE.close()
             self._close_output_file()
                 
                         
-    def vna_sim(self):
+    def _run_software_triggered_rows(self, pattern, step_size, negative_step_size, threshold, scale, scan_point_callback=None):
+        """Software-triggered acquisition, experimental: for each row the probe
+        is armed for the row's points, the motion controller covers the row in
+        one move and pulses its trigger output as the polled position passes
+        every point, and the probe's sweeps are written as one block of rows."""
+        if not self._motion_controller.supports_software_triggered_rows():
+            raise NotImplementedError("The motion plugin has no software-timed trigger output.")
+        log.warning("Software-triggered acquisition is experimental and not checked on hardware, "
+                    "each point can lag its position by up to one status poll of travel.")
+        with alive_bar(len(pattern)) as bar:
+            for first, approach, axis, offsets in scan_patterns.scan_rows(pattern, step_size, negative_step_size, threshold):
+                if self.pause:
+                    log.info("Scan paused. Waiting to resume...")
+                    self.handle_pause()
+                num = len(offsets)
+                try:
+                    if approach is not None:
+                        for k in np.flatnonzero(approach):
+                            self._motion_controller.move_absolute({int(k): float(approach[k])})
+                            busy_bit = self._motion_controller.is_moving()
+                            while busy_bit[k] == True:
+                                busy_bit = self._motion_controller.is_moving()
+                    locations = pattern.block(first, first + num).T * scale
+                    # the probe starts listening before the row moves, the first trigger is at its start
+                    self._probe_controller.scan_arm_triggers(num, locations)
+                    self._motion_controller.run_software_triggered_row(int(axis), float(offsets[-1]), offsets)
+                    all_s_params_data = self._probe_controller.scan_read_triggered()
+                except Exception as e:
+                    error_msg = f"Triggered row starting at point {first} failed: {e}"
+                    log.error(error_msg)
+                    if self.signal_scope:
+                        self.signal_scope.freeze_on_error(error_msg, "Motor", {"point_index": first,
+                                                                               "exception_type": type(e).__name__})
+                    break
+                self.vna_write_rows(first, all_s_params_data)
+                if scan_point_callback is not None:
+                    for r in range(num):
+                        try:
+                            scan_point_callback(first + r, {name: values[r] for name, values in all_s_params_data.items()})
+                        except Exception as e:
+                            log.warning("Scan point callback failed: %s", e)
+                bar(num)
+
+    def vna_write_rows(self, first, all_s_params_data):
+        """Write {name: (rows, freqs)} measurements for points first, first + 1, ..."""
+        num = 0
+        for s_param_name, s_param_values in all_s_params_data.items():
+            num = len(s_param_values)
+            self.HDF5FILE[f"/Data/{s_param_name}_real"][first:first + num, :] = np.real(s_param_values)
+            self.HDF5FILE[f"/Data/{s_param_name}_imag"][first:first + num, :] = np.imag(s_param_values)
+        self.HDF5FILE.flush()
+        os.fsync(self.HDF5FILE.id.get_vfd_handle())
+        self.data_inc = first + num
+
+    def vna_sim(self, scan_index=0, scan_location=()):
         
         
         #freqs = np.array(self._probe_controller.get_xaxis_coords())
         self._probe_controller.scan_begin()
-        all_s_params_data = self._probe_controller.scan_read_measurement(0, ())
+        all_s_params_data = self._probe_controller.scan_read_measurement(scan_index, scan_location)
         #s_param_names = self._probe_controller.get_channel_names()
         
         
@@ -543,23 +643,23 @@ class Scanner():
     def vna_write_data(self,all_s_params_data):
         
         start_data = time.time()
-        self.HDF5FILE.create_group(f"/Point_Data/{self.matrix_copy[:,self.data_inc]}")
+        self.HDF5FILE.create_group(f"/Point_Data/{self.matrix_copy.point(self.data_inc)}")
         for s_param_name, s_param_values in all_s_params_data.items():
             
             
             
             
             
-            self.HDF5FILE.create_group(f"/Point_Data/{self.matrix_copy[:,self.data_inc]}/{s_param_name}")
+            self.HDF5FILE.create_group(f"/Point_Data/{self.matrix_copy.point(self.data_inc)}/{s_param_name}")
             
-            dset = self.HDF5FILE.create_dataset(f"/Point_Data/{self.matrix_copy[:,self.data_inc]}/{s_param_name}/data",data=s_param_values)
-            print(f"s_param_name: {s_param_name}, shape: {s_param_values.shape}, type: {s_param_values.dtype}, values: {s_param_values}")
+            dset = self.HDF5FILE.create_dataset(f"/Point_Data/{self.matrix_copy.point(self.data_inc)}/{s_param_name}/data",data=s_param_values)
+            log.debug("s_param_name: %s, shape: %s, type: %s, values: %s", s_param_name, s_param_values.shape, s_param_values.dtype, s_param_values)
             
         
             
         end = time.time()
         
-        self.motion_tracker_thread = threading.Thread(target=self.motion_tracker, args=(self.matrix_copy[:,self.data_inc],))
+        self.motion_tracker_thread = threading.Thread(target=self.motion_tracker, args=(self.matrix_copy.point(self.data_inc),))
         self.motion_tracker_thread.start()
         self.time_linearity_test.append(end - start_data)
     
@@ -576,7 +676,7 @@ class Scanner():
            
             self.HDF5FILE[f"/Data/{s_param_name}_real"][self.data_inc, :] = np.real(s_param_values)
             self.HDF5FILE[f"/Data/{s_param_name}_imag"][self.data_inc, :] = np.imag(s_param_values)
-            print(f"s_param_name: {s_param_name}, shape: {s_param_values.shape}, type: {s_param_values.dtype}")
+            log.debug("s_param_name: %s, shape: %s, type: %s", s_param_name, s_param_values.shape, s_param_values.dtype)
         
 
         self.HDF5FILE.flush()  
@@ -593,7 +693,7 @@ class Scanner():
         # self.vna_thread.join()
         
     def motion_tracker(self,vector):   
-        self.percentage = self.data_inc/len(self.matrix_copy[0]) *100
+        self.percentage = self.data_inc/len(self.matrix_copy) *100
         
         
         
@@ -689,14 +789,14 @@ class Scanner():
             })
 
         self._plugin_settings_cache[plugin_class_name] = settings_data
-        print(f"Saved settings for plugin: {plugin_class_name}")
+        log.info("Saved settings for plugin: %s", plugin_class_name)
 
     def _restore_plugin_settings(self, plugin) -> None:
         """Restore saved settings to a plugin instance if available."""
         plugin_class_name = plugin.__class__.__name__
 
         if plugin_class_name not in self._plugin_settings_cache:
-            print(f"No cached settings found for plugin: {plugin_class_name}")
+            log.info("No cached settings found for plugin: %s", plugin_class_name)
             return
 
         settings_data = self._plugin_settings_cache[plugin_class_name]
@@ -708,9 +808,9 @@ class Scanner():
                 if setting.display_label == cached['display_label']:
                     try:
                         setting.set_value_from_string(cached['value'])
-                        print(f"Restored pre-connect setting: {cached['display_label']} = {cached['value']}")
+                        log.debug("Restored pre-connect setting: %s = %s", cached['display_label'], cached['value'])
                     except Exception as e:
-                        print(f"Error restoring setting {cached['display_label']}: {e}")
+                        log.error("Error restoring setting %s: %s", cached['display_label'], e)
 
         # Restore post-connect settings
         for i, setting in enumerate(plugin.settings_post_connect):
@@ -719,11 +819,11 @@ class Scanner():
                 if setting.display_label == cached['display_label']:
                     try:
                         setting.set_value_from_string(cached['value'])
-                        print(f"Restored post-connect setting: {cached['display_label']} = {cached['value']}")
+                        log.debug("Restored post-connect setting: %s = %s", cached['display_label'], cached['value'])
                     except Exception as e:
-                        print(f"Error restoring setting {cached['display_label']}: {e}")
+                        log.error("Error restoring setting %s: %s", cached['display_label'], e)
 
-        print(f"Restored settings for plugin: {plugin_class_name}")
+        log.info("Restored settings for plugin: %s", plugin_class_name)
 
     def swap_probe_plugin(self):
         """Swap probe plugin by reading from PluginSwitcher - preserves Scanner state and settings."""
@@ -748,12 +848,12 @@ class Scanner():
                 # Restore saved settings if available
                 self._restore_plugin_settings(new_plugin)
             except (ImportError, AttributeError) as e:
-                print(f"Error loading probe plugin: {e}")
+                log.error("Error loading probe plugin: %s", e)
                 new_plugin = PluginSwitcher()
 
         # Create new probe controller with selected plugin
         self._probe_controller = ProbeController(new_plugin)
-        print(f"Swapped to probe plugin: {new_plugin.__class__.__name__}")
+        log.info("Swapped to probe plugin: %s", new_plugin.__class__.__name__)
 
     def swap_motion_plugin(self):
         """Swap motion plugin by reading from PluginSwitcherMotion - preserves Scanner state and settings."""
@@ -778,18 +878,18 @@ class Scanner():
                 # Restore saved settings if available
                 self._restore_plugin_settings(new_plugin)
             except (ImportError, AttributeError) as e:
-                print(f"Error loading motion plugin: {e}")
+                log.error("Error loading motion plugin: %s", e)
                 new_plugin = PluginSwitcherMotion()
 
         # Create new motion controller with selected plugin
         self._motion_controller = MotionController(new_plugin)
-        print(f"Swapped to motion plugin: {new_plugin.__class__.__name__}")
+        log.info("Swapped to motion plugin: %s", new_plugin.__class__.__name__)
 
 
 
     def handle_pause(self):
         if self.pause:
-            print("Scan paused. Waiting for user input...")
+            log.info("Scan paused. Waiting for user input...")
             
             # Create a popup window
             popup = tk.Toplevel(self.root) # Assumes 'self.root' is your main Tkinter window
@@ -801,12 +901,12 @@ class Scanner():
             label.pack()
 
             def on_reset():
-                print("Reset selected")
+                log.info("Reset selected")
                 # self.reset_logic()
                 popup.destroy()
 
             def on_rewind():
-                print("Rewind selected")
+                log.info("Rewind selected")
                 # self.rewind_logic()
                 popup.destroy()
 
@@ -8,6 +8,18 @@ from PySide6.QtWidgets import (
     QWidget, QVBoxLayout, QHBoxLayout, QPushButton, 
     QLabel, QFileDialog, QApplication, QDoubleSpinBox, QMessageBox
 )
+from scanner import pattern_cache
+from scanner import surface_projection
+
+# bump when a recipe's output changes so old cache entries stop matching
+SURFACE_PROJECTION_RECIPE = "surface_projection/2"
+HEIGHT_MAP_RECIPE = "height_map/1"
+VOXEL_4D_RECIPE = "voxel_4d/2"
+
+def mesh_arrays(mesh):
+    """(vertices, triangles) arrays of a pyvista mesh, for surface_projection"""
+    tri = mesh.triangulate()
+    return np.asarray(tri.points, dtype=float), np.asarray(tri.faces).reshape(-1, 4)[:, 1:]
 
 class ndwindow(QWidget):
     def __init__(self):
@@ -15,6 +27,10 @@ class ndwindow(QWidget):
         self.setWindowTitle("SAR Raster 4D Transformer")
         self.resize(1200, 850)
         self.mesh = None 
+        self.mesh_digest = None
+        self.cache = None
+        self.height_map = None
+        self.live_path = None # path redrawn when step or standoff change
         self.points_matrix = np.array([]) # Base XYZ
         self.points_4d = np.array([])     # Transformed XYZ + Angle
         self.setup_ui()
@@ -36,19 +52,38 @@ class ndwindow(QWidget):
         self.standoff_input.setValue(5.0) 
         self.standoff_input.setSuffix(" mm")
 
+        self.map_res_input = QDoubleSpinBox()
+        self.map_res_input.setRange(0.01, 10.0)
+        self.map_res_input.setValue(0.25)
+        self.map_res_input.setSuffix(" mm")
+
+        # the shown path follows the spin boxes, rebuilt once the value is committed, not on every keystroke
+        for spin in (self.step_input, self.standoff_input, self.map_res_input):
+            spin.setKeyboardTracking(False)
+        self.step_input.valueChanged.connect(self.refresh_live_path)
+        # standoff and the map resolution only change the conformal path
+        self.standoff_input.valueChanged.connect(self.refresh_conformal_path)
+        self.map_res_input.valueChanged.connect(self.reset_height_map)
+
         self.project_btn = QPushButton("1. Generate Raster")
         self.project_btn.clicked.connect(self.run_surface_projection)
 
         self.transform_btn = QPushButton("2. Apply Normal Transformation")
         self.transform_btn.clicked.connect(self.apply_voxel_4d_transformation)
 
+        self.conformal_btn = QPushButton("Conformal Path (Height Map)")
+        self.conformal_btn.clicked.connect(self.run_conformal_path)
+
         self.control_layout.addWidget(self.import_btn)
         self.control_layout.addWidget(QLabel("Step:"))
         self.control_layout.addWidget(self.step_input)
         self.control_layout.addWidget(QLabel("Standoff:"))
         self.control_layout.addWidget(self.standoff_input)
+        self.control_layout.addWidget(QLabel("Map Res:"))
+        self.control_layout.addWidget(self.map_res_input)
         self.control_layout.addWidget(self.project_btn)
         self.control_layout.addWidget(self.transform_btn)
+        self.control_layout.addWidget(self.conformal_btn)
         self.control_layout.addStretch()
         
         self.plotter = QtInteractor(self)
@@ -65,44 +100,78 @@ class ndwindow(QWidget):
         points, _ = self.mesh.ray_trace(start, stop)
         return points[0] if len(points) > 0 else None
 
+    def cached(self, recipe, compute, **params):
+        """compute() -> dict of arrays through the mesh's pattern cache"""
+        if self.cache is None:
+            return compute()
+        key = pattern_cache.cache_key(self.mesh_digest, recipe, **params)
+        return self.cache.get_or_compute(key, compute)
+
+    def get_height_map(self):
+        """The mesh's top surface rasterized once at the map resolution (cached
+        on disk), or None after a warning if the map would be too large"""
+        if self.height_map is None:
+            resolution = self.map_res_input.value()
+            nx, ny = surface_projection.map_shape(self.mesh.bounds, resolution)
+            if nx * ny > surface_projection.MAX_MAP_NODES:
+                QMessageBox.warning(self, "Error", f"A {resolution} mm height map of this part has {nx * ny:,} nodes "
+                                    f"(limit {surface_projection.MAX_MAP_NODES:,}). Use a coarser map resolution.")
+                return None
+
+            def build():
+                vertices, triangles = mesh_arrays(self.mesh)
+                return surface_projection.HeightMap.from_mesh(vertices, triangles, self.mesh.bounds, resolution).to_arrays()
+
+            self.height_map = surface_projection.HeightMap.from_arrays(
+                self.cached(HEIGHT_MAP_RECIPE, build, resolution=resolution))
+        return self.height_map
+
+    def reset_height_map(self):
+        self.height_map = None
+        self.refresh_conformal_path()
+
+    def refresh_conformal_path(self):
+        if self.mesh is not None and self.live_path == "conformal":
+            self.run_conformal_path()
+
+    def refresh_live_path(self):
+        if self.mesh is None:
+            return
+        if self.live_path == "raster":
+            self.run_surface_projection()
+        elif self.live_path == "conformal":
+            self.run_conformal_path()
+
     def run_surface_projection(self):
         """Standard Raster Generation (Stage 1)"""
         if self.mesh is None: return
-        b = self.mesh.bounds
         target_dist = self.step_input.value()
-        raw_list = [] 
-
-        y_range = np.linspace(b[2], b[3], int(np.ceil((b[3] - b[2]) / target_dist)) + 1)
-        for row_idx, y in enumerate(y_range):
-            row_points = []
-            x = b[0]
-            p_prev = self.get_z_at_xy(x, y, b)
-            if p_prev is not None: row_points.append(p_prev)
-
-            while x < b[1]:
-                dx = target_dist 
-                for _ in range(5): 
-                    p_next = self.get_z_at_xy(x + dx, y, b)
-                    if p_next is None: break
-                    actual_dist = np.linalg.norm(p_next - p_prev)
-                    if actual_dist < 1e-6: break 
-                    dx = dx * (target_dist / actual_dist)
-                x += dx
-                if x >= b[1]:
-                    p_final = self.get_z_at_xy(b[1], y, b)
-                    if p_final is not None: row_points.append(p_final)
-                    break
-                p_prev = self.get_z_at_xy(x, y, b)
-                if p_prev is not None: row_points.append(p_prev)
-                else: x += target_dist
-
-            if row_idx % 2 != 0: row_points.reverse()
-            raw_list.extend(row_points)
-
-        self.points_matrix = np.array(raw_list)
+        result = self.cached(SURFACE_PROJECTION_RECIPE, lambda: {"points": self.compute_surface_projection(target_dist)},
+                             step=target_dist)
+        self.points_matrix = result["points"]
+        self.live_path = "raster"
         self.visualize_path(self.points_matrix)
         print(f"Base Raster Generated: {len(self.points_matrix)} points.")
 
+    def compute_surface_projection(self, target_dist):
+        # all rays in one batch, then equal arc length resampling per row
+        vertices, triangles = mesh_arrays(self.mesh)
+        return surface_projection.project_raster(vertices, triangles, self.mesh.bounds, target_dist)
+
+    def run_conformal_path(self):
+        """Raster moved out along the surface normals by the standoff, with tilt angles, from the height map"""
+        if self.mesh is None:
+            QMessageBox.warning(self, "Error", "Load an STL first!")
+            return
+        hmap = self.get_height_map()
+        if hmap is None:
+            return
+        self.points_matrix = hmap.raster(self.step_input.value())
+        self.points_4d = hmap.conformal(self.points_matrix, self.standoff_input.value())
+        self.live_path = "conformal"
+        self.visualize_path(self.points_4d[:, :3])
+        print(f"Conformal path generated: {len(self.points_4d)} points.")
+
     def generate_offset_mesh(self, original_mesh, standoff):
         """
         Creates a new mesh surface shifted outward by the standoff distance.
@@ -129,67 +198,31 @@ class ndwindow(QWidget):
 
         standoff = self.standoff_input.value()
         step = self.step_input.value()
-        
-        # 1. Create a Voxel Grid around the mesh
-        # We expand the bounds slightly to ensure the standoff fits inside
-        b = np.array(self.mesh.bounds)
-        padding = standoff + (step * 2)
-        grid_bounds = [b[0]-padding, b[1]+padding, b[2]-padding, b[3]+padding, b[4]-padding, b[5]+padding]
-        
-        # Create uniform grid (Voxels)
-        dims = (
-            int((grid_bounds[1] - grid_bounds[0]) / step),
-            int((grid_bounds[3] - grid_bounds[2]) / step),
-            int((grid_bounds[5] - grid_bounds[4]) / step)
-        )
-        grid = pv.ImageData(dimensions=dims, spacing=(step, step, step), origin=(grid_bounds[0], grid_bounds[2], grid_bounds[4]))
-        
-        # 2. Compute the Signed Distance Field (SDF)
-        # This gives every point in the grid a distance to the mesh surface
-        grid = grid.compute_implicit_distance(self.mesh, inplace=True)
-        
-        # 3. Extract the Isosurface at 'standoff' distance
-        # This creates a perfectly smooth offset shell without mesh errors
-        offset_shell = grid.contour(isosurfaces=[standoff], scalars="implicit_distance")
-        
-        if offset_shell.n_points == 0:
+        result = self.cached(VOXEL_4D_RECIPE, lambda: self.compute_voxel_4d(step, standoff), step=step, standoff=standoff)
+        if result["points_4d"].size == 0 and not result["shell_found"]:
             QMessageBox.critical(self, "Error", "Standoff is too large for the voxel grid.")
             return
-
-        # 4. Rasterize the Shell
-        # Now we just need to pull the Z-heights from this perfectly offset shell
-        raw_4d = []
-        shell_bounds = offset_shell.bounds
-        z_up = np.array([0, 0, 1])
-        
-        y_range = np.arange(shell_bounds[2], shell_bounds[3], step)
-        x_range = np.arange(shell_bounds[0], shell_bounds[1], step)
-
-        for i, y in enumerate(y_range):
-            current_x_list = x_range[::-1] if i % 2 != 0 else x_range
-            for x in current_x_list:
-                # Find the highest point on the shell at this XY
-                # Since the shell is the offset, we don't need to project anymore
-                point = self.get_top_point_from_mesh(offset_shell, x, y)
-                if point is not None:
-                    # Get normal from ORIGINAL mesh to find angle
-                    cell_id = self.mesh.find_closest_cell(point)
-                    normal = self.mesh.cell_normals[cell_id]
-                    angle = np.degrees(np.arccos(np.clip(np.dot(normal, z_up), -1.0, 1.0)))
-                    
-                    raw_4d.append([point[0], point[1], point[2], angle])
-
-        self.points_4d = np.array(raw_4d)
+        self.points_4d = result["points_4d"]
         self.visualize_path(self.points_4d[:, :3])
         print(f"Voxel transformation complete: {len(self.points_4d)} points.")
 
-    def get_top_point_from_mesh(self, mesh, x, y):
-        """Helper to find the highest Z on a mesh for a given XY"""
-        # Using a small vertical line to find intersection with our offset shell
-        start = [x, y, mesh.bounds[5] + 5]
-        stop = [x, y, mesh.bounds[4] - 5]
-        points, _ = mesh.ray_trace(start, stop)
-        return points[0] if len(points) > 0 else None
+    def compute_voxel_4d(self, step, standoff):
+        """(x, y, z, tilt angle) points on the standoff shell, as a cache entry"""
+        # Signed distance to the part for any points, negative inside. The
+        # shell's top is found column by column from it, a tile of columns
+        # at a time, so no full voxel grid or contoured shell is held.
+        def distance(points):
+            return pv.PolyData(points).compute_implicit_distance(self.mesh)["implicit_distance"]
+
+        shell = surface_projection.shell_top(distance, self.mesh.bounds, step, standoff)
+        if len(shell) == 0:
+            return {"points_4d": np.zeros((0, 4)), "shell_found": np.array(False)}
+
+        # angle from the normal of the closest cell on the ORIGINAL mesh, all points in one query
+        cell_ids = np.asarray(self.mesh.find_closest_cell(shell))
+        normals = np.asarray(self.mesh.cell_normals)[cell_ids]
+        points_4d = np.column_stack((shell, surface_projection.tilt_degrees(normals)))
+        return {"points_4d": points_4d, "shell_found": np.array(True)}
 
     def visualize_path(self, pts):
         self.plotter.remove_actor("raster_path")
@@ -201,6 +234,10 @@ class ndwindow(QWidget):
         file, _ = QFileDialog.getOpenFileName(self, "Select Mesh", "", "3D Files (*.stl *.obj)")
         if file:
             self.mesh = pv.read(file)
+            self.mesh_digest = pattern_cache.file_digest(file)
+            self.cache = pattern_cache.PatternCache(pattern_cache.default_directory(file))
+            self.height_map = None
+            self.live_path = None
             self.mesh.compute_normals(inplace=True, cell_normals=True)
             self.plotter.clear()
             self.plotter.add_mesh(self.mesh, color="silver", opacity=0.3)
@@ -0,0 +1,423 @@
+###############
+#  Batched top-down projection of scan rasters onto a triangle mesh.
+#
+#  Every ray the STEP/STL importer casts is vertical, so instead of one
+#  ray_trace per point the whole grid of rays is answered at once: each
+#  triangle is rasterized onto the grid nodes under it (a z-buffer keeping
+#  the highest hit, what the first hit of a downward ray is). Rows are then
+#  resampled to equal arc length along the surface with cumulative sums
+#  over a dense profile instead of iterating the step per point.
+#
+#  HeightMap keeps that z-buffer and the top face normals on a fine grid
+#  so later rasters, standoff offsets and tilt angles are bilinear lookups
+#  instead of geometric queries.
+#
+#  shell_top finds the top of an offset shell straight from a signed
+#  distance function, evaluated in tiles of whole columns so fine voxel
+#  steps on large parts stay within max_voxels samples at a time.
+#
+#  Works on plain (vertices, triangles) arrays, see mesh_arrays() in
+#  step_file_importer for getting them from a pyvista mesh.
+###############
+import numpy as np
+
+DEFAULT_OVERSAMPLE = 8
+MAX_CANDIDATES = 1 << 22
+MAX_VOXELS = 1 << 21
+MAX_MAP_NODES = 1 << 22 # ~160 MB of heights and normals
+
+
+def _axis(values: np.ndarray) -> tuple[float, float]:
+    values = np.asarray(values, dtype=float)
+    step = values[1] - values[0] if values.size > 1 else 1.0
+    return values[0], step
+
+
+def height_map(vertices, triangles, xs, ys, max_candidates: int = MAX_CANDIDATES, return_faces: bool = False):
+    """Highest surface z above every grid node (xs[j], ys[i]), NaN where no
+    triangle covers it. xs and ys must be evenly spaced and increasing.
+    Returns a (len(ys), len(xs)) array, and with return_faces the index of
+    the triangle hit at each node (-1 for none) as well."""
+    vertices = np.asarray(vertices, dtype=float)
+    triangles = np.asarray(triangles, dtype=np.int64)
+    x0, dx = _axis(xs)
+    y0, dy = _axis(ys)
+    nx, ny = len(xs), len(ys)
+    heights = np.full(ny * nx, -np.inf)
+    faces = np.full(ny * nx, -1, dtype=np.int64)
+
+    a, b, c = (vertices[triangles[:, k]] for k in range(3))
+    # signed double area in XY, vertical and degenerate faces cannot be hit from above
+    area = (b[:, 0] - a[:, 0]) * (c[:, 1] - a[:, 1]) - (c[:, 0] - a[:, 0]) * (b[:, 1] - a[:, 1])
+    keep = np.abs(area) > 1e-12
+    face_ids = np.flatnonzero(keep)
+    a, b, c, area = a[keep], b[keep], c[keep], area[keep]
+    lo = np.minimum(np.minimum(a, b), c)
+    hi = np.maximum(np.maximum(a, b), c)
+    eps = 1e-9
+    ix0 = np.maximum(np.ceil((lo[:, 0] - x0) / dx - eps), 0).astype(np.int64)
+    ix1 = np.minimum(np.floor((hi[:, 0] - x0) / dx + eps), nx - 1).astype(np.int64)
+    iy0 = np.maximum(np.ceil((lo[:, 1] - y0) / dy - eps), 0).astype(np.int64)
+    iy1 = np.minimum(np.floor((hi[:, 1] - y0) / dy + eps), ny - 1).astype(np.int64)
+    width = np.maximum(ix1 - ix0 + 1, 0)
+    counts = width * np.maximum(iy1 - iy0 + 1, 0)
+
+    # groups of triangles with at most max_candidates grid nodes between them
+    ends = np.cumsum(counts)
+    start = 0
+    while start < counts.size:
+        stop = max(int(np.searchsorted(ends, ends[start] - counts[start] + max_candidates, side="right")), start + 1)
+        sel = slice(start, stop)
+        start = stop
+        n = counts[sel]
+        total = int(n.sum())
+        if total == 0:
+            continue
+        tri = np.repeat(np.arange(n.size), n)
+        offset = np.arange(total) - np.repeat(np.cumsum(n) - n, n)
+        row, col = np.divmod(offset, width[sel][tri])
+        col += ix0[sel][tri]
+        row += iy0[sel][tri]
+        px = x0 + col * dx
+        py = y0 + row * dy
+        ta, tb, tc, tarea = a[sel][tri], b[sel][tri], c[sel][tri], area[sel][tri]
+        # barycentric weights, inclusive of the edges so shared edges are hit
+        wa = ((tb[:, 0] - px) * (tc[:, 1] - py) - (tc[:, 0] - px) * (tb[:, 1] - py)) / tarea
+        wb = ((tc[:, 0] - px) * (ta[:, 1] - py) - (ta[:, 0] - px) * (tc[:, 1] - py)) / tarea
+        wc = 1.0 - wa - wb
+        inside = (wa >= -eps) & (wb >= -eps) & (wc >= -eps)
+        z = (wa * ta[:, 2] + wb * tb[:, 2] + wc * tc[:, 2])[inside]
+        node = (row * nx + col)[inside]
+        if not return_faces:
+            np.maximum.at(heights, node, z)
+            continue
+        # highest candidate per node, then against what earlier groups found
+        face = face_ids[sel][tri][inside]
+        order = np.lexsort((z, node))
+        node, z, face = node[order], z[order], face[order]
+        top = np.append(node[1:] != node[:-1], True)
+        node, z, face = node[top], z[top], face[top]
+        higher = z > heights[node]
+        heights[node[higher]] = z[higher]
+        faces[node[higher]] = face[higher]
+    heights[np.isneginf(heights)] = np.nan
+    if return_faces:
+        return heights.reshape(ny, nx), faces.reshape(ny, nx)
+    return heights.reshape(ny, nx)
+
+
+def face_normals(vertices, triangles) -> np.ndarray:
+    """Unit normal of every triangle, flipped to point up (+z), the side
+    a top-down scan sees. (M, 3)"""
+    vertices = np.asarray(vertices, dtype=float)
+    triangles = np.asarray(triangles, dtype=np.int64)
+    a, b, c = (vertices[triangles[:, k]] for k in range(3))
+    normals = np.cross(b - a, c - a)
+    normals[normals[:, 2] < 0] *= -1
+    length = np.linalg.norm(normals, axis=1, keepdims=True)
+    return np.divide(normals, length, out=np.zeros_like(normals), where=length > 0)
+
+
+def tilt_degrees(normals) -> np.ndarray:
+    """Angle between each normal (..., 3) and +z"""
+    normals = np.asarray(normals, dtype=float)
+    cos = normals[..., 2] / np.linalg.norm(normals, axis=-1)
+    return np.degrees(np.arccos(np.clip(cos, -1.0, 1.0)))
+
+
+def equal_arc_row(xs, zs, spacing: float) -> np.ndarray:
+    """Points spacing apart along the surface profile (xs, zs) of one row,
+    from the first x to the last (always kept). Where the profile has no
+    surface (NaN) the spacing runs on in x and no points are made.
+    Returns (k, 2) x, z."""
+    xs = np.asarray(xs, dtype=float)
+    zs = np.asarray(zs, dtype=float)
+    valid = ~np.isnan(zs)
+    if xs.size < 2:
+        return np.column_stack((xs, zs))[valid]
+    dx = np.diff(xs)
+    dz = np.diff(zs)
+    # segments with surface at both ends follow it, the rest count flat
+    seg = np.where(valid[1:] & valid[:-1], np.hypot(dx, dz), np.abs(dx))
+    s = np.concatenate(([0.0], np.cumsum(seg)))
+    targets = np.arange(0.0, s[-1], spacing)
+    if targets.size == 0 or s[-1] - targets[-1] > 1e-9 * spacing:
+        targets = np.append(targets, s[-1])
+    idx = np.clip(np.searchsorted(s, targets, side="right") - 1, 0, xs.size - 2)
+    t = np.divide(targets - s[idx], seg[idx], out=np.zeros(targets.size), where=seg[idx] > 0)
+    x = xs[idx] + t * dx[idx]
+    z = zs[idx] + t * dz[idx]
+    # a target on a node needs surface there, one inside a segment at both ends
+    on_start = t <= 1e-12
+    on_end = t >= 1 - 1e-12
+    keep = np.where(on_start, valid[idx], np.where(on_end, valid[idx + 1], valid[idx] & valid[idx + 1]))
+    z = np.where(on_start, zs[idx], np.where(on_end, zs[idx + 1], z))
+    return np.column_stack((x, z))[keep]
+
+
+def project_raster(vertices, triangles, bounds, spacing: float, oversample: int = DEFAULT_OVERSAMPLE,
+                   serpentine: bool = True) -> np.ndarray:
+    """Raster over the mesh's XY bounds (xmin, xmax, ymin, ymax, ...) with
+    rows spacing apart in y and points spacing apart along the surface in
+    each row, odd rows reversed. Returns (N, 3) x, y, z."""
+    xmin, xmax, ymin, ymax = (float(v) for v in bounds[:4])
+    ys = np.linspace(ymin, ymax, int(np.ceil((ymax - ymin) / spacing)) + 1)
+    xs = np.linspace(xmin, xmax, int(np.ceil((xmax - xmin) / spacing * oversample)) + 1)
+    heights = height_map(vertices, triangles, xs, ys)
+    rows = []
+    for i, y in enumerate(ys):
+        xz = equal_arc_row(xs, heights[i], spacing)
+        if serpentine and i % 2:
+            xz = xz[::-1]
+        rows.append(np.column_stack((xz[:, 0], np.full(len(xz), y), xz[:, 1])))
+    return np.concatenate(rows) if rows else np.zeros((0, 3))
+
+
+def map_shape(bounds, resolution: float) -> tuple[int, int]:
+    """(nx, ny) nodes of a HeightMap over bounds at resolution (mm)"""
+    if not resolution > 0:
+        raise ValueError(f"resolution must be positive, got {resolution}.")
+    xmin, xmax, ymin, ymax = (float(v) for v in bounds[:4])
+    return int(np.ceil((xmax - xmin) / resolution)) + 1, int(np.ceil((ymax - ymin) / resolution)) + 1
+
+
+class HeightMap:
+    """Top surface of a part sampled once on a regular grid: heights
+    (ny, nx) and unit normals (ny, nx, 3), NaN off the part. Lookups are
+    bilinear in the grid cell and cost the same whatever the mesh size."""
+
+    def __init__(self, xs, ys, heights, normals) -> None:
+        self.xs = np.asarray(xs, dtype=float)
+        self.ys = np.asarray(ys, dtype=float)
+        self.heights = np.asarray(heights, dtype=float)
+        self.normals = np.asarray(normals, dtype=float)
+        self._x0, self._dx = _axis(self.xs)
+        self._y0, self._dy = _axis(self.ys)
+
+    @classmethod
+    def from_mesh(cls, vertices, triangles, bounds, resolution: float,
+                  max_nodes: int = MAX_MAP_NODES) -> "HeightMap":
+        """Rasterize the mesh over its XY bounds at resolution (mm). Raises
+        ValueError rather than build a map of more than max_nodes nodes."""
+        nx, ny = map_shape(bounds, resolution)
+        if nx * ny > max_nodes:
+            raise ValueError(f"A {resolution} mm height map of this part has {nx * ny:,} nodes, "
+                             f"more than the {max_nodes:,} limit. Use a coarser resolution.")
+        xmin, xmax, ymin, ymax = (float(v) for v in bounds[:4])
+        xs = np.linspace(xmin, xmax, nx)
+        ys = np.linspace(ymin, ymax, ny)
+        heights, faces = height_map(vertices, triangles, xs, ys, return_faces=True)
+        normals = np.full(heights.shape + (3,), np.nan)
+        hit = faces >= 0
+        normals[hit] = face_normals(vertices, triangles)[faces[hit]]
+        return cls(xs, ys, heights, normals)
+
+    def to_arrays(self) -> dict[str, np.ndarray]:
+        """For pattern_cache, from_arrays() reverses it"""
+        return {"xs": self.xs, "ys": self.ys, "heights": self.heights, "normals": self.normals}
+
+    @classmethod
+    def from_arrays(cls, arrays) -> "HeightMap":
+        return cls(arrays["xs"], arrays["ys"], arrays["heights"], arrays["normals"])
+
+    @property
+    def bounds(self) -> tuple[float, float, float, float]:
+        return self.xs[0], self.xs[-1], self.ys[0], self.ys[-1]
+
+    def _bilinear(self, grid: np.ndarray, x, y) -> np.ndarray:
+        x, y = np.broadcast_arrays(np.asarray(x, dtype=float), np.asarray(y, dtype=float))
+        fx = (x - self._x0) / self._dx
+        fy = (y - self._y0) / self._dy
+        nx, ny = self.xs.size, self.ys.size
+        outside = (fx < -1e-9) | (fx > nx - 1 + 1e-9) | (fy < -1e-9) | (fy > ny - 1 + 1e-9)
+        i = np.clip(np.floor(fx).astype(np.int64), 0, max(nx - 2, 0))
+        j = np.clip(np.floor(fy).astype(np.int64), 0, max(ny - 2, 0))
+        tx = np.clip(fx - i, 0.0, 1.0)
+        ty = np.clip(fy - j, 0.0, 1.0)
+        i1 = np.minimum(i + 1, nx - 1)
+        j1 = np.minimum(j + 1, ny - 1)
+        if grid.ndim == 3:
+            tx, ty, outside = tx[..., None], ty[..., None], outside[..., None]
+        value = ((1 - ty) * ((1 - tx) * grid[j, i] + tx * grid[j, i1])
+                 + ty * ((1 - tx) * grid[j1, i] + tx * grid[j1, i1]))
+        return np.where(outside, np.nan, value)
+
+    def height(self, x, y) -> np.ndarray:
+        """Surface z at (x, y), NaN off the part or next to its edge"""
+        return self._bilinear(self.heights, x, y)
+
+    def normal(self, x, y) -> np.ndarray:
+        """Unit surface normal at (x, y), (..., 3)"""
+        n = self._bilinear(self.normals, x, y)
+        return n / np.linalg.norm(n, axis=-1, keepdims=True)
+
+    def tilt(self, x, y) -> np.ndarray:
+        """Surface tilt from horizontal at (x, y) in degrees"""
+        return tilt_degrees(self.normal(x, y))
+
+    def raster(self, spacing: float, oversample: int = DEFAULT_OVERSAMPLE, serpentine: bool = True) -> np.ndarray:
+        """Same path as project_raster() on the mesh, from the map. (N, 3)"""
+        xmin, xmax, ymin, ymax = self.bounds
+        ys = np.linspace(ymin, ymax, int(np.ceil((ymax - ymin) / spacing)) + 1)
+        xs = np.linspace(xmin, xmax, int(np.ceil((xmax - xmin) / spacing * oversample)) + 1)
+        heights = self.height(xs[None, :], ys[:, None])
+        rows = []
+        for i, y in enumerate(ys):
+            xz = equal_arc_row(xs, heights[i], spacing)
+            if serpentine and i % 2:
+                xz = xz[::-1]
+            rows.append(np.column_stack((xz[:, 0], np.full(len(xz), y), xz[:, 1])))
+        return np.concatenate(rows) if rows else np.zeros((0, 3))
+
+    def conformal(self, points, standoff: float = 0.0) -> np.ndarray:
+        """(N, 4) x, y, z, tilt for surface points (N, >= 2) moved standoff
+        along the surface normal, the 4-D path of the voxel transform"""
+        points = np.asarray(points, dtype=float)
+        z = self.height(points[:, 0], points[:, 1])
+        n = self.normal(points[:, 0], points[:, 1])
+        surface = np.column_stack((points[:, 0], points[:, 1], z))
+        return np.column_stack((surface + standoff * n, tilt_degrees(n)))
+
+def shell_top(distance, bounds, step: float, standoff: float, max_voxels: int = MAX_VOXELS,
+              serpentine: bool = True) -> np.ndarray:
+    """Raster (N, 3) over the top of the surface standoff away from a part.
+
+    distance(points (K, 3)) -> (K,) is the part's signed distance (negative
+    inside). Voxel columns every step over bounds (xmin, xmax, ymin, ymax,
+    zmin, zmax), padded by standoff + 2 steps, are sampled top down and the
+    first crossing of standoff is interpolated; columns that never cross are
+    left out. Columns are evaluated a tile at a time, at most max_voxels
+    samples each.
+    """
+    b = np.asarray(bounds, dtype=float)
+    padding = standoff + 2 * step
+    xs = np.arange(b[0] - padding, b[1] + padding, step)
+    ys = np.arange(b[2] - padding, b[3] + padding, step)
+    zs = np.arange(b[5] + padding, b[4] - padding, -step) # top down
+    nx, nz = len(xs), len(zs)
+    if nx == 0 or len(ys) == 0 or nz < 2:
+        return np.zeros((0, 3))
+    columns = np.empty((len(ys) * nx, 2))
+    columns[:, 0] = np.tile(xs, len(ys))
+    columns[:, 1] = np.repeat(ys, nx)
+    tops = np.full(len(columns), np.nan)
+    per_tile = max(1, max_voxels // nz)
+    for start in range(0, len(columns), per_tile):
+        tile = columns[start:start + per_tile]
+        samples = np.empty((len(tile), nz, 3))
+        samples[..., :2] = tile[:, None, :]
+        samples[..., 2] = zs
+        d = np.asarray(distance(samples.reshape(-1, 3)), dtype=float).reshape(len(tile), nz) - standoff
+        inside = d <= 0
+        k = inside.argmax(axis=1)
+        # k == 0 is the top of the padded box already inside, no crossing found
+        rows = np.flatnonzero(inside.any(axis=1) & (k > 0))
+        above, below = d[rows, k[rows] - 1], d[rows, k[rows]]
+        frac = above / (above - below)
+        tops[start + rows] = zs[k[rows] - 1] - frac * step
+    points = np.column_stack((columns, tops)).reshape(len(ys), nx, 3)
+    if serpentine:
+        points[1::2] = points[1::2, ::-1]
+    points = points.reshape(-1, 3)
+    return points[~np.isnan(points[:, 2])]
+
+
+def grid_mesh(xs, ys, z) -> tuple[np.ndarray, np.ndarray]:
+    """Triangulated height field z (len(ys), len(xs)) as (vertices, triangles),
+    for tests and synthetic parts"""
+    gx, gy = np.meshgrid(xs, ys)
+    vertices = np.column_stack((gx.ravel(), gy.ravel(), np.asarray(z, dtype=float).ravel()))
+    nx = len(xs)
+    i = (np.arange(len(ys) - 1)[:, None] * nx + np.arange(nx - 1)).ravel()
+    triangles = np.concatenate((np.column_stack((i, i + 1, i + nx + 1)), np.column_stack((i, i + nx + 1, i + nx))))
+    return vertices, triangles
+
+
+if __name__ == "__main__":
+    import time
+
+    # dome on a 200 x 200 mm plate, 0.5 mm facets (320k triangles)
+    xs = np.linspace(0, 200, 401)
+    ys = np.linspace(0, 200, 401)
+    gx, gy = np.meshgrid(xs, ys)
+    z = 10 + np.sqrt(np.clip(80 ** 2 - (gx - 100) ** 2 - (gy - 100) ** 2, 0, None))
+    vertices, triangles = grid_mesh(xs, ys, z)
+
+    checks = []
+    # against a scalar point in triangle search at scattered points
+    rng = np.random.default_rng(1)
+    qx = np.linspace(0, 200, 37)
+    qy = np.linspace(0, 200, 29)
+    heights = height_map(vertices, triangles, qx, qy)
+    for _ in range(40):
+        i, j = rng.integers(len(qy)), rng.integers(len(qx))
+        a, b, c = (vertices[triangles[:, k]] for k in range(3))
+        px, py = qx[j], qy[i]
+        d = (b[:, 0] - a[:, 0]) * (c[:, 1] - a[:, 1]) - (c[:, 0] - a[:, 0]) * (b[:, 1] - a[:, 1])
+        wa = ((b[:, 0] - px) * (c[:, 1] - py) - (c[:, 0] - px) * (b[:, 1] - py)) / d
+        wb = ((c[:, 0] - px) * (a[:, 1] - py) - (a[:, 0] - px) * (c[:, 1] - py)) / d
+        wc = 1 - wa - wb
+        hit = (wa >= -1e-9) & (wb >= -1e-9) & (wc >= -1e-9)
+        checks.append(np.isclose(heights[i, j], (wa * a[:, 2] + wb * b[:, 2] + wc * c[:, 2])[hit].max()))
+    # a point off the part is a miss
+    checks.append(np.isnan(height_map(vertices, triangles, [250.0, 251.0], [0.0])).all())
+
+    start = time.perf_counter()
+    path = project_raster(vertices, triangles, (0, 200, 0, 200, 0, 100), 1.0)
+    elapsed = time.perf_counter() - start
+    gaps = np.linalg.norm(np.diff(path, axis=0), axis=1)
+    row_gaps = gaps[np.diff(path[:, 1]) == 0]
+    # chords of the dense profile, the last gap of each row is the remainder
+    checks.append(np.percentile(row_gaps, 95) <= 1.0 + 1e-6 and np.median(row_gaps) > 0.99)
+    # the z-buffer's faces carry the same heights
+    fh, faces = height_map(vertices, triangles, qx, qy, return_faces=True)
+    checks.append(np.allclose(fh, heights, equal_nan=True) and ((faces >= 0) == ~np.isnan(fh)).all())
+    print("projection:", "ok" if all(checks) else f"FAILED {checks}")
+    print(f"200 x 200 mm at 1 mm: {len(path)} points from {len(triangles)} triangles in {elapsed:.2f}s")
+
+    start = time.perf_counter()
+    hmap = HeightMap.from_mesh(vertices, triangles, (0, 200, 0, 200), 0.25)
+    built = time.perf_counter() - start
+    map_checks = []
+    px, py = rng.uniform(30, 170, (2, 1000))
+    exact = 10 + np.sqrt(np.clip(80 ** 2 - (px - 100) ** 2 - (py - 100) ** 2, 0, None))
+    inner = (px - 100) ** 2 + (py - 100) ** 2 < 70 ** 2
+    map_checks.append(np.abs(hmap.height(px, py) - exact)[inner].max() < 0.05)
+    # sphere normal points away from the centre, tilt = asin(r / R)
+    r = np.hypot(px - 100, py - 100)
+    map_checks.append(np.abs(hmap.tilt(px, py) - np.degrees(np.arcsin(np.clip(r / 80, 0, 1))))[inner].max() < 1.5)
+    timings = []
+    for spacing in (2.0, 1.0, 0.5):
+        start = time.perf_counter()
+        fast = hmap.raster(spacing)
+        timings.append(f"{spacing} mm {len(fast)} points {time.perf_counter() - start:.2f}s")
+    map_checks.append(abs(len(hmap.raster(1.0)) - len(path)) < 0.01 * len(path))
+    path4d = hmap.conformal(hmap.raster(1.0), 5.0)
+    on_dome = np.hypot(path4d[:, 0] - 100, path4d[:, 1] - 100) < 60
+    map_checks.append(np.allclose(np.linalg.norm(path4d[on_dome, :3] - [100, 100, 10], axis=1), 85, atol=0.1))
+    try:
+        HeightMap.from_mesh(vertices, triangles, (0, 200, 0, 200), 0.01) # 400M nodes, refused before allocating
+        map_checks.append(False)
+    except ValueError:
+        map_checks.append(True)
+    print("height map:", "ok" if all(map_checks) else f"FAILED {map_checks}")
+    print(f"map at 0.25 mm built in {built:.2f}s, rasters: " + ", ".join(timings))
+
+    # offset shell of a sphere from its exact distance function
+    centre = np.array([100.0, 100.0, 10.0])
+    calls = []
+
+    def sphere_distance(points):
+        calls.append(len(points))
+        return np.linalg.norm(points - centre, axis=1) - 80
+
+    start = time.perf_counter()
+    shell = shell_top(sphere_distance, (20, 180, 20, 180, -70, 90), 0.5, 5.0)
+    elapsed = time.perf_counter() - start
+    largest = max(calls)
+    calls.clear()
+    tiled = shell_top(sphere_distance, (20, 180, 20, 180, -70, 90), 0.5, 5.0, max_voxels=50_000)
+    shell_checks = [np.allclose(np.linalg.norm(shell - centre, axis=1), 85, atol=0.01),
+                    np.array_equal(shell, tiled), max(calls) <= 50_000]
+    print("shell:", "ok" if all(shell_checks) else f"FAILED {shell_checks}")
+    print(f"sphere shell at 0.5 mm: {len(shell)} points, {largest} samples per tile, {elapsed:.2f}s")
@@ -5,7 +5,7 @@ import os
 from scanner.plugin_setting import PluginSettingString, PluginSettingInteger, PluginSettingFloat
 from PySide6.QtCore import QTimer, Slot
 from PySide6.QtGui import QCloseEvent
-from PySide6.QtWidgets import QApplication, QMainWindow, QPushButton, QVBoxLayout, QWidget
+from PySide6.QtWidgets import QApplication, QMainWindow, QPushButton, QVBoxLayout, QWidget, QComboBox
 import tkinter as tk
 from tkinter import simpledialog
 from tkinter import filedialog as fd
@@ -29,6 +29,8 @@ from matplotlib.backends.backend_qtagg import FigureCanvasQTAgg as FigureCanvas
 from matplotlib.figure import Figure
 from  gui.plotter import plotter_system
 from scanner.scan_pattern_1 import ScanPattern
+from scanner.scan_pattern_curves import CurveScanPattern
+from scanner.scan_pattern_polar import SpiralScanPattern, RingScanPattern, CylinderScanPattern
 from scanner.scan_pattern_controller import ScanPatternControllerPlugin
 from scanner.scan_file_1 import ScanFile
 from scanner.cam_testing_2 import CameraApp as CameraApp
@@ -41,6 +43,10 @@ import shutil
 import webbrowser
 #endregion
 
+# scan pattern plugins offered in the pattern config panel
+SCAN_PATTERN_PLUGINS = {"Raster": ScanPattern, "Space Filling Curve": CurveScanPattern, "Spiral": SpiralScanPattern,
+                        "Concentric Rings": RingScanPattern, "Cylindrical Helix": CylinderScanPattern}
+
 class MainWindow(QMainWindow):
     scanner: ScannerQt
     ui: Ui_MainWindow
@@ -420,9 +426,10 @@ class MainWindow(QMainWindow):
                 
             for setting in self.scan_controller.settings_post_connect:
                     self.ui.config_layout.addRow(setting.display_label, QPluginSetting(setting))
-            planar_slope_button = QPushButton("Apply Planar Slope")
-            planar_slope_button.clicked.connect(self.run_slope_logic)
-            self.ui.config_layout.addRow(planar_slope_button)
+            if hasattr(self.scan_controller, "apply_planar_slope_ui"):
+                planar_slope_button = QPushButton("Apply Planar Slope")
+                planar_slope_button.clicked.connect(self.run_slope_logic)
+                self.ui.config_layout.addRow(planar_slope_button)
 
             # STEP File Importer button
             step_importer_button = QPushButton("STEP/STL File Importer")
@@ -445,9 +452,19 @@ class MainWindow(QMainWindow):
         else:
             for i in reversed(range(self.ui.config_layout.rowCount())):
                     self.ui.config_layout.removeRow(i)
+            plugin_box = QComboBox()
+            plugin_box.addItems(list(SCAN_PATTERN_PLUGINS))
+            for name, plugin in SCAN_PATTERN_PLUGINS.items():
+                if type(self.scan_controller) is plugin:
+                    plugin_box.setCurrentText(name)
+            plugin_box.currentTextChanged.connect(self.change_pattern_plugin)
+            self.ui.config_layout.addRow("Pattern Plugin: ", plugin_box)
             for setting in self.scan_controller.settings_pre_connect:
                         self.ui.config_layout.addRow(setting.display_label, QPluginSetting(setting))
 
+            estimate_button = QPushButton("Estimate")
+            estimate_button.clicked.connect(self.show_pattern_estimate)
+            self.ui.config_layout.addRow(estimate_button)
 
             connect_button = QPushButton("Generate")
             connect_button.clicked.connect(self.connect_pat)
@@ -519,6 +536,21 @@ class MainWindow(QMainWindow):
     def disconnect_pat(self):
         self.scan_controller.disconnect()
         self.configure_pattern(True)    
+
+    @Slot()
+    def show_pattern_estimate(self):
+        # point count and time from the current settings, before generating
+        try:
+            messagebox.showinfo("Scan Estimate", f"Points: {self.scan_controller.planned_points():,}\n"
+                                                 f"Time EST: {self.scan_controller.planned_time()} Hours")
+        except ValueError as e:
+            messagebox.showerror("Scan Estimate", str(e))
+
+    @Slot(str)
+    def change_pattern_plugin(self, name):
+        self.scan_controller = SCAN_PATTERN_PLUGINS[name]()
+        # rebuild the panel after the combo box that sent this has returned
+        QTimer.singleShot(0, lambda: self.configure_pattern(True))
         
     #endregion
     
@@ -542,16 +574,8 @@ class MainWindow(QMainWindow):
         pass
 
         try:
-            # Calculate scan parameters from pattern settings (before matrix is generated)
-            # Get x_length, y_length, and step_size from scan pattern settings
-            x_length = self.scan_controller.x_length.value
-            y_length = self.scan_controller.y_length.value
-            step_size = self.scan_controller.step_size.value
-
-            # Calculate number of points, take a look at scan_pattern_1.py
-            x_points = int(x_length / step_size + 1)
-            y_points = int(y_length / step_size + 1)
-            num_scan_points = x_points * y_points
+            # Calculate number of points from pattern settings (before matrix is generated)
+            num_scan_points = self.scan_controller.planned_points()
 
             # Get number of frequencies from probe controller
             if not self.scanner.scanner.probe_controller.is_connected():
@@ -665,18 +689,13 @@ class MainWindow(QMainWindow):
         if not is_sufficient:
             # Show error dialog
             # Calculate number of points from settings (matrix not generated yet)
-            x_length = self.scan_controller.x_length.value
-            y_length = self.scan_controller.y_length.value
-            step_size = self.scan_controller.step_size.value
-            x_points = int(x_length / step_size + 1)
-            y_points = int(y_length / step_size + 1)
-            num_points = x_points * y_points
+            num_points = self.scan_controller.planned_points()
 
             messagebox.showerror(
                 "Insufficient Disk Space",
                 f"The scan pattern requires more storage than available on disk.\n\n"
                 f"Scan Details:\n"
-                f"  • Scan pattern: {x_points} × {y_points} = {num_points:,} points\n"
+                f"  • Scan pattern: {num_points:,} points\n"
                 f"  • Required storage: {format_bytes(required)}\n"
                 f"  • Available storage: {format_bytes(available)}\n"
                 f"  • Shortage: {format_bytes(required - available)}\n\n"
@@ -685,15 +704,10 @@ class MainWindow(QMainWindow):
             return False
 
         # Sufficient space - optionally show info
-        x_length = self.scan_controller.x_length.value
-        y_length = self.scan_controller.y_length.value
-        step_size = self.scan_controller.step_size.value
-        x_points = int(x_length / step_size + 1)
-        y_points = int(y_length / step_size + 1)
-        num_points = x_points * y_points
+        num_points = self.scan_controller.planned_points()
 
         print(f"✓ Scan storage validation passed:")
-        print(f"  Scan pattern: {x_points} × {y_points} = {num_points:,} points")
+        print(f"  Scan pattern: {num_points:,} points")
         print(f"  Required: {format_bytes(required)}")
         print(f"  Available: {format_bytes(available)}")
         print(f"  Remaining after scan: {format_bytes(available - required)}")